@@ -81,8 +81,12 @@ CORS_ALLOW_METHODS = [
 CORS_ALLOW_HEADERS = [
     'content-type',
     'authorization',
-    'x-requested-with'
+    'x-requested-with',
+    'idempotency-key',
+    'if-none-match',
 ]
+# Brauzerdagi terminal POS katalogining ETag/versiyasini o'qiy olishi uchun
+CORS_EXPOSE_HEADERS = ['etag', 'x-catalog-version', 'idempotent-replayed']
 
 CORS_ALLOWED_ORIGINS = [
     # Lokal test uchun
@@ -196,4 +200,21 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
-}
\ No newline at end of file
+}
+
+# Idempotency-Key bilan saqlangan javoblar qancha vaqt amal qiladi (soat)
+IDEMPOTENCY_KEY_TTL_HOURS = 48
+
+# POS katalogi: to'liq snapshot keshi (soniya) va delta oynasining orqaga surilishi (soniya)
+POS_CATALOG_CACHE_SECONDS = 300
+POS_CATALOG_DELTA_OVERLAP_SECONDS = 5
+# Skanerlash indeksi boshqa workerlardagi o'zgarishlarni necha soniyada bir tekshiradi
+POS_SCAN_INDEX_REFRESH_SECONDS = 1
+# O'chirilgan mahsulot/qoldiqlarni indeksdan olib tashlash uchun tekshiruv oralig'i (soniya)
+POS_SCAN_INDEX_RECONCILE_SECONDS = 10
+# Yetkazilgan kam qoldiq hodisalari qancha saqlanadi (kun), keyin prune_stock_alert_events o'chiradi
+STOCK_ALERT_EVENT_RETENTION_DAYS = 30
+# Shtrix-kod PNG lari uchun jarayon ichidagi LRU hajmi (diskdagi kesh: MEDIA_ROOT/barcodes/)
+BARCODE_IMAGE_LRU_SIZE = 512
+# Yorliqlar varag'ini chizadigan jarayonlar soni (None - min(4, CPU soni))
+LABEL_RENDER_WORKERS = None
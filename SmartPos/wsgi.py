@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'SmartPos.settings')
 
 application = get_wsgi_application()
+
+# Skanerlash indeksini birinchi so'rovni kutmasdan fonda yuklaymiz
+if os.environ.get('POS_SCAN_INDEX_WARM_ON_STARTUP', '1') == '1':
+    import threading
+    from inventory.barcode_index import barcode_index
+
+    threading.Thread(target=barcode_index.warm, name='barcode-index-warm', daemon=True).start()
@@ -10,6 +10,7 @@ from .serializers import (
     InstallmentPlanListSerializer, InstallmentPlanDetailSerializer,
     InstallmentPaySerializer, InstallmentPaymentSerializer
 )
+from sales.idempotency import idempotent
 
 class InstallmentPlanViewSet(viewsets.ModelViewSet):
     """Nasiya rejalarini ko'rish va to'lov qilish"""
@@ -39,6 +40,7 @@ class InstallmentPlanViewSet(viewsets.ModelViewSet):
     # make_payment actioni o'zgarishsiz qoladi
 
     @action(detail=True, methods=['post'], url_path='pay', permission_classes=[permissions.IsAuthenticated])
+    @idempotent('installments.pay')
     def make_payment(self, request, pk=None):
         plan = self.get_object()
         if plan.status not in [InstallmentPlan.PlanStatus.ACTIVE, InstallmentPlan.PlanStatus.OVERDUE]:
@@ -1,6 +1,7 @@
 # inventory/admin.py
 from django.contrib import admin
-from .models import ProductStock, InventoryOperation
+from .models import ProductStock, InventoryOperation, StockReconciliationRun, LowStockAlert, StockAlertEvent, \
+    StockCountSession, StockCountLine, InventoryValuation
 
 @admin.register(ProductStock)
 class ProductStockAdmin(admin.ModelAdmin):
@@ -26,4 +27,57 @@ class InventoryOperationAdmin(admin.ModelAdmin):
     def comment_short(self, obj):
         if obj.comment:
             return (obj.comment[:50] + '...') if len(obj.comment) > 50 else obj.comment
-        return '-'
\ No newline at end of file
+        return '-'
+
+
+@admin.register(StockReconciliationRun)
+class StockReconciliationRunAdmin(admin.ModelAdmin):
+    list_display = ('id', 'mode', 'repair', 'trust', 'started_at', 'finished_at', 'checked_pairs', 'mismatch_count',
+                    'repaired_count', 'user')
+    list_filter = ('mode', 'repair', 'trust')
+    readonly_fields = [field.name for field in StockReconciliationRun._meta.fields]
+
+
+@admin.register(LowStockAlert)
+class LowStockAlertAdmin(admin.ModelAdmin):
+    list_display = ('product', 'kassa', 'created_at')
+    list_filter = ('kassa',)
+    search_fields = ('product__name', 'product__barcode')
+    list_select_related = ('product', 'kassa')
+    readonly_fields = ('stock', 'product', 'kassa', 'created_at')
+
+
+@admin.register(StockAlertEvent)
+class StockAlertEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_type', 'product', 'kassa', 'quantity', 'minimum_stock_level', 'created_at',
+                    'delivered_at')
+    list_filter = ('event_type', 'kassa')
+    list_select_related = ('product', 'kassa')
+    readonly_fields = [field.name for field in StockAlertEvent._meta.fields]
+
+
+class StockCountLineInline(admin.TabularInline):
+    model = StockCountLine
+    extra = 0
+    raw_id_fields = ('product',)
+    readonly_fields = ('product', 'counted_quantity', 'updated_at')
+
+
+@admin.register(StockCountSession)
+class StockCountSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kassa', 'category', 'scope', 'status', 'opened_by', 'created_at', 'posted_at',
+                    'adjusted_products', 'surplus_quantity', 'shortage_quantity')
+    list_filter = ('status', 'scope', 'kassa')
+    list_select_related = ('kassa', 'category', 'opened_by')
+    readonly_fields = ('status', 'opened_by', 'created_at', 'posted_by', 'posted_at', 'adjusted_products',
+                       'surplus_quantity', 'shortage_quantity')
+    inlines = [StockCountLineInline]
+
+
+@admin.register(InventoryValuation)
+class InventoryValuationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'kassa', 'currency', 'quantity', 'average_cost', 'total_value', 'updated_at')
+    list_filter = ('currency', 'kassa')
+    search_fields = ('product__name', 'product__barcode')
+    list_select_related = ('product', 'kassa')
+    readonly_fields = [field.name for field in InventoryValuation._meta.fields]
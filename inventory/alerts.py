@@ -0,0 +1,127 @@
+# inventory/alerts.py
+"""
+Kam qoldiq ogohlantirishlari (LowStockAlert) va hodisalar navbati (StockAlertEvent).
+Qoldiqni o'zgartiradigan joylar (reserve_stock, increment_stock, solishtirish, import, save())
+o'zgargan qoldiqlar uchun sync_low_stock_alerts ni chaqiradi: holat (kam / yetarli) o'zgargan
+qoldiqlar uchun ogohlantirish yaratiladi yoki o'chiriladi va o'sha tranzaksiyada hodisa yoziladi.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import Product, Category
+from .models import ProductStock, LowStockAlert, StockAlertEvent
+
+# Bitta so'rovdagi ID lar soni (SQLite parametr chegarasi)
+ALERT_SYNC_CHUNK_SIZE = 500
+
+
+def is_low(quantity, minimum_stock_level, is_accessory):
+    """LowStockListView dagi qoida: faqat aksessuarlar, quantity <= minimum_stock_level"""
+    return bool(is_accessory) and quantity <= minimum_stock_level
+
+
+def _sync_rows(queryset):
+    """queryset dagi qoldiqlar holatini ogohlantirishlar bilan tenglashtiradi. Natija: (yangi, yopilgan) soni"""
+    rows = queryset.order_by().values_list('id', 'product_id', 'kassa_id', 'quantity', 'minimum_stock_level',
+                                           'product__category__is_accessory_category', 'low_stock_alert__id')
+    alerts, closed, events = [], [], []
+    for stock_id, product_id, kassa_id, quantity, minimum, is_accessory, alert_id in rows:
+        low = is_low(quantity, minimum, is_accessory)
+        if low == (alert_id is not None):
+            continue
+        if low:
+            alerts.append(LowStockAlert(stock_id=stock_id, product_id=product_id, kassa_id=kassa_id))
+        else:
+            closed.append(alert_id)
+        events.append(StockAlertEvent(
+            event_type=StockAlertEvent.EventType.LOW if low else StockAlertEvent.EventType.RESTORED,
+            product_id=product_id, kassa_id=kassa_id, quantity=quantity, minimum_stock_level=minimum
+        ))
+    if not events:
+        return 0, 0
+    with transaction.atomic():
+        LowStockAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+        if closed:
+            LowStockAlert.objects.filter(id__in=closed).delete()
+        StockAlertEvent.objects.bulk_create(events)
+    return len(alerts), len(closed)
+
+
+def sync_low_stock_alerts(kassa=None, product_ids=None, stock_ids=None, category_id=None):
+    """
+    Berilgan qoldiqlar uchun ogohlantirishlarni yangilaydi (bo'lak uchun bitta SELECT,
+    o'zgarish bo'lsagina yozuv). Chaqiruvchining tranzaksiyasi ichida ishlaydi.
+    """
+    queryset = ProductStock.objects.all()
+    if kassa is not None:
+        queryset = queryset.filter(kassa=kassa)
+    if category_id is not None:
+        queryset = queryset.filter(product__category_id=category_id)
+    ids, field = (stock_ids, 'id__in') if stock_ids is not None else (product_ids, 'product_id__in')
+    if ids is None:
+        return _sync_rows(queryset)
+    ids = list(ids)
+    created = closed = 0
+    for start in range(0, len(ids), ALERT_SYNC_CHUNK_SIZE):
+        chunk_created, chunk_closed = _sync_rows(queryset.filter(**{field: ids[start:start + ALERT_SYNC_CHUNK_SIZE]}))
+        created += chunk_created
+        closed += chunk_closed
+    return created, closed
+
+
+def get_stock_alert_event_retention():
+    return timedelta(days=getattr(settings, 'STOCK_ALERT_EVENT_RETENTION_DAYS', 30))
+
+
+def prune_stock_alert_events(now=None):
+    """Yetkazilganiga retention dan ko'p vaqt o'tgan hodisalarni o'chiradi, o'chirilganlar sonini qaytaradi"""
+    cutoff = (now or timezone.now()) - get_stock_alert_event_retention()
+    deleted, _ = StockAlertEvent.objects.filter(delivered_at__lt=cutoff).delete()
+    return deleted
+
+
+def rebuild_low_stock_alerts(chunk_size=5000):
+    """Barcha qoldiqlarni ID bo'yicha bo'laklab qayta tekshiradi (boshlang'ich to'ldirish yoki tuzatish uchun)"""
+    created = closed = 0
+    last_id = 0
+    while True:
+        stock_ids = list(ProductStock.objects.filter(pk__gt=last_id).order_by('pk')
+                         .values_list('pk', flat=True)[:chunk_size])
+        if not stock_ids:
+            return created, closed
+        last_id = stock_ids[-1]
+        chunk_created, chunk_closed = sync_low_stock_alerts(stock_ids=stock_ids)
+        created += chunk_created
+        closed += chunk_closed
+
+
+@receiver(post_save, sender=ProductStock)
+def _alerts_on_stock_save(sender, instance, raw=False, **kwargs):
+    # save() orqali o'zgarishlar: admin, minimum_stock_level tahriri, mahsulot yaratish
+    if not raw:
+        sync_low_stock_alerts(stock_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def _alerts_on_product_save(sender, instance, created=False, raw=False, **kwargs):
+    # Kategoriya o'zgargan bo'lishi mumkin (aksessuar <-> aksessuar emas)
+    if not raw and not created:
+        sync_low_stock_alerts(product_ids=[instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def _alerts_on_category_save(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        sync_low_stock_alerts(category_id=instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+def _alerts_on_category_delete(sender, instance, **kwargs):
+    # Mahsulotlar kategoriyasi SET_NULL bo'ldi (signalsiz) - ularning ogohlantirishlari yopiladi
+    sync_low_stock_alerts(stock_ids=LowStockAlert.objects.filter(product__category__isnull=True)
+                          .values_list('stock_id', flat=True))
@@ -0,0 +1,200 @@
+# inventory/barcode_index.py
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import Product
+from .models import ProductStock
+
+_PRODUCT_FIELDS = ('id', 'name', 'barcode', 'category_id', 'price_uzs', 'price_usd', 'is_active')
+
+
+def _entry(values):
+    """Indeks yozuvi: narxlar satr ko'rinishida (POS ro'yxati va katalogidagi kabi "1000.00")"""
+    product_id, name, barcode, category_id, price_uzs, price_usd = values[:6]
+    return (product_id, name, barcode, category_id,
+            str(price_uzs) if price_uzs is not None else None,
+            str(price_usd) if price_usd is not None else None)
+
+
+class BarcodeIndex:
+    """
+    Jarayon (process) ichidagi shtrix-kod/IMEI -> mahsulot indeksi, kassaga skanerlash uchun.
+    - barcode -> (id, nomi, shtrix-kod, kategoriya, narxlar), product_id -> {kassa_id: qoldiq}
+    - Shu jarayondagi o'zgarishlar (signal, on_commit) indeksni "eskirgan" deb belgilaydi;
+      boshqa jarayonlar (gunicorn workerlari) dagi o'zgarishlar uchun indeks har
+      POS_SCAN_INDEX_REFRESH_SECONDS da updated_at bo'yicha faqat o'zgargan qatorlarni o'qiydi.
+    - O'chirishlar updated_at da ko'rinmaydi: har POS_SCAN_INDEX_RECONCILE_SECONDS da indeksdagi
+      mahsulot va qoldiqlar soni bazadagi bilan solishtiriladi (ikkita COUNT), ko'p bo'lsa
+      ID lar bazadan o'qilib, o'chirilganlari indeksdan olib tashlanadi.
+    - Indeksda yo'q kod bazadan qidiriladi va topilsa indeksga qo'shiladi.
+    Qoldiq ma'lumot uchun; sotuvdagi haqiqiy tekshiruv reserve_stock da.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_barcode = {}
+        self._barcode_of = {}
+        self._stock = {}
+        self._loaded = False
+        self._dirty = False
+        self._watermark = None
+        self._checked_at = 0.0
+        self._reconciled_at = 0.0
+
+    def _refresh_interval(self):
+        return getattr(settings, 'POS_SCAN_INDEX_REFRESH_SECONDS', 1)
+
+    def _reconcile_interval(self):
+        return getattr(settings, 'POS_SCAN_INDEX_RECONCILE_SECONDS', 10)
+
+    def _overlap(self):
+        return timedelta(seconds=getattr(settings, 'POS_CATALOG_DELTA_OVERLAP_SECONDS', 5))
+
+    def _put_product(self, values):
+        product_id, barcode, is_active = values[0], values[2], values[6]
+        old_barcode = self._barcode_of.pop(product_id, None)
+        if old_barcode is not None:
+            self._by_barcode.pop(old_barcode, None)
+        if barcode and is_active:
+            self._by_barcode[barcode] = _entry(values)
+            self._barcode_of[product_id] = barcode
+
+    def _drop_product(self, product_id):
+        barcode = self._barcode_of.pop(product_id, None)
+        if barcode is not None:
+            self._by_barcode.pop(barcode, None)
+        self._stock.pop(product_id, None)
+
+    def warm(self):
+        """Indeksni to'liq qayta quradi (ishga tushganda)"""
+        with self._lock:
+            started = timezone.now()
+            by_barcode, barcode_of, stock = {}, {}, {}
+            products = Product.objects.filter(is_active=True, barcode__isnull=False).exclude(barcode='')
+            for values in products.values_list(*_PRODUCT_FIELDS).iterator(chunk_size=5000):
+                by_barcode[values[2]] = _entry(values)
+                barcode_of[values[0]] = values[2]
+            for product_id, kassa_id, quantity in ProductStock.objects.values_list(
+                    'product_id', 'kassa_id', 'quantity').iterator(chunk_size=5000):
+                stock.setdefault(product_id, {})[kassa_id] = quantity
+            self._by_barcode, self._barcode_of, self._stock = by_barcode, barcode_of, stock
+            self._watermark = started
+            self._checked_at = time.monotonic()
+            self._reconciled_at = self._checked_at
+            self._loaded, self._dirty = True, False
+        print(f"Barcode index: {len(by_barcode)} ta shtrix-kod yuklandi.")
+
+    def _refresh(self):
+        """Oxirgi yangilanishdan beri o'zgargan mahsulot va qoldiqlarni o'qiydi (indeksli so'rovlar)"""
+        with self._lock:
+            started = timezone.now()
+            changed_after = self._watermark - self._overlap()
+            for values in Product.objects.filter(updated_at__gt=changed_after).values_list(*_PRODUCT_FIELDS):
+                self._put_product(values)
+            for product_id, kassa_id, quantity in ProductStock.objects.filter(
+                    updated_at__gt=changed_after).values_list('product_id', 'kassa_id', 'quantity'):
+                self._stock.setdefault(product_id, {})[kassa_id] = quantity
+            self._watermark = started
+            self._checked_at = time.monotonic()
+            self._dirty = False
+            if self._checked_at - self._reconciled_at >= self._reconcile_interval():
+                self._reconcile_deleted()
+                self._reconciled_at = self._checked_at
+
+    def _reconcile_deleted(self):
+        """
+        Boshqa jarayonlarda o'chirilgan mahsulot/qoldiqlarni indeksdan olib tashlaydi.
+        Yangi va o'zgargan qatorlar _refresh da qo'shiladi, shuning uchun eskirgan yozuv bo'lsa
+        indeksdagi soni bazadagidan ko'p bo'ladi - faqat shunda ID lar to'liq o'qiladi.
+        """
+        products = Product.objects.filter(is_active=True, barcode__isnull=False).exclude(barcode='')
+        if len(self._barcode_of) > products.count():
+            existing = set(products.values_list('id', flat=True).iterator(chunk_size=5000))
+            for product_id in [product_id for product_id in self._barcode_of if product_id not in existing]:
+                self._drop_product(product_id)
+        if sum(len(stocks) for stocks in self._stock.values()) > ProductStock.objects.count():
+            existing = set(ProductStock.objects.values_list('product_id', 'kassa_id').iterator(chunk_size=5000))
+            for product_id, stocks in list(self._stock.items()):
+                for kassa_id in [kassa_id for kassa_id in stocks if (product_id, kassa_id) not in existing]:
+                    del stocks[kassa_id]
+                if not stocks:
+                    del self._stock[product_id]
+
+    def _ensure_fresh(self):
+        if not self._loaded:
+            self.warm()
+        elif self._dirty or time.monotonic() - self._checked_at >= self._refresh_interval():
+            self._refresh()
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def forget_product(self, product_id):
+        with self._lock:
+            self._drop_product(product_id)
+
+    def forget_stock(self, product_id, kassa_id):
+        with self._lock:
+            self._stock.get(product_id, {}).pop(kassa_id, None)
+
+    def _load_from_db(self, barcode):
+        values = Product.objects.filter(barcode=barcode, is_active=True).values_list(*_PRODUCT_FIELDS).first()
+        if values is None:
+            return None
+        stock = dict(ProductStock.objects.filter(product_id=values[0]).values_list('kassa_id', 'quantity'))
+        with self._lock:
+            self._put_product(values)
+            self._stock[values[0]] = stock
+        return _entry(values)
+
+    def lookup(self, barcode, kassa_id=None):
+        """Aniq mos kelgan mahsulot (dict) yoki None"""
+        barcode = (barcode or '').strip()
+        if not barcode:
+            return None
+        self._ensure_fresh()
+        values = self._by_barcode.get(barcode)
+        if values is None:
+            values = self._load_from_db(barcode)
+            if values is None:
+                return None
+        product_id, name, barcode, category_id, price_uzs, price_usd = values
+        stocks = self._stock.get(product_id, {})
+        return {
+            'id': product_id, 'name': name, 'barcode': barcode, 'category_id': category_id,
+            'price_uzs': price_uzs, 'price_usd': price_usd,
+            'quantity_in_stock': stocks.get(kassa_id, 0) if kassa_id is not None else sum(stocks.values()),
+        }
+
+
+barcode_index = BarcodeIndex()
+
+
+def mark_barcode_index_dirty():
+    """Tranzaksiya commit bo'lgandan keyin indeksni eskirgan deb belgilaydi"""
+    transaction.on_commit(barcode_index.mark_dirty)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductStock)
+def _barcode_index_on_save(sender, **kwargs):
+    mark_barcode_index_dirty()
+
+
+@receiver(post_delete, sender=Product)
+def _barcode_index_on_product_delete(sender, instance, **kwargs):
+    product_id = instance.pk  # delete() tugagach instance.pk None bo'ladi
+    transaction.on_commit(lambda: barcode_index.forget_product(product_id))
+
+
+@receiver(post_delete, sender=ProductStock)
+def _barcode_index_on_stock_delete(sender, instance, **kwargs):
+    product_id, kassa_id = instance.product_id, instance.kassa_id
+    transaction.on_commit(lambda: barcode_index.forget_stock(product_id, kassa_id))
@@ -0,0 +1,155 @@
+# inventory/history.py
+"""
+Ombor amaliyotlari tarixini keyset (cursor) bo'yicha sahifalash.
+Tartib (timestamp, id) kamayish bo'yicha; keyingi sahifa OFFSET va COUNT(*) siz,
+oxirgi qatorning (timestamp, id) qiymatidan davom etadi - sahifa chuqurligi tezlikka ta'sir qilmaydi.
+"""
+import base64
+from datetime import datetime, timedelta
+
+import django_filters
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+from .models import InventoryOperation
+from .snapshots import day_end
+
+HISTORY_ORDERING = ('-timestamp', '-id')
+HISTORY_PAGE_SIZE = 100  # Ro'yxat (API) uchun standart sahifa
+HISTORY_REPORT_PAGE_SIZE = 1000  # Hisobot uchun standart sahifa
+HISTORY_MAX_PAGE_SIZE = 5000
+
+
+def encode_cursor(operation):
+    raw = f"{operation.timestamp.isoformat()}|{operation.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Natija: (timestamp, id). Buzilgan cursor uchun ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, operation_id = raw.split('|')
+        timestamp = datetime.fromisoformat(timestamp)
+        operation_id = int(operation_id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("Noto'g'ri cursor qiymati.")
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp, operation_id
+
+
+def history_date_range(queryset, start_date=None, end_date=None):
+    """
+    Kun oralig'i timestamp bo'yicha diapazon sifatida (timestamp >= ..., timestamp < ...):
+    timestamp__date filtridan farqli ravishda indeks ishlatiladi.
+    """
+    if start_date:
+        queryset = queryset.filter(timestamp__gte=day_end(start_date - timedelta(days=1)))
+    if end_date:
+        queryset = queryset.filter(timestamp__lt=day_end(end_date))
+    return queryset
+
+
+def fetch_history_page(queryset, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Bitta sahifa: cursor dan keyingi limit ta amaliyot (limit + 1 tasi olinadi - keyingi sahifa bormi).
+    Shart timestamp <= t AND (timestamp < t OR id < i) shaklida: birinchi qism indeks diapazoni,
+    ikkinchisi faqat bir xil vaqtli qatorlarni ajratadi. Natija: (amaliyotlar, next_cursor yoki None)
+    """
+    if cursor:
+        timestamp, operation_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(id__lt=operation_id), timestamp__lte=timestamp)
+    rows = list(queryset.order_by(*HISTORY_ORDERING)[:limit + 1])
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+def parse_page_size(value, default, maximum=HISTORY_MAX_PAGE_SIZE):
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Sahifa hajmi butun son bo'lishi kerak.")
+    if value <= 0:
+        raise ValueError("Sahifa hajmi musbat bo'lishi kerak.")
+    return min(value, maximum)
+
+
+class InventoryHistoryCursorPagination(BasePagination):
+    """
+    InventoryHistoryListView uchun: ?cursor=...&page_size=...
+    Javob: {'next': havola, 'next_cursor': ..., 'results': [...]} (count yo'q - COUNT(*) qilinmaydi)
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = HISTORY_PAGE_SIZE
+    max_page_size = HISTORY_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            page_size = parse_page_size(request.query_params.get(self.page_size_query_param), self.page_size,
+                                        self.max_page_size)
+            rows, self.next_cursor = fetch_history_page(
+                queryset, request.query_params.get(self.cursor_query_param), page_size)
+        except ValueError as e:
+            raise exceptions.ValidationError({self.cursor_query_param: str(e)})
+        return rows
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'first': self.get_first_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'next_cursor': {'type': 'string', 'nullable': True},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class InventoryHistoryFilter(django_filters.FilterSet):
+    """Avvalgi parametrlar saqlangan, lekin sana filtrlari indeks ishlatadigan diapazonga aylantirilgan"""
+    timestamp__date = django_filters.DateFilter(method='filter_timestamp_date')
+    timestamp__date__gte = django_filters.DateFilter(method='filter_timestamp_date')
+    timestamp__date__lte = django_filters.DateFilter(method='filter_timestamp_date')
+
+    class Meta:
+        model = InventoryOperation
+        fields = {
+            'product': ['exact'],
+            'user': ['exact'],
+            'kassa': ['exact'],
+            'operation_type': ['exact', 'in'],
+        }
+
+    def filter_timestamp_date(self, queryset, name, value):
+        if name.endswith('__gte'):
+            return history_date_range(queryset, start_date=value)
+        if name.endswith('__lte'):
+            return history_date_range(queryset, end_date=value)
+        return history_date_range(queryset, value, value)
@@ -0,0 +1,106 @@
+# inventory/management/commands/benchmark_inventory_history.py
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.history import fetch_history_page, encode_cursor, HISTORY_ORDERING
+from inventory.models import InventoryOperation
+from products.models import Kassa, Product
+
+SEED_BATCH_SIZE = 5000
+
+
+class _Rollback(Exception):
+    """Benchmark ma'lumotlarini bazada qoldirmaslik uchun"""
+
+
+class Command(BaseCommand):
+    help = ("Ombor tarixini OFFSET (PageNumberPagination: COUNT(*) + LIMIT/OFFSET) va keyset (timestamp, id) "
+            "sahifalash bo'yicha turli chuqurliklarda solishtiradi. Yetishmagan qatorlar sun'iy amaliyotlar bilan "
+            "to'ldiriladi va oxirida bekor qilinadi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000_000, help="Tarixdagi umumiy amaliyotlar soni")
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--depths', default='0,1000,10000,100000,1000000,4000000',
+                            help="Sahifa boshlanadigan qator raqamlari (vergul bilan)")
+        parser.add_argument('--repeat', type=int, default=3, help="Har bir o'lchov uchun takrorlash soni")
+
+    def handle(self, *args, **options):
+        depths = [int(depth) for depth in options['depths'].split(',') if depth.strip()]
+        try:
+            with transaction.atomic():
+                self._seed(options['rows'])
+                self._run(depths, options['page_size'], max(1, options['repeat']))
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _seed(self, rows):
+        existing = InventoryOperation.objects.count()
+        missing = rows - existing
+        self.stdout.write(f"Mavjud amaliyotlar: {existing}, qo'shiladi: {max(missing, 0)}")
+        if missing <= 0:
+            return
+        kassa_ids = list(Kassa.objects.values_list('id', flat=True))
+        product_ids = list(Product.objects.values_list('id', flat=True)[:20000])
+        if not kassa_ids or not product_ids:
+            raise CommandError("Kamida bitta kassa va mahsulot kerak.")
+        types = [InventoryOperation.OperationType.ADD, InventoryOperation.OperationType.SALE,
+                 InventoryOperation.OperationType.REMOVE, InventoryOperation.OperationType.TRANSFER_OUT]
+        rng = random.Random(42)
+        start = timezone.now() - timedelta(days=365)
+        step = timedelta(days=365) / missing
+        started = time.perf_counter()
+        for offset in range(0, missing, SEED_BATCH_SIZE):
+            InventoryOperation.objects.bulk_create([
+                InventoryOperation(
+                    product_id=rng.choice(product_ids), kassa_id=rng.choice(kassa_ids),
+                    operation_type=rng.choice(types), quantity=rng.choice((1, -1)),
+                    timestamp=start + step * index, comment="benchmark"
+                ) for index in range(offset, min(offset + SEED_BATCH_SIZE, missing))
+            ])
+        self.stdout.write(f"To'ldirish: {time.perf_counter() - started:.1f} s")
+
+    def _timed(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def _run(self, depths, page_size, repeat):
+        queryset = InventoryOperation.objects.select_related(
+            'product__category', 'product__default_kassa_for_new_stock', 'user__profile', 'kassa',
+            'related_operation__product'
+        )
+        sample = InventoryOperation.objects.order_by().values('product_id', 'kassa_id').first()
+        scenarios = [
+            ("filtrsiz", {}),
+            ("kassa", {'kassa_id': sample['kassa_id']}),
+            ("mahsulot+kassa", {'product_id': sample['product_id'], 'kassa_id': sample['kassa_id']}),
+            ("amaliyot turi", {'operation_type': InventoryOperation.OperationType.SALE}),
+        ]
+        self.stdout.write(f"{'filtr':<16}{'chuqurlik':>10}{'offset, ms':>14}{'keyset, ms':>14}")
+        for label, filters in scenarios:
+            filtered = queryset.filter(**filters)
+            total = filtered.count()
+            for depth in depths:
+                if depth >= total:
+                    continue
+                # Keyset uchun cursor: shu chuqurlikdagi oldingi sahifaning oxirgi qatori (o'lchanmaydi)
+                cursor = None
+                if depth:
+                    cursor = encode_cursor(InventoryOperation.objects.filter(**filters).order_by(*HISTORY_ORDERING)
+                                           .only('id', 'timestamp')[depth - 1])
+                offset_ms = self._timed(
+                    lambda: (filtered.count(), list(filtered.order_by(*HISTORY_ORDERING)[depth:depth + page_size])),
+                    repeat)
+                keyset_ms = self._timed(lambda: fetch_history_page(filtered, cursor, page_size), repeat)
+                self.stdout.write(f"{label:<16}{depth:>10}{offset_ms:>14.1f}{keyset_ms:>14.1f}")
@@ -0,0 +1,47 @@
+# inventory/management/commands/create_stock_snapshots.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from inventory.snapshots import SNAPSHOT_PERIODS, create_stock_snapshot, is_period_end, snapshot_date_for_period
+
+
+class Command(BaseCommand):
+    help = ("Kun (yoki oy) oxiridagi ombor qoldiqlari snapshotini yaratadi (cron/scheduler orqali har kuni ishga "
+            "tushiriladi). Snapshot allaqachon bo'lsa o'tkazib yuboriladi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', choices=SNAPSHOT_PERIODS, default='daily',
+                            help="daily - kechagi kun, monthly - o'tgan oyning oxirgi kuni")
+        parser.add_argument('--date', help="Aniq sana (YYYY-MM-DD), --period o'rniga")
+        parser.add_argument('--backfill-from', help="Shu sanadan --date gacha barcha davr oxirlari uchun (YYYY-MM-DD)")
+        parser.add_argument('--force', action='store_true', help="Mavjud snapshotni qayta yozish")
+
+    def _parse(self, value, name):
+        day = parse_date(value) if value else None
+        if value and day is None:
+            raise CommandError(f"{name}: sana YYYY-MM-DD formatida bo'lishi kerak.")
+        return day
+
+    def handle(self, *args, **options):
+        period = options['period']
+        end_date = self._parse(options['date'], '--date') or snapshot_date_for_period(period)
+        start_date = self._parse(options['backfill_from'], '--backfill-from') or end_date
+        if start_date > end_date:
+            raise CommandError("--backfill-from --date dan keyin bo'lmasligi kerak.")
+
+        day = start_date
+        while day <= end_date:
+            # Backfill da faqat davr oxirlari; aniq --date har doim olinadi
+            if day == end_date or is_period_end(day, period):
+                started = time.perf_counter()
+                try:
+                    rows, created = create_stock_snapshot(day, force=options['force'])
+                except ValueError as e:
+                    raise CommandError(str(e))
+                state = "yaratildi" if created else "allaqachon mavjud"
+                self.stdout.write(self.style.SUCCESS(
+                    f"{day}: {rows} qator, {state} ({time.perf_counter() - started:.2f}s)"))
+            day += timedelta(days=1)
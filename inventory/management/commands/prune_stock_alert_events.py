@@ -0,0 +1,14 @@
+# inventory/management/commands/prune_stock_alert_events.py
+from django.core.management.base import BaseCommand
+
+from inventory.alerts import prune_stock_alert_events, get_stock_alert_event_retention
+
+
+class Command(BaseCommand):
+    help = ("Yetkazilganiga STOCK_ALERT_EVENT_RETENTION_DAYS dan ko'p vaqt o'tgan kam qoldiq hodisalarini o'chiradi. "
+            "Cron orqali ishga tushiring.")
+
+    def handle(self, *args, **options):
+        deleted = prune_stock_alert_events()
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} ta yetkazilgan hodisa o'chirildi (saqlash muddati: {get_stock_alert_event_retention()})."))
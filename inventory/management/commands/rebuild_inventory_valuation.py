@@ -0,0 +1,19 @@
+# inventory/management/commands/rebuild_inventory_valuation.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.valuation import rebuild_inventory_valuation
+
+
+class Command(BaseCommand):
+    help = ("Qoldiq qiymati (WAC) jadvalini joriy qoldiqlar va mahsulotlarning xarid narxlaridan qaytadan quradi. "
+            "Birinchi o'rnatishda bir marta ishga tushiriladi, keyin jadval har bir kirim/chiqimda yangilanadi.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            written = rebuild_inventory_valuation()
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} ta qiymat qatori yozildi ({time.perf_counter() - started:.1f} s)."))
@@ -0,0 +1,40 @@
+# inventory/management/commands/reconcile_stock.py
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from inventory.models import StockReconciliationRun
+from inventory.reconciliation import reconcile_stock, RECONCILE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = ("ProductStock qoldiqlarini InventoryOperation jurnali bilan solishtiradi. Standart holatda faqat "
+            "oldingi ishdan keyin o'zgargan juftlar tekshiriladi (--full - hammasi). --repair bilan farqlar tuzatiladi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Barcha mahsulotlarni tekshirish")
+        parser.add_argument('--repair', action='store_true', help="Farqlarni tuzatish")
+        parser.add_argument('--trust', choices=StockReconciliationRun.Trust.values,
+                            default=StockReconciliationRun.Trust.LEDGER,
+                            help="ledger - qoldiq jurnalga tenglashtiriladi, stock - jurnalga tuzatish yoziladi")
+        parser.add_argument('--user', help="Tuzatish amaliyotlari kimning nomidan yoziladi (username)")
+        parser.add_argument('--chunk-size', type=int, default=RECONCILE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first() if options['user'] else None
+        started = time.perf_counter()
+        run = reconcile_stock(full=options['full'], repair=options['repair'], trust=options['trust'], user=user,
+                              chunk_size=max(1, options['chunk_size']))
+        for item in run.mismatches[:50]:
+            status = "tuzatildi" if item.get('repaired') else "tuzatilmagan"
+            self.stdout.write(self.style.WARNING(
+                f"Mahsulot #{item['product_id']} @ kassa #{item['kassa_id']}: qoldiq {item['stock']}, "
+                f"jurnal {item['ledger']} ({status})"))
+        style = self.style.SUCCESS if run.mismatch_count == run.repaired_count else self.style.WARNING
+        self.stdout.write(style(
+            f"Solishtirish #{run.id} ({run.get_mode_display()}): {run.checked_products} mahsulot, "
+            f"{run.checked_pairs} juft, {run.mismatch_count} farq, {run.repaired_count} tuzatildi "
+            f"({time.perf_counter() - started:.1f}s)."))
+        if run.mismatch_count and not options['repair']:
+            self.stdout.write("Tuzatish uchun --repair bilan ishga tushiring.")
@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_purchaseorder_payment_method'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productstock',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Yangilangan sana'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='productstock',
+            index=models.Index(fields=['kassa', 'updated_at'], name='stock_kassa_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 18:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_productstock_updated_at'),
+        ('products', '0014_productpricehistory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('full', "To'liq"), ('incremental', "Faqat o'zgarganlar")], default='incremental', max_length=12, verbose_name='Rejim')),
+                ('repair', models.BooleanField(default=False, verbose_name='Tuzatilsinmi')),
+                ('trust', models.CharField(choices=[('ledger', "Jurnal to'g'ri (qoldiq tuzatiladi)"), ('stock', "Qoldiq to'g'ri (jurnalga tuzatish yoziladi)")], default='ledger', max_length=10, verbose_name='Asos')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Boshlangan')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Tugagan')),
+                ('last_operation_id', models.BigIntegerField(default=0, verbose_name='Nazorat nuqtasi (oxirgi amaliyot ID)')),
+                ('checked_products', models.PositiveIntegerField(default=0, verbose_name='Tekshirilgan mahsulotlar')),
+                ('checked_pairs', models.PositiveIntegerField(default=0, verbose_name='Tekshirilgan (mahsulot, kassa) juftlari')),
+                ('mismatch_count', models.PositiveIntegerField(default=0, verbose_name='Farqlar soni')),
+                ('repaired_count', models.PositiveIntegerField(default=0, verbose_name='Tuzatilganlar soni')),
+                ('mismatches', models.JSONField(blank=True, default=list, verbose_name="Farqlar (cheklangan ro'yxat)")),
+            ],
+            options={
+                'verbose_name': 'Qoldiq solishtiruvi',
+                'verbose_name_plural': 'Qoldiq solishtiruvlari',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='inventoryoperation',
+            name='operation_type',
+            field=models.CharField(choices=[('ADD', "Qo'shish (Kirim)"), ('REMOVE', 'Chiqarish (Hisobdan chiqarish)'), ('TRANSFER_OUT', "Ko'chirish (Chiqish)"), ('TRANSFER_IN', "Ko'chirish (Kirish)"), ('SALE', 'Sotuv'), ('RETURN', 'Qaytarish'), ('INITIAL', "Boshlang'ich qoldiq"), ('ADJUSTMENT', 'Tuzatish (Solishtirish)')], max_length=20, verbose_name='Amaliyot turi'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryoperation',
+            index=models.Index(fields=['product', 'kassa', 'quantity'], name='invop_product_kassa_qty_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockreconciliationrun',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Foydalanuvchi'),
+        ),
+    ]
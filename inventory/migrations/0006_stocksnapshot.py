@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 18:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stock_reconciliation'),
+        ('products', '0014_productpricehistory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('snapshot_date', models.DateField(verbose_name='Sana (kun oxiri holati)')),
+                ('quantity', models.IntegerField(verbose_name='Miqdor')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Yaratilgan vaqt')),
+            ],
+            options={
+                'verbose_name': 'Qoldiq snapshoti',
+                'verbose_name_plural': 'Qoldiq snapshotlari',
+                'ordering': ['-snapshot_date', 'kassa', 'product'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventoryoperation',
+            index=models.Index(fields=['timestamp', 'product', 'kassa', 'quantity'], name='invop_timestamp_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='kassa',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.kassa', verbose_name='Kassa/Filial'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='products.product', verbose_name='Mahsulot'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocksnapshot',
+            constraint=models.UniqueConstraint(fields=('snapshot_date', 'kassa', 'product'), name='unique_stock_snapshot'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2 on 2026-10-18 19:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_low_stock_alerts(apps, schema_editor):
+    # Mavjud kam qoldiqlar (LowStockListView qoidasi bo'yicha) - hodisasiz
+    ProductStock = apps.get_model('inventory', 'ProductStock')
+    LowStockAlert = apps.get_model('inventory', 'LowStockAlert')
+    rows = ProductStock.objects.filter(quantity__lte=F('minimum_stock_level'),
+                                       product__category__is_accessory_category=True) \
+        .order_by().values_list('id', 'product_id', 'kassa_id')
+    LowStockAlert.objects.bulk_create(
+        [LowStockAlert(stock_id=stock_id, product_id=product_id, kassa_id=kassa_id)
+         for stock_id, product_id, kassa_id in rows.iterator(chunk_size=5000)],
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stocksnapshot'),
+        ('products', '0014_productpricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Qachondan beri')),
+                ('kassa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alerts', to='products.kassa', verbose_name='Kassa/Filial')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alerts', to='products.product', verbose_name='Mahsulot')),
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alert', to='inventory.productstock', verbose_name='Qoldiq')),
+            ],
+            options={
+                'verbose_name': 'Kam qoldiq ogohlantirishi',
+                'verbose_name_plural': 'Kam qoldiq ogohlantirishlari',
+                'ordering': ['kassa', 'product'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockAlertEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('low', 'Qoldiq kamaydi'), ('restored', 'Qoldiq tiklandi')], max_length=10, verbose_name='Hodisa turi')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Qoldiq (hodisa paytida)')),
+                ('minimum_stock_level', models.PositiveIntegerField(verbose_name='Minimal miqdor')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Vaqti')),
+                ('delivered_at', models.DateTimeField(blank=True, null=True, verbose_name='Yetkazilgan vaqti')),
+                ('kassa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alert_events', to='products.kassa', verbose_name='Kassa/Filial')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alert_events', to='products.product', verbose_name='Mahsulot')),
+            ],
+            options={
+                'verbose_name': 'Qoldiq hodisasi',
+                'verbose_name_plural': 'Qoldiq hodisalari',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['delivered_at', 'id'], name='stock_alert_event_pending_idx')],
+            },
+        ),
+        migrations.RunPython(fill_low_stock_alerts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2 on 2026-10-18 19:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_low_stock_alerts'),
+        ('products', '0014_productpricehistory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventoryoperation',
+            name='operation_type',
+            field=models.CharField(choices=[('ADD', "Qo'shish (Kirim)"), ('REMOVE', 'Chiqarish (Hisobdan chiqarish)'), ('TRANSFER_OUT', "Ko'chirish (Chiqish)"), ('TRANSFER_IN', "Ko'chirish (Kirish)"), ('SALE', 'Sotuv'), ('RETURN', 'Qaytarish'), ('INITIAL', "Boshlang'ich qoldiq"), ('ADJUSTMENT', 'Tuzatish (Solishtirish)'), ('STOCK_COUNT', 'Inventarizatsiya')], max_length=20, verbose_name='Amaliyot turi'),
+        ),
+        migrations.CreateModel(
+            name='StockCountSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('full', "To'liq (sanalmagan qoldiqlar 0 deb olinadi)"), ('partial', 'Qisman (faqat sanalgan mahsulotlar)')], default='full', max_length=10, verbose_name='Qamrov')),
+                ('status', models.CharField(choices=[('open', 'Ochiq (sanalmoqda)'), ('posted', "O'tkazilgan"), ('cancelled', 'Bekor qilingan')], default='open', max_length=10, verbose_name='Holati')),
+                ('comment', models.TextField(blank=True, null=True, verbose_name='Izoh')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Ochilgan vaqti')),
+                ('posted_at', models.DateTimeField(blank=True, null=True, verbose_name="O'tkazilgan/yopilgan vaqti")),
+                ('adjusted_products', models.PositiveIntegerField(default=0, verbose_name='Farqli mahsulotlar soni')),
+                ('surplus_quantity', models.PositiveIntegerField(default=0, verbose_name='Ortiqcha (jami)')),
+                ('shortage_quantity', models.PositiveIntegerField(default=0, verbose_name='Kamomad (jami)')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_counts', to='products.category', verbose_name="Kategoriya (bo'sh bo'lsa hammasi)")),
+                ('kassa', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_counts', to='products.kassa', verbose_name='Kassa/Filial')),
+                ('opened_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='opened_stock_counts', to=settings.AUTH_USER_MODEL, verbose_name='Ochgan')),
+                ('posted_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='posted_stock_counts', to=settings.AUTH_USER_MODEL, verbose_name="O'tkazgan")),
+            ],
+            options={
+                'verbose_name': 'Inventarizatsiya',
+                'verbose_name_plural': 'Inventarizatsiyalar',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockCountLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counted_quantity', models.PositiveIntegerField(default=0, verbose_name='Sanalgan miqdor')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Oxirgi skaner vaqti')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_count_lines', to='products.product', verbose_name='Mahsulot')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.stockcountsession', verbose_name='Sessiya')),
+            ],
+            options={
+                'verbose_name': 'Sanoq qatori',
+                'verbose_name_plural': 'Sanoq qatorlari',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stockcountsession',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'open')), fields=('kassa',), name='one_open_stock_count_per_kassa'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockcountline',
+            constraint=models.UniqueConstraint(fields=('session', 'product'), name='unique_stock_count_line'),
+        ),
+    ]
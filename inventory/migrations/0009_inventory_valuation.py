@@ -0,0 +1,65 @@
+# Generated by Django 5.2 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+_CENT = Decimal('0.01')
+
+
+def fill_inventory_valuation(apps, schema_editor):
+    # Mavjud qoldiqlar mahsulot xarid narxida baholanadi (rebuild_inventory_valuation bilan bir xil qoida),
+    # aks holda record_issue hech narsa qilmaydi va record_receipt faqat kirim miqdorini yozadi
+    ProductStock = apps.get_model('inventory', 'ProductStock')
+    InventoryValuation = apps.get_model('inventory', 'InventoryValuation')
+    CurrencyRate = apps.get_model('settings_app', 'CurrencyRate')
+    rate = CurrencyRate.objects.values_list('usd_to_uzs_rate', flat=True).first() or Decimal('13000')
+    rows = []
+    stocks = ProductStock.objects.filter(quantity__gt=0).order_by('pk').values_list(
+        'product_id', 'kassa_id', 'quantity', 'product__purchase_price_uzs', 'product__purchase_price_usd')
+    for product_id, kassa_id, quantity, price_uzs, price_usd in stocks.iterator(chunk_size=2000):
+        if price_usd:
+            cost_usd, cost_uzs = price_usd, price_uzs or price_usd * rate
+        elif price_uzs:
+            cost_usd, cost_uzs = price_uzs / rate, price_uzs
+        else:
+            cost_usd = cost_uzs = Decimal(0)
+        for currency, cost in (('UZS', cost_uzs), ('USD', cost_usd)):
+            rows.append(InventoryValuation(product_id=product_id, kassa_id=kassa_id, currency=currency,
+                                           quantity=quantity, total_value=(cost * quantity).quantize(_CENT)))
+        if len(rows) >= 2000:
+            InventoryValuation.objects.bulk_create(rows)
+            rows = []
+    InventoryValuation.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_stock_count_sessions'),
+        ('products', '0014_productpricehistory'),
+        ('settings_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('UZS', "O'zbek so'mi"), ('USD', 'AQSH dollari')], max_length=3, verbose_name='Valyuta')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Baholangan miqdor')),
+                ('total_value', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=20, verbose_name='Qoldiq qiymati')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan')),
+                ('kassa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valuations', to='products.kassa', verbose_name='Kassa/Filial')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='valuations', to='products.product', verbose_name='Mahsulot')),
+            ],
+            options={
+                'verbose_name': 'Qoldiq qiymati (WAC)',
+                'verbose_name_plural': 'Qoldiq qiymatlari (WAC)',
+                'ordering': ['kassa', 'product', 'currency'],
+                'indexes': [models.Index(fields=['currency', 'kassa'], name='valuation_currency_kassa_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'kassa', 'currency'), name='unique_inventory_valuation')],
+            },
+        ),
+        migrations.RunPython(fill_inventory_valuation, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 19:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_inventory_valuation'),
+        ('products', '0014_productpricehistory'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryoperation',
+            index=models.Index(fields=['kassa', 'timestamp', 'id'], name='invop_kassa_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryoperation',
+            index=models.Index(fields=['product', 'kassa', 'timestamp', 'id'], name='invop_product_kassa_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryoperation',
+            index=models.Index(fields=['operation_type', 'timestamp', 'id'], name='invop_type_ts_idx'),
+        ),
+    ]
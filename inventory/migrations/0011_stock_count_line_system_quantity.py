@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_inventory_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockcountline',
+            name='system_quantity',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Skaner paytidagi qoldiq'),
+        ),
+    ]
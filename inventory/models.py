@@ -3,7 +3,7 @@ from decimal import Decimal
 
 from django.db import models
 from django.conf import settings # User uchun
-from products.models import Product, Kassa # Bog'liqlik uchun
+from products.models import Product, Kassa, Category # Bog'liqlik uchun
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -15,12 +15,16 @@ class ProductStock(models.Model):
     kassa = models.ForeignKey(Kassa, on_delete=models.CASCADE, related_name='stocks', verbose_name="Kassa/Filial")
     quantity = models.PositiveIntegerField(default=0, verbose_name="Miqdori (qoldiq)")
     minimum_stock_level = models.PositiveIntegerField(default=5, verbose_name="Minimal miqdor") # Default qiymatni moslang
+    # POS katalogining delta sinxronizatsiyasi uchun. queryset.update() auto_now ni ishlatmaydi,
+    # shuning uchun qoldiqni UPDATE bilan o'zgartiradigan joylar uni o'zi yangilashi kerak
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan sana")
 
     class Meta:
         unique_together = ('product', 'kassa') # Har bir mahsulot uchun kassada faqat bitta qoldiq yozuvi
         verbose_name = "Ombor Qoldig'i"
         verbose_name_plural = "Ombor Qoldiqlari"
         ordering = ['kassa', 'product__name']
+        indexes = [models.Index(fields=['kassa', 'updated_at'], name='stock_kassa_updated_idx')]
 
     def __str__(self):
         return f"{self.product.name} @ {self.kassa.name}: {self.quantity}"
@@ -41,6 +45,8 @@ class InventoryOperation(models.Model):
         SALE = 'SALE', 'Sotuv' # Sotuv ilovasidan yaratiladi
         RETURN = 'RETURN', 'Qaytarish' # Sotuv ilovasidan yaratiladi
         INITIAL = 'INITIAL', 'Boshlang\'ich qoldiq' # Boshlang'ich ma'lumot kiritish uchun
+        ADJUSTMENT = 'ADJUSTMENT', 'Tuzatish (Solishtirish)' # Qoldiq va jurnalni solishtirish natijasi
+        STOCK_COUNT = 'STOCK_COUNT', 'Inventarizatsiya' # Sanoq natijasidagi farq (+/-)
 
     product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='inventory_operations', verbose_name="Mahsulot")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='inventory_operations', verbose_name="Foydalanuvchi (Amaliyotchi)")
@@ -56,6 +62,14 @@ class InventoryOperation(models.Model):
         verbose_name = "Ombor Amaliyoti"
         verbose_name_plural = "Ombor Amaliyotlari"
         ordering = ['-timestamp']
+        # (mahsulot, kassa) bo'yicha SUM(quantity) jadvalga murojaatsiz, faqat indeksdan (solishtirish uchun)
+        indexes = [models.Index(fields=['product', 'kassa', 'quantity'], name='invop_product_kassa_qty_idx'),
+                   # Snapshotdan keyingi amaliyotlar vaqt oralig'i bo'yicha, jadvalga murojaatsiz
+                   models.Index(fields=['timestamp', 'product', 'kassa', 'quantity'], name='invop_timestamp_idx'),
+                   # Tarixni (timestamp, id) bo'yicha keyset sahifalash: kassa, mahsulot+kassa, amaliyot turi filtrlari
+                   models.Index(fields=['kassa', 'timestamp', 'id'], name='invop_kassa_ts_idx'),
+                   models.Index(fields=['product', 'kassa', 'timestamp', 'id'], name='invop_product_kassa_ts_idx'),
+                   models.Index(fields=['operation_type', 'timestamp', 'id'], name='invop_type_ts_idx')]
 
     def clean(self):
         """Ma'lumotlar validatsiyasi"""
@@ -72,6 +86,204 @@ class InventoryOperation(models.Model):
         return f"{self.get_operation_type_display()} [{self.timestamp.strftime('%Y-%m-%d %H:%M')}] {self.product.name} ({self.quantity}) @ {self.kassa.name} by {user_str}"
 
 
+class StockSnapshot(models.Model):
+    """
+    Kun oxiridagi qoldiq (jurnal bo'yicha): snapshot_date kuni tugaguncha bo'lgan
+    InventoryOperation yig'indisi. Faqat 0 bo'lmagan (mahsulot, kassa) juftlari saqlanadi.
+    Istalgan sanadagi qoldiq = eng yaqin oldingi snapshot + undan keyingi amaliyotlar (inventory/snapshots.py).
+    """
+    snapshot_date = models.DateField(verbose_name="Sana (kun oxiri holati)")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots', verbose_name="Mahsulot")
+    kassa = models.ForeignKey(Kassa, on_delete=models.CASCADE, related_name='stock_snapshots', verbose_name="Kassa/Filial")
+    quantity = models.IntegerField(verbose_name="Miqdor")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Yaratilgan vaqt")
+
+    class Meta:
+        verbose_name = "Qoldiq snapshoti"
+        verbose_name_plural = "Qoldiq snapshotlari"
+        ordering = ['-snapshot_date', 'kassa', 'product']
+        constraints = [models.UniqueConstraint(fields=['snapshot_date', 'kassa', 'product'],
+                                               name='unique_stock_snapshot')]
+
+    def __str__(self):
+        return f"{self.snapshot_date}: {self.product_id} @ {self.kassa_id} = {self.quantity}"
+
+
+class StockReconciliationRun(models.Model):
+    """
+    ProductStock va InventoryOperation jurnalini solishtirish (inventory/reconciliation.py).
+    last_operation_id va started_at keyingi "incremental" ishga nazorat nuqtasi bo'ladi:
+    faqat shundan keyin o'zgargan (mahsulot, kassa) juftlari tekshiriladi.
+    """
+    class Mode(models.TextChoices):
+        FULL = 'full', "To'liq"
+        INCREMENTAL = 'incremental', "Faqat o'zgarganlar"
+
+    class Trust(models.TextChoices):
+        LEDGER = 'ledger', "Jurnal to'g'ri (qoldiq tuzatiladi)"
+        STOCK = 'stock', "Qoldiq to'g'ri (jurnalga tuzatish yoziladi)"
+
+    mode = models.CharField(max_length=12, choices=Mode.choices, default=Mode.INCREMENTAL, verbose_name="Rejim")
+    repair = models.BooleanField(default=False, verbose_name="Tuzatilsinmi")
+    trust = models.CharField(max_length=10, choices=Trust.choices, default=Trust.LEDGER, verbose_name="Asos")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                             verbose_name="Foydalanuvchi")
+    started_at = models.DateTimeField(default=timezone.now, verbose_name="Boshlangan")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Tugagan")
+    last_operation_id = models.BigIntegerField(default=0, verbose_name="Nazorat nuqtasi (oxirgi amaliyot ID)")
+    checked_products = models.PositiveIntegerField(default=0, verbose_name="Tekshirilgan mahsulotlar")
+    checked_pairs = models.PositiveIntegerField(default=0, verbose_name="Tekshirilgan (mahsulot, kassa) juftlari")
+    mismatch_count = models.PositiveIntegerField(default=0, verbose_name="Farqlar soni")
+    repaired_count = models.PositiveIntegerField(default=0, verbose_name="Tuzatilganlar soni")
+    mismatches = models.JSONField(default=list, blank=True, verbose_name="Farqlar (cheklangan ro'yxat)")
+
+    class Meta:
+        verbose_name = "Qoldiq solishtiruvi"
+        verbose_name_plural = "Qoldiq solishtiruvlari"
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Solishtirish #{self.id} ({self.get_mode_display()}): {self.mismatch_count} farq"
+
+
+class StockCountSession(models.Model):
+    """
+    Inventarizatsiya (sanoq) sessiyasi: kassada skanerlangan miqdorlar StockCountLine ga yig'iladi,
+    farqlar ProductStock bilan bitta so'rovda hisoblanadi va bitta tranzaksiyada o'tkaziladi
+    (inventory/stock_count.py). Kassada bir vaqtda bitta ochiq sessiya bo'ladi.
+    """
+    class Status(models.TextChoices):
+        OPEN = 'open', "Ochiq (sanalmoqda)"
+        POSTED = 'posted', "O'tkazilgan"
+        CANCELLED = 'cancelled', "Bekor qilingan"
+
+    class Scope(models.TextChoices):
+        FULL = 'full', "To'liq (sanalmagan qoldiqlar 0 deb olinadi)"
+        PARTIAL = 'partial', "Qisman (faqat sanalgan mahsulotlar)"
+
+    kassa = models.ForeignKey(Kassa, on_delete=models.PROTECT, related_name='stock_counts', verbose_name="Kassa/Filial")
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_counts',
+                                 verbose_name="Kategoriya (bo'sh bo'lsa hammasi)")
+    scope = models.CharField(max_length=10, choices=Scope.choices, default=Scope.FULL, verbose_name="Qamrov")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN, verbose_name="Holati")
+    comment = models.TextField(blank=True, null=True, verbose_name="Izoh")
+    opened_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='opened_stock_counts', verbose_name="Ochgan")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ochilgan vaqti")
+    posted_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='posted_stock_counts', verbose_name="O'tkazgan")
+    posted_at = models.DateTimeField(null=True, blank=True, verbose_name="O'tkazilgan/yopilgan vaqti")
+    adjusted_products = models.PositiveIntegerField(default=0, verbose_name="Farqli mahsulotlar soni")
+    surplus_quantity = models.PositiveIntegerField(default=0, verbose_name="Ortiqcha (jami)")
+    shortage_quantity = models.PositiveIntegerField(default=0, verbose_name="Kamomad (jami)")
+
+    class Meta:
+        verbose_name = "Inventarizatsiya"
+        verbose_name_plural = "Inventarizatsiyalar"
+        ordering = ['-created_at']
+        constraints = [models.UniqueConstraint(fields=['kassa'], condition=models.Q(status='open'),
+                                               name='one_open_stock_count_per_kassa')]
+
+    def __str__(self):
+        return f"Inventarizatsiya #{self.id} @ {self.kassa.name} ({self.get_status_display()})"
+
+
+class StockCountLine(models.Model):
+    """Sessiyada sanalgan miqdor (skanerlar to'plamlari shu qatorga qo'shiladi)"""
+    session = models.ForeignKey(StockCountSession, on_delete=models.CASCADE, related_name='lines', verbose_name="Sessiya")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_count_lines', verbose_name="Mahsulot")
+    counted_quantity = models.PositiveIntegerField(default=0, verbose_name="Sanalgan miqdor")
+    # Birinchi skaner (mode=set da oxirgi tuzatish) paytidagi ProductStock qoldig'i: farq shunga nisbatan,
+    # shuning uchun skanerdan keyingi sotuvlar o'tkazishda qayta qo'shilmaydi
+    system_quantity = models.PositiveIntegerField(null=True, blank=True, verbose_name="Skaner paytidagi qoldiq")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="Oxirgi skaner vaqti")
+
+    class Meta:
+        verbose_name = "Sanoq qatori"
+        verbose_name_plural = "Sanoq qatorlari"
+        constraints = [models.UniqueConstraint(fields=['session', 'product'], name='unique_stock_count_line')]
+
+    def __str__(self):
+        return f"#{self.session_id}: {self.product_id} = {self.counted_quantity}"
+
+
+class InventoryValuation(models.Model):
+    """
+    (mahsulot, kassa, valyuta) bo'yicha o'rtacha tortilgan tan narx (WAC) va qoldiq qiymati.
+    Har bir valyuta qatori butun qoldiqni o'z valyutasida baholaydi. Qoldiq o'zgarishlarida
+    inventory/valuation.py orqali (reserve_stock/increment_stock ichida) yangilanadi.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='valuations', verbose_name="Mahsulot")
+    kassa = models.ForeignKey(Kassa, on_delete=models.CASCADE, related_name='valuations', verbose_name="Kassa/Filial")
+    currency = models.CharField(max_length=3, choices=Sale.SaleCurrency.choices, verbose_name="Valyuta")
+    quantity = models.PositiveIntegerField(default=0, verbose_name="Baholangan miqdor")
+    total_value = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal(0), verbose_name="Qoldiq qiymati")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan")
+
+    class Meta:
+        verbose_name = "Qoldiq qiymati (WAC)"
+        verbose_name_plural = "Qoldiq qiymatlari (WAC)"
+        ordering = ['kassa', 'product', 'currency']
+        constraints = [models.UniqueConstraint(fields=['product', 'kassa', 'currency'], name='unique_inventory_valuation')]
+        indexes = [models.Index(fields=['currency', 'kassa'], name='valuation_currency_kassa_idx')]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.kassa_id}: {self.quantity} x {self.average_cost} {self.currency}"
+
+    @property
+    def average_cost(self):
+        if not self.quantity:
+            return Decimal(0)
+        return (self.total_value / self.quantity).quantize(Decimal('0.01'))
+
+
+class LowStockAlert(models.Model):
+    """
+    Hozir minimal darajada yoki undan past (quantity <= minimum_stock_level) bo'lgan aksessuar qoldiqlari.
+    Har bir qoldiq o'zgarishida inventory/alerts.py yangilaydi - dashboard va ro'yxat skan qilmaydi.
+    """
+    stock = models.OneToOneField(ProductStock, on_delete=models.CASCADE, related_name='low_stock_alert',
+                                 verbose_name="Qoldiq")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='low_stock_alerts', verbose_name="Mahsulot")
+    kassa = models.ForeignKey(Kassa, on_delete=models.CASCADE, related_name='low_stock_alerts', verbose_name="Kassa/Filial")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Qachondan beri")
+
+    class Meta:
+        verbose_name = "Kam qoldiq ogohlantirishi"
+        verbose_name_plural = "Kam qoldiq ogohlantirishlari"
+        ordering = ['kassa', 'product']
+
+    def __str__(self):
+        return f"Kam qoldiq: {self.product_id} @ {self.kassa_id}"
+
+
+class StockAlertEvent(models.Model):
+    """
+    Bildirishnomalar navbati (outbox): qoldiq chegarani kesib o'tganda, o'sha tranzaksiya ichida yoziladi.
+    Iste'molchilar (bot, POS) yangi hodisalarni oladi va delivered_at ni belgilaydi.
+    """
+    class EventType(models.TextChoices):
+        LOW = 'low', "Qoldiq kamaydi"
+        RESTORED = 'restored', "Qoldiq tiklandi"
+
+    event_type = models.CharField(max_length=10, choices=EventType.choices, verbose_name="Hodisa turi")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_alert_events', verbose_name="Mahsulot")
+    kassa = models.ForeignKey(Kassa, on_delete=models.CASCADE, related_name='stock_alert_events', verbose_name="Kassa/Filial")
+    quantity = models.PositiveIntegerField(verbose_name="Qoldiq (hodisa paytida)")
+    minimum_stock_level = models.PositiveIntegerField(verbose_name="Minimal miqdor")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Vaqti")
+    delivered_at = models.DateTimeField(null=True, blank=True, verbose_name="Yetkazilgan vaqti")
+
+    class Meta:
+        verbose_name = "Qoldiq hodisasi"
+        verbose_name_plural = "Qoldiq hodisalari"
+        ordering = ['id']
+        indexes = [models.Index(fields=['delivered_at', 'id'], name='stock_alert_event_pending_idx')]
+
+    def __str__(self):
+        return f"{self.get_event_type_display()}: {self.product_id} @ {self.kassa_id} ({self.quantity}/{self.minimum_stock_level})"
+
+
 class Supplier(models.Model):
     """Mahsulot Yetkazib Beruvchilar"""
     name = models.CharField(max_length=255, verbose_name="Yetkazib beruvchi nomi/ismi")
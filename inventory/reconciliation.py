@@ -0,0 +1,176 @@
+# inventory/reconciliation.py
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q, Sum, Max, Case, When, Value, IntegerField
+from django.utils import timezone
+
+from .alerts import sync_low_stock_alerts
+from .barcode_index import mark_barcode_index_dirty
+from .models import ProductStock, InventoryOperation, StockReconciliationRun
+from .services import STOCK_UPDATE_CHUNK_SIZE
+from .valuation import record_receipt, record_issue
+
+# Bitta bo'lakdagi mahsulotlar soni (xotira shu bilan chegaralanadi, amaliyotlar soniga bog'liq emas)
+RECONCILE_CHUNK_SIZE = 500
+# Run.mismatches da saqlanadigan farqlar soni (hisoblagichlar baribir to'liq)
+RECONCILE_MISMATCH_LIMIT = 1000
+# ProductStock.updated_at UPDATE paytida qo'yiladi, commit esa keyinroq bo'lishi mumkin
+RECONCILE_STOCK_OVERLAP_SECONDS = 60
+
+
+class _ReconcileConflict(Exception):
+    """Tuzatish paytida qoldiq parallel o'zgardi - bo'lak tuzatishi bekor qilinadi"""
+
+
+def _touched_product_ids(baseline):
+    """Oldingi ishdan keyin amaliyoti yoki qoldig'i o'zgargan mahsulotlar + oldin tuzatilmay qolganlar"""
+    product_ids = set(InventoryOperation.objects.filter(id__gt=baseline.last_operation_id)
+                      .order_by().values_list('product_id', flat=True).distinct())
+    changed_after = baseline.started_at - timedelta(seconds=RECONCILE_STOCK_OVERLAP_SECONDS)
+    product_ids.update(ProductStock.objects.filter(updated_at__gte=changed_after)
+                       .order_by().values_list('product_id', flat=True).distinct())
+    product_ids.update(item['product_id'] for item in baseline.mismatches if not item.get('repaired'))
+    return sorted(product_ids)
+
+
+def _product_chunks(product_ids, chunk_size):
+    if product_ids is not None:
+        for start in range(0, len(product_ids), chunk_size):
+            yield product_ids[start:start + chunk_size]
+        return
+    # To'liq rejim: jurnalda yoki omborda uchraydigan mahsulotlar, ID bo'yicha keyset
+    from products.models import Product
+    last_id = 0
+    while True:
+        chunk = list(Product.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            return
+        last_id = chunk[-1]
+        yield chunk
+
+
+def _compare_chunk(product_ids):
+    """Natija: (tekshirilgan juftlar soni, farqlar [{product_id, kassa_id, stock_id, stock, ledger}])"""
+    ledger = {
+        (product_id, kassa_id): total for product_id, kassa_id, total in
+        InventoryOperation.objects.filter(product_id__in=product_ids).order_by()
+        .values('product_id', 'kassa_id').annotate(total=Sum('quantity'))
+        .values_list('product_id', 'kassa_id', 'total')
+    }
+    stocks = {
+        (product_id, kassa_id): (stock_id, quantity) for stock_id, product_id, kassa_id, quantity in
+        ProductStock.objects.filter(product_id__in=product_ids).values_list('id', 'product_id', 'kassa_id', 'quantity')
+    }
+    mismatches = []
+    pairs = ledger.keys() | stocks.keys()
+    for pair in sorted(pairs):
+        stock_id, quantity = stocks.get(pair, (None, 0))
+        total = ledger.get(pair) or 0
+        if quantity != total:
+            mismatches.append({'product_id': pair[0], 'kassa_id': pair[1], 'stock_id': stock_id,
+                               'stock': quantity, 'ledger': total})
+    return len(pairs), mismatches
+
+
+def _repair_chunk(run, mismatches):
+    """
+    trust=ledger: ProductStock qoldig'i jurnal yig'indisiga tenglashtiriladi (shartli UPDATE, bo'lak uchun bitta)
+    va 0 miqdorli ADJUSTMENT amaliyoti (audit) yoziladi - jurnal yig'indisi o'zgarmaydi.
+    trust=stock: qoldiq o'zgarmaydi, farq ADJUSTMENT amaliyoti sifatida jurnalga yoziladi.
+    Natija: tuzatilgan farqlar ro'yxati.
+    """
+    now = timezone.now()
+    repaired, operations = [], []
+    if run.trust == StockReconciliationRun.Trust.LEDGER:
+        updates = [item for item in mismatches if item['stock_id'] is not None and item['ledger'] >= 0]
+        for start in range(0, len(updates), STOCK_UPDATE_CHUNK_SIZE):
+            chunk = updates[start:start + STOCK_UPDATE_CHUNK_SIZE]
+            # Faqat o'qilgan qiymat o'zgarmagan bo'lsa (parallel sotuv bo'lsa - keyingi ishda)
+            condition = reduce(or_, [Q(pk=item['stock_id'], quantity=item['stock']) for item in chunk])
+            updated = ProductStock.objects.filter(condition).update(
+                quantity=Case(*[When(pk=item['stock_id'], then=Value(item['ledger'])) for item in chunk],
+                              output_field=IntegerField()),
+                updated_at=now
+            )
+            if updated != len(chunk):
+                raise _ReconcileConflict()
+        created = [item for item in mismatches if item['stock_id'] is None and item['ledger'] > 0]
+        ProductStock.objects.bulk_create([ProductStock(product_id=item['product_id'], kassa_id=item['kassa_id'],
+                                                       quantity=item['ledger']) for item in created])
+        repaired = updates + created
+        receipts, issues = {}, {}  # Qoldiq qiymati ham yangi qoldiqqa moslanadi (o'rtacha narxda)
+        for item in repaired:
+            delta = item['ledger'] - item['stock']
+            target = receipts if delta > 0 else issues
+            target.setdefault(item['kassa_id'], {})[item['product_id']] = abs(delta)
+        for kassa_id, quantities in receipts.items():
+            record_receipt(kassa_id, quantities)
+        for kassa_id, quantities in issues.items():
+            record_issue(kassa_id, quantities)
+        for item in repaired:
+            operations.append(InventoryOperation(
+                product_id=item['product_id'], kassa_id=item['kassa_id'], user=run.user, quantity=0,
+                operation_type=InventoryOperation.OperationType.ADJUSTMENT, timestamp=now,
+                comment=f"Solishtirish #{run.id}: qoldiq {item['stock']} -> {item['ledger']} (jurnal bo'yicha)"
+            ))
+    else:
+        repaired = mismatches
+        for item in repaired:
+            operations.append(InventoryOperation(
+                product_id=item['product_id'], kassa_id=item['kassa_id'], user=run.user,
+                quantity=item['stock'] - item['ledger'], operation_type=InventoryOperation.OperationType.ADJUSTMENT,
+                timestamp=now,
+                comment=f"Solishtirish #{run.id}: jurnal {item['ledger']} -> {item['stock']} (qoldiq bo'yicha)"
+            ))
+    InventoryOperation.objects.bulk_create(operations)
+    return repaired
+
+
+def reconcile_stock(full=False, repair=False, trust=StockReconciliationRun.Trust.LEDGER, user=None,
+                    chunk_size=RECONCILE_CHUNK_SIZE):
+    """
+    ProductStock.quantity ni SUM(InventoryOperation.quantity) bilan (mahsulot, kassa) bo'yicha solishtiradi.
+    Mahsulotlar bo'laklab olinadi, har bir bo'lak bitta GROUP BY so'rovi (invop_product_kassa_qty_idx
+    indeksidan) va bitta ProductStock so'rovi bilan tekshiriladi - xotira bo'lak hajmiga bog'liq.
+    full=False bo'lsa faqat oldingi ishdan keyin o'zgargan mahsulotlar tekshiriladi.
+    repair=True da farqlar bo'lak tranzaksiyasi ichida tuzatiladi (_repair_chunk).
+    """
+    baseline = StockReconciliationRun.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+    if baseline is not None and baseline.mismatch_count > len(baseline.mismatches):
+        baseline = None  # Tuzatilmagan farqlarning hammasi saqlanmagan - to'liq tekshirish kerak
+    mode = StockReconciliationRun.Mode.FULL if full or baseline is None else StockReconciliationRun.Mode.INCREMENTAL
+    run = StockReconciliationRun.objects.create(
+        mode=mode, repair=repair, trust=trust, user=user,
+        last_operation_id=InventoryOperation.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    )
+    product_ids = _touched_product_ids(baseline) if mode == StockReconciliationRun.Mode.INCREMENTAL else None
+
+    for chunk in _product_chunks(product_ids, chunk_size):
+        repaired = []
+        try:
+            # Bo'lak o'qish va tuzatish bitta tranzaksiyada (SQLite da izchil holat)
+            with transaction.atomic():
+                checked_pairs, mismatches = _compare_chunk(chunk)
+                if repair and mismatches:
+                    repaired = _repair_chunk(run, mismatches)
+                    if run.trust == StockReconciliationRun.Trust.LEDGER:
+                        sync_low_stock_alerts(product_ids={item['product_id'] for item in repaired})
+        except _ReconcileConflict:
+            print(f"Solishtirish #{run.id}: qoldiq parallel o'zgardi, bo'lak tuzatilmadi (ID {chunk[0]}..{chunk[-1]})")
+        repaired_keys = {(item['product_id'], item['kassa_id']) for item in repaired}
+        for item in mismatches:
+            item['repaired'] = (item['product_id'], item['kassa_id']) in repaired_keys
+        run.checked_products += len(chunk)
+        run.checked_pairs += checked_pairs
+        run.mismatch_count += len(mismatches)
+        run.repaired_count += len(repaired)
+        run.mismatches.extend(mismatches[:max(0, RECONCILE_MISMATCH_LIMIT - len(run.mismatches))])
+
+    if run.repaired_count:
+        mark_barcode_index_dirty()
+    run.finished_at = timezone.now()
+    run.save()
+    return run
@@ -1,8 +1,10 @@
 # inventory/serializers.py
 
 from decimal import Decimal
+from functools import reduce
+from operator import or_
 
-from django.db.models import F
+from django.db.models import F, Q, Case, When, Value, IntegerField
 from django.utils import timezone
 from rest_framework import serializers
 from django.db import transaction
@@ -11,12 +13,16 @@ from sales.models import Sale
 # from django.core.exceptions import PermissionDenied # Store tekshiruvi uchun kerak emas endi
 
 # Model importlari
-from .models import ProductStock, InventoryOperation, PurchaseOrder, PurchaseOrderItem, Supplier
-from products.models import Product, Kassa
+from .models import (ProductStock, InventoryOperation, PurchaseOrder, PurchaseOrderItem, Supplier, StockReconciliationRun,
+                     StockAlertEvent, StockCountSession)
+from .services import reserve_stock, increment_stock, STOCK_UPDATE_CHUNK_SIZE
+from .valuation import get_average_costs, unit_costs_from_price
+from products.models import Product, Kassa, Category
 # from users.models import Store # Kerak emas
 
 # Boshqa Serializer importlari
 from products.serializers import ProductSerializer, KassaSerializer
+from products.serializers import PrefetchedPrimaryKeyRelatedField, PrefetchingListSerializer
 from users.serializers import UserSerializer  # Userni ko'rsatish uchun
 
 
@@ -85,12 +91,7 @@ class InventoryAddSerializer(BaseInventoryOperationSerializer):
         comment = validated_data.get('comment')
 
         with transaction.atomic():
-            stock, created = ProductStock.objects.select_for_update().get_or_create(
-                product=product, kassa=kassa,
-                defaults={'quantity': 0}
-            )
-            stock.quantity += quantity
-            stock.save()
+            increment_stock(kassa, {product.id: quantity})
 
             operation = InventoryOperation.objects.create(
                 product=product, kassa=kassa, user=user,
@@ -141,15 +142,13 @@ class InventoryRemoveSerializer(BaseInventoryOperationSerializer):
         comment = validated_data.get('comment')
 
         with transaction.atomic():
-            stock = ProductStock.objects.select_for_update().get(product=product, kassa=kassa)
-            # Qayta tekshiruv (poyga holati uchun)
-            if stock.quantity < quantity_to_remove:
+            # Shartli UPDATE: poyga holatida ham qoldiq manfiy bo'lmaydi
+            failed = reserve_stock(kassa, {product.id: quantity_to_remove})
+            if failed:
                 raise serializers.ValidationError(
                     f"Omborda '{product.name}' dan yetarli emas (qayta tekshirish). "
-                    f"Mavjud: {stock.quantity}, So'ralgan: {quantity_to_remove}."
+                    f"Mavjud: {failed[0]['available'] or 0}, So'ralgan: {quantity_to_remove}."
                 )
-            stock.quantity -= quantity_to_remove
-            stock.save()
 
             operation = InventoryOperation.objects.create(
                 product=product, kassa=kassa, user=user,
@@ -209,20 +208,12 @@ class InventoryTransferSerializer(BaseInventoryOperationSerializer):
         comment = validated_data.get('comment')
 
         with transaction.atomic():
-            from_stock = ProductStock.objects.select_for_update().get(product=product, kassa=from_kassa)
-            if from_stock.quantity < quantity:  # Qayta tekshiruv
+            unit_costs = get_average_costs(from_kassa, [product.id])  # Kirish tomoni shu narxda baholanadi
+            if reserve_stock(from_kassa, {product.id: quantity}):  # Qayta tekshiruv (shartli UPDATE)
                 raise serializers.ValidationError(
                     f"Chiqish kassasida '{product.name}' dan yetarli emas (qayta tekshirish)."
                 )
-            from_stock.quantity -= quantity
-            from_stock.save()
-
-            to_stock, created = ProductStock.objects.select_for_update().get_or_create(
-                product=product, kassa=to_kassa,
-                defaults={'quantity': 0}
-            )
-            to_stock.quantity += quantity
-            to_stock.save()
+            increment_stock(to_kassa, {product.id: quantity}, unit_costs)
 
             out_operation = InventoryOperation.objects.create(
                 product=product, kassa=from_kassa, user=user, quantity=-quantity,
@@ -241,6 +232,260 @@ class InventoryTransferSerializer(BaseInventoryOperationSerializer):
         }
 
 
+# --- Paketli (ko'p qatorli) amaliyotlar ---
+
+INVENTORY_BATCH_MAX_LINES = 1000
+
+
+class InventoryBatchLineSerializer(serializers.Serializer):
+    product_id = PrefetchedPrimaryKeyRelatedField(queryset=Product.objects.filter(is_active=True), label="Mahsulot")
+    quantity = serializers.IntegerField(min_value=1, label="Miqdor (Musbat)")
+    comment = serializers.CharField(required=False, allow_blank=True, label="Izoh (qator uchun)")
+
+    class Meta:
+        # Barcha mahsulot ID lari bitta in_bulk so'rovi bilan tekshiriladi
+        list_serializer_class = PrefetchingListSerializer
+
+
+class BaseInventoryBatchSerializer(serializers.Serializer):
+    """
+    Bir nechta mahsulot uchun bitta amaliyot (bitta so'rov, bitta tranzaksiya).
+    Qoldiqlar bitta so'rov bilan tekshiriladi, yozuvlar bulk_create bilan yoziladi.
+    Bir mahsulot bir necha qatorda kelsa, qoldiq umumiy miqdor bo'yicha tekshiriladi.
+    """
+    items = InventoryBatchLineSerializer(many=True, allow_empty=False, max_length=INVENTORY_BATCH_MAX_LINES,
+                                         label="Qatorlar")
+    comment = serializers.CharField(required=False, allow_blank=True, label="Izoh (barcha qatorlar uchun)")
+
+    @staticmethod
+    def _quantities(items):
+        quantities = {}
+        for item in items:
+            quantities[item['product_id'].id] = quantities.get(item['product_id'].id, 0) + item['quantity']
+        return quantities
+
+    def _check_stock(self, kassa, items):
+        """Chiqim uchun: kassadagi qoldiqlar bitta so'rov bilan olinadi, yetmaganlari bitta xatoda qaytadi"""
+        quantities = self._quantities(items)
+        available = dict(ProductStock.objects.filter(kassa=kassa, product_id__in=list(quantities))
+                         .values_list('product_id', 'quantity'))
+        products = {item['product_id'].id: item['product_id'] for item in items}
+        errors = [
+            f"'{products[product_id].name}': mavjud {available.get(product_id, 0)}, so'ralgan {quantity}."
+            for product_id, quantity in quantities.items() if available.get(product_id, 0) < quantity
+        ]
+        if errors:
+            raise serializers.ValidationError({'items': [f"{kassa.name} kassasida yetarli emas:"] + errors})
+
+    def _reserve(self, kassa, items):
+        failed = reserve_stock(kassa, self._quantities(items))  # Qayta tekshiruv (shartli UPDATE)
+        if failed:
+            raise serializers.ValidationError({'items': [
+                f"{kassa.name} kassasida yetarli emas (qayta tekshirish): mahsulot ID {line['product_id']}, "
+                f"mavjud {line['available'] or 0}, so'ralgan {line['requested']}." for line in failed
+            ]})
+
+    def _operations(self, items, kassa, user, operation_type, sign, timestamp):
+        return [
+            InventoryOperation(
+                product=item['product_id'], kassa=kassa, user=user, quantity=sign * item['quantity'],
+                operation_type=operation_type, comment=item.get('comment') or self.validated_data.get('comment'),
+                timestamp=timestamp
+            ) for item in items
+        ]
+
+    def _serialize(self, operations):
+        # Javob uchun bitta so'rov (select_related bilan), qatorlar tartibi saqlanadi
+        by_id = InventoryOperation.objects.select_related(
+            'product__category', 'product__default_kassa_for_new_stock', 'user__profile', 'kassa'
+        ).in_bulk([operation.id for operation in operations])
+        return InventoryOperationSerializer([by_id[operation.id] for operation in operations], many=True,
+                                            context=self.context).data
+
+
+class InventoryBatchAddSerializer(BaseInventoryBatchSerializer):
+    """Bir kassaga bir nechta mahsulot kirimi"""
+    kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True), label="Qaysi kassaga")
+
+    def save(self, **kwargs):
+        kassa, items, user = self.validated_data['kassa_id'], self.validated_data['items'], kwargs['user']
+        with transaction.atomic():
+            increment_stock(kassa, self._quantities(items))
+            operations = InventoryOperation.objects.bulk_create(self._operations(
+                items, kassa, user, InventoryOperation.OperationType.ADD, 1, timezone.now()))
+        return {'count': len(operations), 'operations': self._serialize(operations)}
+
+
+class InventoryBatchRemoveSerializer(BaseInventoryBatchSerializer):
+    """Bir kassadan bir nechta mahsulotni hisobdan chiqarish"""
+    kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True), label="Qaysi kassadan")
+
+    def validate(self, data):
+        self._check_stock(data['kassa_id'], data['items'])
+        return data
+
+    def save(self, **kwargs):
+        kassa, items, user = self.validated_data['kassa_id'], self.validated_data['items'], kwargs['user']
+        with transaction.atomic():
+            self._reserve(kassa, items)
+            operations = InventoryOperation.objects.bulk_create(self._operations(
+                items, kassa, user, InventoryOperation.OperationType.REMOVE, -1, timezone.now()))
+        return {'count': len(operations), 'operations': self._serialize(operations)}
+
+
+class InventoryBatchTransferSerializer(BaseInventoryBatchSerializer):
+    """Bir nechta mahsulotni bir kassadan boshqasiga ko'chirish (har bir qator uchun juft amaliyot)"""
+    from_kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True), label="Qayerdan")
+    to_kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True), label="Qayerga")
+
+    def validate(self, data):
+        if data['from_kassa_id'] == data['to_kassa_id']:
+            raise serializers.ValidationError(
+                {"to_kassa_id": "Chiqish va kirish kassalari bir xil bo'lishi mumkin emas."})
+        self._check_stock(data['from_kassa_id'], data['items'])
+        return data
+
+    def save(self, **kwargs):
+        from_kassa, to_kassa = self.validated_data['from_kassa_id'], self.validated_data['to_kassa_id']
+        items, user, timestamp = self.validated_data['items'], kwargs['user'], timezone.now()
+        with transaction.atomic():
+            unit_costs = get_average_costs(from_kassa, self._quantities(items))  # Chiqish kassasidagi WAC
+            self._reserve(from_kassa, items)
+            increment_stock(to_kassa, self._quantities(items), unit_costs)
+
+            out_operations = InventoryOperation.objects.bulk_create(self._operations(
+                items, from_kassa, user, InventoryOperation.OperationType.TRANSFER_OUT, -1, timestamp))
+            in_operations = self._operations(items, to_kassa, user, InventoryOperation.OperationType.TRANSFER_IN,
+                                             1, timestamp)
+            for in_operation, out_operation in zip(in_operations, out_operations):
+                in_operation.related_operation = out_operation
+            in_operations = InventoryOperation.objects.bulk_create(in_operations)
+            # Juftlikning ikkinchi tomoni (chiqish -> kirish) bitta UPDATE bilan
+            for in_operation, out_operation in zip(in_operations, out_operations):
+                out_operation.related_operation = in_operation
+            InventoryOperation.objects.bulk_update(out_operations, ['related_operation'])
+        out_data, in_data = self._serialize(out_operations), self._serialize(in_operations)
+        return {
+            'count': len(out_operations),
+            'transfers': [{'transfer_out': out_item, 'transfer_in': in_item}
+                          for out_item, in_item in zip(out_data, in_data)]
+        }
+
+
+class StockReconciliationRunSerializer(serializers.ModelSerializer):
+    mode_display = serializers.CharField(source='get_mode_display', read_only=True)
+    user_username = serializers.CharField(source='user.username', read_only=True, allow_null=True)
+
+    class Meta:
+        model = StockReconciliationRun
+        fields = ['id', 'mode', 'mode_display', 'repair', 'trust', 'user', 'user_username', 'started_at',
+                  'finished_at', 'last_operation_id', 'checked_products', 'checked_pairs', 'mismatch_count',
+                  'repaired_count', 'mismatches']
+
+
+class StockReconciliationRequestSerializer(serializers.Serializer):
+    full = serializers.BooleanField(default=False, label="To'liq tekshirish",
+                                    help_text="false - faqat oldingi solishtiruvdan keyin o'zgarganlar")
+    repair = serializers.BooleanField(default=False, label="Farqlarni tuzatish")
+    trust = serializers.ChoiceField(choices=StockReconciliationRun.Trust.choices,
+                                    default=StockReconciliationRun.Trust.LEDGER, label="Asos")
+
+
+class StockAlertEventSerializer(serializers.ModelSerializer):
+    event_type_display = serializers.CharField(source='get_event_type_display', read_only=True)
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    kassa_name = serializers.CharField(source='kassa.name', read_only=True)
+
+    class Meta:
+        model = StockAlertEvent
+        fields = ['id', 'event_type', 'event_type_display', 'product', 'product_name', 'kassa', 'kassa_name',
+                  'quantity', 'minimum_stock_level', 'created_at', 'delivered_at']
+
+
+class StockAlertEventAckSerializer(serializers.Serializer):
+    up_to_id = serializers.IntegerField(min_value=1, required=False, label="Shu ID gacha (shu ham)")
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_empty=False,
+                                max_length=1000, label="Hodisa ID lari")
+
+    def validate(self, data):
+        if not data.get('up_to_id') and not data.get('ids'):
+            raise serializers.ValidationError("'up_to_id' yoki 'ids' berilishi kerak.")
+        return data
+
+
+STOCK_COUNT_SCAN_MAX_LINES = 5000
+
+
+class StockCountSessionSerializer(serializers.ModelSerializer):
+    kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True), source='kassa',
+                                                  label="Kassa")
+    kassa_name = serializers.CharField(source='kassa.name', read_only=True)
+    category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), source='category',
+                                                     required=False, allow_null=True, label="Kategoriya")
+    category_name = serializers.CharField(source='category.name', read_only=True, allow_null=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    opened_by_username = serializers.CharField(source='opened_by.username', read_only=True, allow_null=True)
+    posted_by_username = serializers.CharField(source='posted_by.username', read_only=True, allow_null=True)
+    lines_count = serializers.IntegerField(read_only=True, default=0)
+
+    class Meta:
+        model = StockCountSession
+        fields = ['id', 'kassa_id', 'kassa_name', 'category_id', 'category_name', 'scope', 'status', 'status_display',
+                  'comment', 'opened_by_username', 'created_at', 'posted_by_username', 'posted_at', 'lines_count',
+                  'adjusted_products', 'surplus_quantity', 'shortage_quantity']
+        read_only_fields = ['status', 'created_at', 'posted_at', 'adjusted_products', 'surplus_quantity',
+                            'shortage_quantity']
+
+    def validate_kassa_id(self, kassa):
+        if StockCountSession.objects.filter(kassa=kassa, status=StockCountSession.Status.OPEN).exists():
+            raise serializers.ValidationError("Bu kassada ochiq inventarizatsiya sessiyasi allaqachon bor.")
+        return kassa
+
+
+class StockCountScanItemSerializer(serializers.Serializer):
+    barcode = serializers.CharField(required=False, allow_blank=False, max_length=100)
+    product_id = serializers.IntegerField(required=False, min_value=1)
+    quantity = serializers.IntegerField(default=1, min_value=0)
+
+    def validate(self, data):
+        if not data.get('barcode') and not data.get('product_id'):
+            raise serializers.ValidationError("'barcode' yoki 'product_id' kerak.")
+        return data
+
+
+class StockCountScanSerializer(serializers.Serializer):
+    """
+    Skaner to'plami: {"barcodes": ["...", ...]} (har biri 1 dona) va/yoki
+    {"items": [{"barcode" | "product_id", "quantity"}]}. mode=set sanalgan miqdorni qayta yozadi.
+    """
+    barcodes = serializers.ListField(child=serializers.CharField(max_length=100), required=False,
+                                     max_length=STOCK_COUNT_SCAN_MAX_LINES, label="Skanerlangan barcodelar")
+    items = StockCountScanItemSerializer(many=True, required=False, max_length=STOCK_COUNT_SCAN_MAX_LINES,
+                                         label="Qatorlar")
+    mode = serializers.ChoiceField(choices=[('add', "Qo'shish"), ('set', "Qayta yozish")], default='add')
+
+    def validate(self, data):
+        if not data.get('barcodes') and not data.get('items'):
+            raise serializers.ValidationError("'barcodes' yoki 'items' bo'sh.")
+        return data
+
+    def get_scans(self):
+        scans = [(barcode.strip(), None, 1) for barcode in self.validated_data.get('barcodes', []) if barcode.strip()]
+        scans.extend((item.get('barcode'), item.get('product_id'), item['quantity'])
+                     for item in self.validated_data.get('items', []))
+        return scans
+
+
+class StockCountVarianceSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField(source='id')
+    name = serializers.CharField()
+    barcode = serializers.CharField(allow_null=True)
+    system_quantity = serializers.IntegerField()  # Skaner paytidagi qoldiq
+    current_quantity = serializers.IntegerField()  # Hozirgi qoldiq (o'tkazishda variance shunga qo'shiladi)
+    counted_quantity = serializers.IntegerField()
+    variance = serializers.IntegerField()
+
+
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
         model = Supplier
@@ -248,10 +493,14 @@ class SupplierSerializer(serializers.ModelSerializer):
 
 
 class PurchaseOrderItemInputSerializer(serializers.Serializer):
-    product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    product_id = PrefetchedPrimaryKeyRelatedField(queryset=Product.objects.all())
     quantity_ordered = serializers.IntegerField(min_value=1)
     purchase_price_currency = serializers.DecimalField(max_digits=17, decimal_places=2, min_value=Decimal('0.01'))
-    target_kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True))
+    target_kassa_id = PrefetchedPrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True))
+
+    class Meta:
+        # Barcha mahsulot va kassa ID lari ro'yxat bo'yicha bitta so'rov bilan tekshiriladi
+        list_serializer_class = PrefetchingListSerializer
 
 
 class PurchaseOrderCreateSerializer(serializers.Serializer):
@@ -264,7 +513,7 @@ class PurchaseOrderCreateSerializer(serializers.Serializer):
     # ... (yangi supplier uchun boshqa maydonlar) ...
 
     order_date = serializers.DateTimeField(default=timezone.now)  # Yoki DateField
-    currency = serializers.ChoiceField(choices=Sale.SaleCurrency.choices)# <<<--- O'ZGARTIRILDI
+    currency = serializers.ChoiceField(choices=Sale.SaleCurrency.choices, source='currency_choices')  # Modelda currency_choices
     amount_paid = serializers.DecimalField(max_digits=17, decimal_places=2, default=Decimal(0), min_value=Decimal(0))
     due_date_for_remaining = serializers.DateField(required=False, allow_null=True)
     notes = serializers.CharField(required=False, allow_blank=True)
@@ -361,13 +610,9 @@ class ReceivePurchaseItemSerializer(serializers.Serializer):
         item.quantity_received += quantity_received_now
         item.save(update_fields=['quantity_received'])
 
-        # 2. ProductStock ga kirim qilish
-        stock, _ = ProductStock.objects.get_or_create(
-            product=item.product, kassa=item.target_kassa,
-            defaults={'quantity': 0}
-        )
-        stock.quantity += quantity_received_now
-        stock.save(update_fields=['quantity'])
+        # 2. ProductStock ga kirim qilish (xarid narxida baholanadi)
+        unit_cost = unit_costs_from_price(item.purchase_price_currency, item.purchase_order.currency_choices)
+        increment_stock(item.target_kassa, {item.product_id: quantity_received_now}, {item.product_id: unit_cost})
 
         # 3. InventoryOperation yaratish
         InventoryOperation.objects.create(
@@ -389,6 +634,106 @@ class ReceivePurchaseItemSerializer(serializers.Serializer):
         return item  # Qabul qilingan itemni qaytarish
 
 
+class ReceivePurchaseLineSerializer(serializers.Serializer):
+    purchase_order_item_id = serializers.IntegerField(min_value=1)
+    quantity_received_now = serializers.IntegerField(min_value=1)
+
+
+class ReceivePurchaseItemsBulkSerializer(serializers.Serializer):
+    """
+    Xaridning bir nechta qatorini (yoki receive_all=true bilan kutilayotgan hammasini) bitta so'rovda qabul qilish.
+    Qatorlar bitta so'rov bilan o'qiladi, qabul qilingan miqdorlar shartli UPDATE bilan, qoldiqlar kassa bo'yicha
+    increment_stock bilan, amaliyotlar bulk_create bilan yoziladi, xarid holati bir marta hisoblanadi.
+    context['purchase_order'] kerak.
+    """
+    items = ReceivePurchaseLineSerializer(many=True, required=False, allow_empty=False,
+                                          max_length=INVENTORY_BATCH_MAX_LINES)
+    receive_all = serializers.BooleanField(default=False, label="Kutilayotgan hammasini qabul qilish")
+    comment = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, data):
+        if bool(data.get('items')) == data['receive_all']:
+            raise serializers.ValidationError("'items' yoki 'receive_all' dan faqat bittasi berilishi kerak.")
+        order = self.context['purchase_order']
+        if order.status == PurchaseOrder.PurchaseStatus.CANCELLED:
+            raise serializers.ValidationError("Bekor qilingan xarid qabul qilinmaydi.")
+        order_items = {item.id: item for item in order.items.select_related('target_kassa')}
+        quantities = {}
+        if data['receive_all']:
+            quantities = {item_id: item.quantity_pending_receive for item_id, item in order_items.items()
+                          if item.quantity_pending_receive > 0}
+            if not quantities:
+                raise serializers.ValidationError("Qabul qilinadigan mahsulot qolmagan.")
+        else:
+            for line in data['items']:
+                item_id = line['purchase_order_item_id']
+                if item_id not in order_items:
+                    raise serializers.ValidationError(f"#{item_id} qatori bu xaridga tegishli emas.")
+                quantities[item_id] = quantities.get(item_id, 0) + line['quantity_received_now']
+            errors = [f"#{item_id}: faqat {order_items[item_id].quantity_pending_receive} dona qabul qilish mumkin."
+                      for item_id, quantity in quantities.items()
+                      if quantity > order_items[item_id].quantity_pending_receive]
+            if errors:
+                raise serializers.ValidationError(errors)
+        data['order_items'] = order_items
+        data['quantities'] = quantities
+        return data
+
+    @transaction.atomic
+    def save(self, **kwargs):
+        user = kwargs.get('user')
+        order = self.context['purchase_order']
+        order_items = self.validated_data['order_items']
+        quantities = self.validated_data['quantities']
+        comment = self.validated_data.get('comment')
+        lines = list(quantities.items())
+
+        # 1. quantity_received - faqat o'qilgan qiymat o'zgarmagan bo'lsa (parallel qabul qilishdan himoya)
+        updated = 0
+        for start in range(0, len(lines), STOCK_UPDATE_CHUNK_SIZE):
+            chunk = lines[start:start + STOCK_UPDATE_CHUNK_SIZE]
+            condition = reduce(or_, [Q(pk=item_id, quantity_received=order_items[item_id].quantity_received)
+                                     for item_id, _ in chunk])
+            updated += PurchaseOrderItem.objects.filter(condition).update(
+                quantity_received=F('quantity_received') + Case(
+                    *[When(pk=item_id, then=Value(quantity)) for item_id, quantity in chunk],
+                    output_field=IntegerField()))
+        if updated != len(lines):
+            raise serializers.ValidationError("Xarid qatorlari parallel o'zgardi, qayta urinib ko'ring.")
+
+        # 2. Qoldiqlar - har bir kassa uchun bitta increment_stock (xarid narxida baholanadi)
+        from settings_app.models import CurrencyRate  # Sikl importning oldini olish uchun
+        rate = CurrencyRate.load().usd_to_uzs_rate
+        by_kassa = {}
+        for item_id, quantity in lines:
+            item = order_items[item_id]
+            item.quantity_received += quantity
+            kassa_lines = by_kassa.setdefault(item.target_kassa_id, (item.target_kassa, {}, {}))
+            kassa_lines[1][item.product_id] = kassa_lines[1].get(item.product_id, 0) + quantity
+            kassa_lines[2][item.product_id] = unit_costs_from_price(item.purchase_price_currency,
+                                                                    order.currency_choices, rate)
+        for kassa, kassa_quantities, unit_costs in by_kassa.values():
+            increment_stock(kassa, kassa_quantities, unit_costs)
+
+        # 3. InventoryOperation lar
+        now = timezone.now()
+        InventoryOperation.objects.bulk_create([
+            InventoryOperation(
+                product_id=order_items[item_id].product_id, kassa_id=order_items[item_id].target_kassa_id, user=user,
+                quantity=quantity, operation_type=InventoryOperation.OperationType.ADD, timestamp=now,
+                comment=f"Xarid #{order.id} dan qabul qilindi. Izoh: {comment or '-'}"
+            ) for item_id, quantity in lines
+        ])
+
+        # 4. PurchaseOrder statusi bir marta
+        if all(item.quantity_received >= item.quantity_ordered for item in order_items.values()):
+            order.status = PurchaseOrder.PurchaseStatus.RECEIVED
+        else:
+            order.status = PurchaseOrder.PurchaseStatus.PARTIALLY_RECEIVED
+        order.save(update_fields=['status'])
+        return order
+
+
 # Chiqish uchun serializerlar (List/Detail)
 class PurchaseOrderItemDetailSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -0,0 +1,96 @@
+# inventory/services.py
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import F, Q, Case, When, Value, IntegerField
+from django.utils import timezone
+
+from .models import ProductStock
+from .barcode_index import mark_barcode_index_dirty
+from .alerts import sync_low_stock_alerts
+from .valuation import record_receipt, record_issue
+
+# Bitta UPDATE dagi OR shartlari soni (SQLite ifoda chuqurligi chegarasi uchun)
+STOCK_UPDATE_CHUNK_SIZE = 200
+
+
+class _StockShortage(Exception):
+    """Savepointni bekor qilish uchun ichki signal"""
+
+
+def _chunks(items, size=STOCK_UPDATE_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _quantity_case(lines):
+    return Case(*[When(product_id=product_id, then=Value(quantity)) for product_id, quantity in lines],
+                output_field=IntegerField())
+
+
+def reserve_stock(kassa, quantities):
+    """
+    Kassadagi qoldiqlarni shartli UPDATE bilan kamaytiradi:
+    UPDATE ... SET quantity = quantity - n WHERE quantity >= n.
+    SELECT FOR UPDATE ga tayanmaydi (SQLite da u hech narsa qilmaydi), shuning uchun
+    parallel sotuvlarda ham qoldiq manfiy bo'lmaydi.
+
+    quantities: {product_id: miqdor}
+    Natija: yetishmagan qatorlar ro'yxati [{'product_id', 'requested', 'available'}].
+    Ro'yxat bo'sh bo'lmasa, hech bir qator o'zgartirilmaydi.
+    """
+    lines = [(product_id, quantity) for product_id, quantity in quantities.items() if quantity]
+    if not lines:
+        return []
+    try:
+        with transaction.atomic():
+            updated = 0
+            for chunk in _chunks(lines):
+                condition = reduce(or_, [Q(product_id=product_id, quantity__gte=quantity)
+                                         for product_id, quantity in chunk])
+                updated += ProductStock.objects.filter(condition, kassa=kassa).update(
+                    quantity=F('quantity') - _quantity_case(chunk), updated_at=timezone.now())
+            if updated != len(lines):
+                raise _StockShortage()
+            record_issue(kassa, dict(lines))  # Qiymat o'rtacha tan narxda kamayadi
+            sync_low_stock_alerts(kassa=kassa, product_ids=[product_id for product_id, _ in lines])
+            mark_barcode_index_dirty()
+    except _StockShortage:
+        available = dict(ProductStock.objects.filter(
+            kassa=kassa, product_id__in=[product_id for product_id, _ in lines]
+        ).values_list('product_id', 'quantity'))
+        failed = [
+            {'product_id': product_id, 'requested': quantity, 'available': available.get(product_id)}
+            for product_id, quantity in lines
+            if available.get(product_id) is None or available[product_id] < quantity
+        ]
+        # Bekor qilish va qayta o'qish orasida qoldiq to'ldirilgan bo'lishi mumkin: bo'sh ro'yxat
+        # "muvaffaqiyat" degani, lekin hech narsa kamaytirilmagan - shuning uchun hammasi xato deb qaytariladi
+        return failed or [{'product_id': product_id, 'requested': quantity, 'available': available.get(product_id)}
+                          for product_id, quantity in lines]
+    return []
+
+
+def increment_stock(kassa, quantities, unit_costs=None):
+    """
+    Kassadagi qoldiqlarni oshiradi (kirim, qaytarish, ko'chirishning kirish tomoni).
+    Yetishmayotgan ProductStock yozuvlari 0 miqdor bilan yaratiladi, so'ng
+    barcha qatorlar bitta UPDATE ... SET quantity = quantity + n bilan oshiriladi.
+    unit_costs {product_id: {valyuta: narx}} - kirim tan narxi (xarid, ko'chirish); berilmasa
+    joriy o'rtacha narx olinadi (inventory/valuation.py).
+    """
+    lines = [(product_id, quantity) for product_id, quantity in quantities.items() if quantity]
+    if not lines:
+        return
+    with transaction.atomic():
+        ProductStock.objects.bulk_create(
+            [ProductStock(product_id=product_id, kassa=kassa, quantity=0) for product_id, _ in lines],
+            ignore_conflicts=True
+        )
+        for chunk in _chunks(lines):
+            ProductStock.objects.filter(kassa=kassa, product_id__in=[product_id for product_id, _ in chunk]).update(
+                quantity=F('quantity') + _quantity_case(chunk), updated_at=timezone.now())
+        record_receipt(kassa, dict(lines), unit_costs)
+        sync_low_stock_alerts(kassa=kassa, product_ids=[product_id for product_id, _ in lines])
+        mark_barcode_index_dirty()
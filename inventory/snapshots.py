@@ -0,0 +1,91 @@
+# inventory/snapshots.py
+import calendar
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import InventoryOperation, StockSnapshot
+
+SNAPSHOT_BATCH_SIZE = 2000
+OPERATIONS_FETCH_SIZE = 5000
+SNAPSHOT_PERIODS = ('daily', 'monthly')
+
+
+def day_end(day):
+    """day kunining oxiri = keyingi kunning boshi (joriy vaqt zonasida)"""
+    return timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+
+def nearest_snapshot_date(as_of_date):
+    return StockSnapshot.objects.filter(snapshot_date__lte=as_of_date).aggregate(
+        last=Max('snapshot_date'))['last']
+
+
+def get_stock_as_of(as_of_date, kassa_id=None, category_id=None, product_ids=None, include_zero=False):
+    """
+    as_of_date kuni oxiridagi qoldiqlar {(product_id, kassa_id): miqdor} (0 lar kiritilmaydi,
+    include_zero=True bo'lsa snapshot yoki oraliq amaliyotlarida uchragan 0 lar ham qoladi).
+    Eng yaqin oldingi snapshot olinadi va faqat undan keyingi amaliyotlar qo'shiladi,
+    ya'ni narx butun tarixga emas, mahsulotlar soni + oraliqdagi amaliyotlarga bog'liq.
+    Snapshot bo'lmasa boshidan hisoblanadi.
+    """
+    filters = {}
+    if kassa_id: filters['kassa_id'] = kassa_id
+    if category_id: filters['product__category_id'] = category_id
+    if product_ids is not None: filters['product_id__in'] = product_ids
+
+    snapshot_date = nearest_snapshot_date(as_of_date)
+    quantities = {}
+    operations = InventoryOperation.objects.filter(timestamp__lt=day_end(as_of_date), **filters)
+    if snapshot_date is not None:
+        quantities = {
+            (product_id, kassa): quantity for product_id, kassa, quantity in
+            StockSnapshot.objects.filter(snapshot_date=snapshot_date, **filters)
+            .values_list('product_id', 'kassa_id', 'quantity')
+        }
+        operations = operations.filter(timestamp__gte=day_end(snapshot_date))
+    # GROUP BY emas: SQLite unda (product, kassa) indeksini tanlab butun jadvalni o'qiydi.
+    # Oddiy SELECT vaqt oralig'ini invop_timestamp_idx (covering) dan oladi, yig'indi shu yerda.
+    for product_id, kassa, quantity in (operations.order_by().values_list('product_id', 'kassa_id', 'quantity')
+                                        .iterator(chunk_size=OPERATIONS_FETCH_SIZE)):
+        quantities[(product_id, kassa)] = quantities.get((product_id, kassa), 0) + quantity
+    if include_zero:
+        return quantities
+    return {pair: quantity for pair, quantity in quantities.items() if quantity}
+
+
+def snapshot_date_for_period(period, today=None):
+    """Oxirgi tugagan kun (daily) yoki oxirgi tugagan oyning oxirgi kuni (monthly)"""
+    today = today or timezone.localdate()
+    if period == 'monthly':
+        first_of_month = today.replace(day=1)
+        return first_of_month - timedelta(days=1)
+    return today - timedelta(days=1)
+
+
+def is_period_end(day, period):
+    return period == 'daily' or day.day == calendar.monthrange(day.year, day.month)[1]
+
+
+def create_stock_snapshot(snapshot_date, force=False):
+    """
+    snapshot_date kuni oxiridagi holatni StockSnapshot ga yozadi (oldingi snapshot + oraliqdagi amaliyotlar).
+    Natija: (yozilgan qatorlar soni, yaratildimi). Snapshot allaqachon bo'lsa force=True bilan qayta yoziladi.
+    """
+    if snapshot_date >= timezone.localdate():
+        raise ValueError("Snapshot faqat tugagan kunlar uchun olinadi.")
+    with transaction.atomic():
+        existing = StockSnapshot.objects.filter(snapshot_date=snapshot_date)
+        if existing.exists():
+            if not force:
+                return existing.count(), False
+            existing.delete()
+        quantities = get_stock_as_of(snapshot_date)
+        StockSnapshot.objects.bulk_create(
+            [StockSnapshot(snapshot_date=snapshot_date, product_id=product_id, kassa_id=kassa_id, quantity=quantity)
+             for (product_id, kassa_id), quantity in quantities.items()],
+            batch_size=SNAPSHOT_BATCH_SIZE
+        )
+    return len(quantities), True
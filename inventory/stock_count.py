@@ -0,0 +1,184 @@
+# inventory/stock_count.py
+from django.db import transaction
+from django.db.models import Q, F, Sum, Count, FilteredRelation
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.models import Product
+from .models import StockCountSession, StockCountLine, InventoryOperation, ProductStock
+from .services import reserve_stock, increment_stock, _chunks, _quantity_case
+
+# Barcode/ID bo'yicha qidiruvdagi bitta so'rov hajmi (SQLite parametr chegarasi)
+SCAN_LOOKUP_CHUNK_SIZE = 500
+SCAN_MODE_ADD = 'add'  # Skanerlar qo'shiladi (har bir skaner +1)
+SCAN_MODE_SET = 'set'  # Sanalgan miqdor qayta yoziladi (qo'lda tuzatish)
+
+
+class StockCountError(Exception):
+    """Sessiya holati yoki o'tkazish bilan bog'liq xatolik"""
+
+
+def _resolve_products(session, barcodes, product_ids):
+    """Natija: ({barcode: product_id}, {product_id}, noma'lum barcodelar, qamrovdan tashqari ID lar)"""
+    queryset = Product.objects.order_by()
+    by_barcode, known_ids = {}, set()
+    out_of_scope = set()
+    barcodes = list(barcodes)
+    for chunk in _chunks(barcodes, SCAN_LOOKUP_CHUNK_SIZE):
+        for barcode, product_id, category_id in queryset.filter(barcode__in=chunk).values_list('barcode', 'id', 'category_id'):
+            by_barcode[barcode] = product_id
+            if session.category_id and category_id != session.category_id:
+                out_of_scope.add(product_id)
+    product_ids = list(product_ids)
+    for chunk in _chunks(product_ids, SCAN_LOOKUP_CHUNK_SIZE):
+        for product_id, category_id in queryset.filter(id__in=chunk).values_list('id', 'category_id'):
+            known_ids.add(product_id)
+            if session.category_id and category_id != session.category_id:
+                out_of_scope.add(product_id)
+    unknown = sorted({barcode for barcode in barcodes if barcode not in by_barcode})
+    unknown_ids = sorted(set(product_ids) - known_ids)
+    return by_barcode, known_ids, unknown, unknown_ids, sorted(out_of_scope)
+
+
+def record_scans(session, scans, mode=SCAN_MODE_ADD):
+    """
+    Skaner to'plamini sessiyaga yozadi. scans: [(barcode yoki None, product_id yoki None, miqdor)].
+    To'plam avval mahsulot bo'yicha yig'iladi, so'ng yangi qatorlar bulk_create va
+    mavjudlari bitta UPDATE ... SET counted_quantity = counted_quantity + n bilan (mode=add)
+    yoki bulk upsert bilan (mode=set) yoziladi - skaner soniga emas, mahsulot soniga bog'liq.
+    """
+    if session.status != StockCountSession.Status.OPEN:
+        raise StockCountError("Sessiya ochiq emas, skanerlash mumkin emas.")
+    by_barcode, known_ids, unknown, unknown_ids, out_of_scope = _resolve_products(
+        session,
+        {barcode for barcode, _, _ in scans if barcode},
+        {product_id for barcode, product_id, _ in scans if not barcode and product_id}
+    )
+    skipped = set(out_of_scope)
+    quantities = {}
+    accepted = 0
+    for barcode, product_id, quantity in scans:
+        product_id = by_barcode.get(barcode) if barcode else (product_id if product_id in known_ids else None)
+        if product_id is None or product_id in skipped:
+            continue
+        accepted += 1
+        if mode == SCAN_MODE_SET:
+            quantities[product_id] = quantity  # Oxirgisi hisoblanadi
+        else:
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+
+    now = timezone.now()
+    lines = list(quantities.items())
+    with transaction.atomic():
+        # Skaner paytidagi tizim qoldig'i (farq shunga nisbatan hisoblanadi)
+        system = {}
+        for chunk in _chunks([product_id for product_id, _ in lines], SCAN_LOOKUP_CHUNK_SIZE):
+            system.update(ProductStock.objects.filter(kassa_id=session.kassa_id, product_id__in=chunk)
+                          .values_list('product_id', 'quantity'))
+        if mode == SCAN_MODE_SET:
+            # Qayta sanash - hozirgi holat, shuning uchun tizim qoldig'i ham yangilanadi
+            StockCountLine.objects.bulk_create(
+                [StockCountLine(session=session, product_id=product_id, counted_quantity=quantity,
+                                system_quantity=system.get(product_id, 0), updated_at=now)
+                 for product_id, quantity in lines],
+                update_conflicts=True, unique_fields=['session', 'product'],
+                update_fields=['counted_quantity', 'system_quantity', 'updated_at']
+            )
+        else:
+            # Mavjud qatorlarda birinchi skaner paytidagi qoldiq qoladi
+            StockCountLine.objects.bulk_create(
+                [StockCountLine(session=session, product_id=product_id, counted_quantity=0,
+                                system_quantity=system.get(product_id, 0), updated_at=now)
+                 for product_id, _ in lines],
+                ignore_conflicts=True
+            )
+            for chunk in _chunks(lines):
+                StockCountLine.objects.filter(session=session, product_id__in=[product_id for product_id, _ in chunk]) \
+                    .update(counted_quantity=F('counted_quantity') + _quantity_case(chunk), updated_at=now)
+    return {
+        'accepted': accepted,
+        'products': len(quantities),
+        'unknown_barcodes': unknown,
+        'unknown_product_ids': unknown_ids,
+        'out_of_scope_product_ids': out_of_scope,
+        'lines_total': session.lines.count(),
+    }
+
+
+def count_variances(session):
+    """
+    Sanoq va ProductStock farqlari - bitta so'rov: Product dan kassa qoldig'i va sessiya qatori
+    (FilteredRelation, har biri ko'pi bilan bitta qator) LEFT JOIN bilan olinadi.
+    Qisman sessiyada faqat sanalgan mahsulotlar, to'liq sessiyada qoldig'i bor sanalmaganlar ham (0 deb).
+    system_quantity - skaner paytidagi qoldiq (sanalmaganlar va eski qatorlar uchun joriy qoldiq).
+    Natija: farqi 0 bo'lmagan mahsulotlar queryseti (system_quantity, counted_quantity, variance, current_quantity).
+    """
+    queryset = Product.objects.annotate(
+        count_stock=FilteredRelation('stocks', condition=Q(stocks__kassa_id=session.kassa_id)),
+        count_line=FilteredRelation('stock_count_lines', condition=Q(stock_count_lines__session_id=session.id)),
+    )
+    present = Q(count_line__counted_quantity__isnull=False)
+    if session.scope == StockCountSession.Scope.FULL:
+        present |= Q(count_stock__quantity__gt=0)
+    queryset = queryset.filter(present)
+    if session.category_id:
+        queryset = queryset.filter(category_id=session.category_id)
+    return queryset.annotate(
+        current_quantity=Coalesce(F('count_stock__quantity'), 0),
+        system_quantity=Coalesce(F('count_line__system_quantity'), F('count_stock__quantity'), 0),
+        counted_quantity=Coalesce(F('count_line__counted_quantity'), 0),
+    ).annotate(variance=F('counted_quantity') - F('system_quantity')).exclude(variance=0).order_by('name')
+
+
+def variance_summary(session):
+    return count_variances(session).order_by().aggregate(
+        products=Count('id'),
+        surplus=Coalesce(Sum('variance', filter=Q(variance__gt=0)), 0),
+        shortage=Coalesce(Sum('variance', filter=Q(variance__lt=0)), 0),
+    )
+
+
+def post_stock_count(session, user=None):
+    """
+    Farqlarni bitta tranzaksiyada o'tkazadi: kamomad reserve_stock, ortiqcha increment_stock
+    (bo'laklangan shartli UPDATE lar) va har bir farq uchun STOCK_COUNT amaliyoti (bulk_create).
+    Farq = sanalgan - skaner paytidagi qoldiq, va u joriy qoldiqqa o'zgarish sifatida qo'shiladi:
+    skanerdan keyin, o'tkazishdan oldin bo'lgan sotuvlar saqlanib qoladi (qoldiqqa qaytarilmaydi).
+    """
+    kassa = session.kassa
+    now = timezone.now()
+    with transaction.atomic():
+        # Shartli UPDATE birinchi: ikki marta o'tkazishning oldini oladi va yozish qulfini oladi
+        if not StockCountSession.objects.filter(pk=session.pk, status=StockCountSession.Status.OPEN).update(
+                status=StockCountSession.Status.POSTED, posted_at=now, posted_by=user):
+            raise StockCountError("Sessiya ochiq emas (allaqachon o'tkazilgan yoki bekor qilingan).")
+        variances = list(count_variances(session).values_list('id', 'system_quantity', 'counted_quantity', 'variance'))
+        shortages = {product_id: -variance for product_id, _, _, variance in variances if variance < 0}
+        failed = reserve_stock(kassa, shortages)
+        if failed:
+            raise StockCountError(f"Kamomadni hisobdan chiqarish uchun qoldiq yetarli emas "
+                                  f"(skanerdan keyin sotilgan): {failed[:5]}")
+        increment_stock(kassa, {product_id: variance for product_id, _, _, variance in variances if variance > 0})
+        InventoryOperation.objects.bulk_create([
+            InventoryOperation(
+                product_id=product_id, kassa=kassa, user=user, quantity=variance,
+                operation_type=InventoryOperation.OperationType.STOCK_COUNT, timestamp=now,
+                comment=f"Inventarizatsiya #{session.id}: {system_quantity} -> {counted_quantity}"
+            ) for product_id, system_quantity, counted_quantity, variance in variances
+        ], batch_size=2000)
+        session.status = StockCountSession.Status.POSTED
+        session.posted_at, session.posted_by = now, user
+        session.adjusted_products = len(variances)
+        session.surplus_quantity = sum(variance for _, _, _, variance in variances if variance > 0)
+        session.shortage_quantity = sum(shortages.values())
+        session.save(update_fields=['status', 'posted_at', 'posted_by', 'adjusted_products', 'surplus_quantity',
+                                    'shortage_quantity'])
+    return session
+
+
+def cancel_stock_count(session, user=None):
+    if not StockCountSession.objects.filter(pk=session.pk, status=StockCountSession.Status.OPEN).update(
+            status=StockCountSession.Status.CANCELLED, posted_at=timezone.now(), posted_by=user):
+        raise StockCountError("Faqat ochiq sessiyani bekor qilish mumkin.")
+    session.refresh_from_db()
+    return session
@@ -1,3 +1,32 @@
+from decimal import Decimal
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from products.models import Kassa, Product
+from sales.models import Sale
+from settings_app.models import CurrencyRate
+from .models import ProductStock, InventoryValuation
+from .services import increment_stock
+
+
+class ReceiptWithoutCurrencyRateTests(TestCase):
+    """Yangi bazada (CurrencyRate yozuvi yo'q) kirim: default kurs float bo'lib keladi"""
+
+    def setUp(self):
+        cache.delete(CurrencyRate.__name__)
+        self.kassa = Kassa.objects.create(name="Asosiy")
+
+    def test_receipt_values_stock_with_default_rate(self):
+        self.assertFalse(CurrencyRate.objects.exists())
+        usd_product = Product.objects.create(name="Telefon", purchase_price_usd=Decimal('100'))
+        uzs_product = Product.objects.create(name="G'ilof", purchase_price_uzs=Decimal('26000'))
+
+        increment_stock(self.kassa, {usd_product.id: 2, uzs_product.id: 1})
+
+        self.assertEqual(ProductStock.objects.get(kassa=self.kassa, product=usd_product).quantity, 2)
+        values = {(product_id, currency): total_value for product_id, currency, total_value in
+                  InventoryValuation.objects.filter(kassa=self.kassa)
+                  .values_list('product_id', 'currency', 'total_value')}
+        self.assertEqual(values[(usd_product.id, Sale.SaleCurrency.UZS)], Decimal('2600000.00'))
+        self.assertEqual(values[(uzs_product.id, Sale.SaleCurrency.USD)], Decimal('2.00'))
@@ -5,10 +5,14 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     LowStockListView,  # Bu alohida qolishi mumkin, chunki u faqat aksessuarlar uchun edi
     InventoryOperationView,
+    InventoryBatchOperationView,
+    StockReconciliationView,
+    StockAlertEventView,
     InventoryHistoryListView,
     SupplierViewSet,
     PurchaseOrderViewSet,
-    ProductStockViewSet
+    ProductStockViewSet,
+    StockCountSessionViewSet
 )
 
 router = DefaultRouter()
@@ -22,16 +26,23 @@ router.register(r'purchase-orders', PurchaseOrderViewSet, basename='purchase-ord
 # Bu orqali ProductStock uchun GET (list, retrieve), DELETE amallari bajariladi
 # (PUT, PATCH metodlari ViewSetda o'chirilgan)
 router.register(r'product-stocks', ProductStockViewSet, basename='product-stock')
+router.register(r'stock-counts', StockCountSessionViewSet, basename='stock-count')
 
 urlpatterns = [
     # Maxsus endpointlar (routerga kirmaydiganlar)
     path('low-stock/', LowStockListView.as_view(), name='inventory-low-stock'),
+    path('low-stock/events/', StockAlertEventView.as_view(), name='inventory-low-stock-events'),
     path('history/', InventoryHistoryListView.as_view(), name='inventory-history'),
+    path('reconcile/', StockReconciliationView.as_view(), name='inventory-reconcile'),
 
     # Ombor amaliyotlari uchun alohida endpointlar (bular o'zgarishsiz)
     path('add/', InventoryOperationView.as_view(), name='inventory-add'),  # Ombordan kirim qilish
     path('remove/', InventoryOperationView.as_view(), name='inventory-remove'),  # Ombordan hisobdan chiqarish
     path('transfer/', InventoryOperationView.as_view(), name='inventory-transfer'),  # Ombordan ko'chirish
+    # Ko'p qatorli (paketli) variantlari: {"items": [{"product_id", "quantity"}, ...], ...}
+    path('add/batch/', InventoryBatchOperationView.as_view(operation='add'), name='inventory-add-batch'),
+    path('remove/batch/', InventoryBatchOperationView.as_view(operation='remove'), name='inventory-remove-batch'),
+    path('transfer/batch/', InventoryBatchOperationView.as_view(operation='transfer'), name='inventory-transfer-batch'),
 
     # Router tomonidan generatsiya qilingan URLlar (yuqoridagi registerlarni o'z ichiga oladi)
     path('', include(router.urls)),
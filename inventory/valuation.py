@@ -0,0 +1,181 @@
+# inventory/valuation.py
+"""
+Qoldiqning o'rtacha tortilgan tan narxi (WAC) - InventoryValuation jadvali.
+Kirim (xarid, qaytarish, ko'chirish kirishi, qo'shish) o'rtacha narxni qayta hisoblaydi,
+chiqim (sotuv, hisobdan chiqarish, ko'chirish chiqishi) joriy o'rtacha narxda qiymatni kamaytiradi.
+Funksiyalar chaqiruvchining tranzaksiyasi ichida, qoldiq UPDATE dan keyin ishlaydi.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from products.models import Product
+from sales.models import Sale
+from .models import ProductStock, InventoryValuation
+
+VALUATION_CURRENCIES = (Sale.SaleCurrency.UZS, Sale.SaleCurrency.USD)
+VALUATION_CHUNK_SIZE = 500
+_CENT = Decimal('0.01')
+
+
+def _kassa_id(kassa):
+    return getattr(kassa, 'pk', kassa)
+
+
+def _usd_rate():
+    """
+    Joriy kurs Decimal sifatida: yangi yaratilgan CurrencyRate da default float (13000.00) bo'ladi.
+    Kurs 0 yoki manfiy bo'lsa 0 qaytadi - ikkinchi valyutadagi tan narx 0 deb olinadi (bo'linmaydi).
+    """
+    from settings_app.models import CurrencyRate  # Sikl importning oldini olish uchun
+    rate = Decimal(str(CurrencyRate.load().usd_to_uzs_rate))
+    if rate <= 0:
+        print(f"Valyuta kursi noto'g'ri ({rate}): tan narx ikkinchi valyutaga o'tkazilmaydi")
+        return Decimal(0)
+    return rate
+
+
+def unit_costs_from_price(price, currency, rate=None):
+    """Bitta valyutadagi narxdan ikkala valyuta uchun {valyuta: narx}"""
+    rate = _usd_rate() if rate is None else Decimal(str(rate))
+    price = Decimal(price)
+    if currency == Sale.SaleCurrency.USD:
+        return {Sale.SaleCurrency.USD: price, Sale.SaleCurrency.UZS: price * rate if rate > 0 else Decimal(0)}
+    return {Sale.SaleCurrency.UZS: price, Sale.SaleCurrency.USD: price / rate if rate > 0 else Decimal(0)}
+
+
+def product_unit_costs(product_ids, rate=None):
+    """
+    Tan narx ma'lum bo'lmaganda (qo'lda kirim, import, bo'sh qoldiqqa qaytarish) -
+    mahsulotning xarid narxi; bir valyutadagisi bo'lmasa ikkinchisidan kurs bo'yicha.
+    """
+    rate = _usd_rate() if rate is None else rate
+    product_ids = list(product_ids)
+    costs = {}
+    for start in range(0, len(product_ids), VALUATION_CHUNK_SIZE):
+        for product_id, price_uzs, price_usd in Product.objects.filter(
+                id__in=product_ids[start:start + VALUATION_CHUNK_SIZE]
+        ).values_list('id', 'purchase_price_uzs', 'purchase_price_usd'):
+            if price_usd:
+                costs[product_id] = unit_costs_from_price(price_usd, Sale.SaleCurrency.USD, rate)
+                if price_uzs:
+                    costs[product_id][Sale.SaleCurrency.UZS] = price_uzs
+            elif price_uzs:
+                costs[product_id] = unit_costs_from_price(price_uzs, Sale.SaleCurrency.UZS, rate)
+            else:
+                costs[product_id] = {currency: Decimal(0) for currency in VALUATION_CURRENCIES}
+    return costs
+
+
+def _load_rows(kassa_id, product_ids):
+    rows = {}
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), VALUATION_CHUNK_SIZE):
+        for row in InventoryValuation.objects.select_for_update().filter(
+                kassa_id=kassa_id, product_id__in=product_ids[start:start + VALUATION_CHUNK_SIZE]):
+            rows[(row.product_id, row.currency)] = row
+    return rows
+
+
+def _save_rows(new_rows, changed_rows):
+    now = timezone.now()  # bulk_update auto_now ni qo'ymaydi
+    for row in changed_rows:
+        row.updated_at = now
+    InventoryValuation.objects.bulk_create(new_rows, batch_size=VALUATION_CHUNK_SIZE)
+    InventoryValuation.objects.bulk_update(changed_rows, ['quantity', 'total_value', 'updated_at'],
+                                           batch_size=VALUATION_CHUNK_SIZE)
+
+
+def get_average_costs(kassa, product_ids):
+    """{product_id: {valyuta: o'rtacha narx}} - faqat baholangan qoldig'i borlar (ko'chirish uchun)"""
+    costs = {}
+    for (product_id, currency), row in _load_rows(_kassa_id(kassa), product_ids).items():
+        if row.quantity > 0:
+            costs.setdefault(product_id, {})[currency] = row.total_value / row.quantity
+    return costs
+
+
+def record_receipt(kassa, quantities, unit_costs=None):
+    """
+    Kirim: quantities {product_id: miqdor}, unit_costs {product_id: {valyuta: narx}}.
+    Narx berilmasa - joriy o'rtacha narx, qoldiq bo'lmasa mahsulot xarid narxi.
+    """
+    kassa_id = _kassa_id(kassa)
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    unit_costs = unit_costs or {}
+    rows = _load_rows(kassa_id, quantities)
+    fallback_ids = [product_id for product_id in quantities
+                    if any(currency not in unit_costs.get(product_id, {}) and
+                           not getattr(rows.get((product_id, currency)), 'quantity', 0)
+                           for currency in VALUATION_CURRENCIES)]
+    fallback = product_unit_costs(fallback_ids) if fallback_ids else {}
+    new_rows, changed_rows = [], []
+    for product_id, quantity in quantities.items():
+        for currency in VALUATION_CURRENCIES:
+            row = rows.get((product_id, currency))
+            if row is None:
+                row = InventoryValuation(product_id=product_id, kassa_id=kassa_id, currency=currency)
+                new_rows.append(row)
+            else:
+                changed_rows.append(row)
+            cost = unit_costs.get(product_id, {}).get(currency)
+            if cost is None:
+                cost = row.total_value / row.quantity if row.quantity else fallback[product_id][currency]
+            row.quantity += quantity
+            row.total_value = (row.total_value + cost * quantity).quantize(_CENT)
+    _save_rows(new_rows, changed_rows)
+
+
+def record_issue(kassa, quantities):
+    """Chiqim: qiymat joriy o'rtacha narxda kamayadi (o'rtacha narx o'zgarmaydi)"""
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    rows = _load_rows(_kassa_id(kassa), quantities)
+    changed_rows = []
+    for (product_id, currency), row in rows.items():
+        issued = min(quantities[product_id], row.quantity)
+        if not issued:
+            continue
+        remaining = row.quantity - issued
+        row.total_value = (row.total_value * remaining / row.quantity).quantize(_CENT) if remaining else Decimal(0)
+        row.quantity = remaining
+        changed_rows.append(row)
+    _save_rows([], changed_rows)
+
+
+def rebuild_inventory_valuation(chunk_size=2000):
+    """
+    Jadvalni joriy ProductStock qoldiqlari va mahsulot xarid narxlaridan qaytadan quradi
+    (boshlang'ich holat yoki tarix yo'qolganda). Natija: yozilgan qatorlar soni.
+    Bitta tranzaksiyada: o'chirish va qayta yozish orasidagi kirimlar unikal cheklovga
+    urilmaydi va yozilgan qatorlar o'chib ketmaydi.
+    """
+    rate = _usd_rate()
+    written = 0
+    last_id = 0
+    with transaction.atomic():
+        InventoryValuation.objects.all().delete()
+        while True:
+            stocks = list(ProductStock.objects.filter(pk__gt=last_id, quantity__gt=0).order_by('pk')
+                          .values_list('pk', 'product_id', 'kassa_id', 'quantity')[:chunk_size])
+            if not stocks:
+                return written
+            last_id = stocks[-1][0]
+            costs = product_unit_costs({product_id for _, product_id, _, _ in stocks}, rate)
+            rows = [InventoryValuation(product_id=product_id, kassa_id=kassa_id, currency=currency,
+                                       quantity=quantity,
+                                       total_value=(costs[product_id][currency] * quantity).quantize(_CENT))
+                    for _, product_id, kassa_id, quantity in stocks for currency in VALUATION_CURRENCIES]
+            InventoryValuation.objects.bulk_create(rows, batch_size=VALUATION_CHUNK_SIZE)
+            written += len(rows)
+
+
+@receiver(post_delete, sender=ProductStock)
+def _valuation_on_stock_delete(sender, instance, **kwargs):
+    InventoryValuation.objects.filter(product_id=instance.product_id, kassa_id=instance.kassa_id).delete()
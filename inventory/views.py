@@ -3,23 +3,30 @@ from decimal import Decimal
 
 from django.contrib.auth.models import User
 from django.db import transaction, IntegrityError, models
-from rest_framework import generics, status, filters, permissions, serializers, exceptions, viewsets
+from django.utils import timezone
+from rest_framework import generics, status, filters, permissions, serializers, exceptions, viewsets, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import F, Q, Sum, Value, IntegerField # Sum, Value, IntegerField qo'shildi
+from django.db.models import F, Q, Sum, Count, Value, IntegerField # Sum, Value, IntegerField qo'shildi
 from django.db.models.functions import Coalesce # Coalesce import qilindi
 from rest_framework import filters as drf_filters
 
 # Modellarni import qilish
-from .models import ProductStock, InventoryOperation, PurchaseOrder, Supplier
+from .models import ProductStock, InventoryOperation, PurchaseOrder, Supplier, StockReconciliationRun, StockAlertEvent, \
+    StockCountSession
 from products.models import Product, Category, Kassa
+from .history import InventoryHistoryCursorPagination, InventoryHistoryFilter, HISTORY_ORDERING
 
 # Serializerlarni import qilish
 from .serializers import (
     ProductStockSerializer, InventoryOperationSerializer,
     InventoryAddSerializer, InventoryRemoveSerializer, InventoryTransferSerializer, PurchaseOrderDetailSerializer,
-    ReceivePurchaseItemSerializer, PurchaseOrderCreateSerializer, PurchaseOrderListSerializer, SupplierSerializer
+    ReceivePurchaseItemSerializer, ReceivePurchaseItemsBulkSerializer, PurchaseOrderCreateSerializer, PurchaseOrderListSerializer, SupplierSerializer,
+    InventoryBatchAddSerializer, InventoryBatchRemoveSerializer, InventoryBatchTransferSerializer,
+    StockReconciliationRunSerializer, StockReconciliationRequestSerializer,
+    StockAlertEventSerializer, StockAlertEventAckSerializer,
+    StockCountSessionSerializer, StockCountScanSerializer, StockCountVarianceSerializer
 )
 # Permissions
 # from users.permissions import IsStorekeeper
@@ -340,7 +347,7 @@ class ProductStockViewSet(viewsets.ModelViewSet):
             # ProductStock qoldig'ini 0 ga tushiramiz
             # Bu yerda F() expression ishlatish poyga holatlarining oldini oladi
             updated_rows = ProductStock.objects.filter(pk=instance.pk).update(
-                quantity=F('quantity') - instance.quantity)
+                quantity=F('quantity') - instance.quantity, updated_at=timezone.now())
 
             if updated_rows == 0:
                 # Bu kamdan-kam bo'lishi kerak, agar instance.pk mavjud bo'lsa
@@ -380,10 +387,9 @@ class LowStockListView(generics.ListAPIView):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['kassa']
     def get_queryset(self):
-        accessory_categories = Category.objects.filter(is_accessory_category=True)
-        if not accessory_categories.exists(): return ProductStock.objects.none()
+        # Kam qoldiqlar LowStockAlert jadvalida (inventory/alerts.py har bir o'zgarishda yangilaydi)
         queryset = ProductStock.objects.select_related('product__category', 'kassa') \
-                                  .filter(quantity__lte=F('minimum_stock_level'), product__category__in=accessory_categories) \
+                                  .filter(low_stock_alert__isnull=False) \
                                   .order_by('kassa__name', 'product__name')
         return queryset
 
@@ -428,25 +434,172 @@ class InventoryOperationView(generics.GenericAPIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class InventoryBatchOperationView(InventoryOperationView):
+    """Ko'p qatorli ombor amaliyotlari: add/batch/, remove/batch/, transfer/batch/"""
+    operation = None  # urls.py dagi as_view(operation=...) dan
+
+    def get_serializer_class(self):
+        serializer_class = {
+            'add': InventoryBatchAddSerializer,
+            'remove': InventoryBatchRemoveSerializer,
+            'transfer': InventoryBatchTransferSerializer,
+        }.get(self.operation)
+        if serializer_class is None:
+            if getattr(self, 'swagger_fake_view', False): return InventoryBatchAddSerializer
+            raise exceptions.NotFound(detail="Noto'g'ri ombor amaliyoti URL manzili.")
+        return serializer_class
+
+
+class StockReconciliationView(generics.GenericAPIView):
+    """
+    GET - oxirgi solishtiruvlar, POST - ProductStock ni InventoryOperation jurnali bilan solishtirish
+    (standart: faqat oldingi solishtiruvdan keyin o'zgargan juftlar, repair=true bilan tuzatish).
+    """
+    permission_classes = [permissions.IsAdminUser]
+    serializer_class = StockReconciliationRequestSerializer
+
+    def get(self, request, *args, **kwargs):
+        runs = StockReconciliationRun.objects.select_related('user').order_by('-started_at')[:20]
+        return Response(StockReconciliationRunSerializer(runs, many=True).data)
+
+    def post(self, request, *args, **kwargs):
+        from .reconciliation import reconcile_stock
+        serializer = StockReconciliationRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            run = reconcile_stock(user=request.user, **serializer.validated_data)
+        except Exception as e:
+            print(f"Qoldiq solishtirishda xatolik: {e}")
+            return Response({"error": "Solishtirishda ichki xatolik."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(StockReconciliationRunSerializer(run).data, status=status.HTTP_200_OK)
+
+
+class StockAlertEventView(generics.GenericAPIView):
+    """
+    Kam qoldiq hodisalari navbati (outbox).
+    GET ?after_id=<oxirgi olingan ID>&pending=true&limit=100 - yangi hodisalar (ID bo'yicha o'sish tartibida),
+    POST {"up_to_id": N} yoki {"ids": [...]} - hodisalarni yetkazilgan deb belgilash (faqat admin:
+    navbat umumiy, belgilash barcha iste'molchilar uchun amal qiladi).
+    Yetkazilganlari prune_stock_alert_events buyrug'i bilan tozalanadi.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    serializer_class = StockAlertEventAckSerializer
+
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            return [permissions.IsAdminUser()]
+        return super().get_permissions()
+
+    def get(self, request, *args, **kwargs):
+        queryset = StockAlertEvent.objects.select_related('product', 'kassa').order_by('id')
+        try:
+            after_id = int(request.query_params.get('after_id') or 0)
+            limit = min(max(int(request.query_params.get('limit') or 100), 1), 500)
+        except ValueError:
+            return Response({"error": "after_id va limit butun son bo'lishi kerak."}, status=status.HTTP_400_BAD_REQUEST)
+        if after_id:
+            queryset = queryset.filter(id__gt=after_id)
+        if request.query_params.get('pending', 'true').lower() not in ('false', '0'):
+            queryset = queryset.filter(delivered_at__isnull=True)
+        kassa_id = request.query_params.get('kassa')
+        if kassa_id:
+            queryset = queryset.filter(kassa_id=kassa_id)
+        return Response(StockAlertEventSerializer(queryset[:limit], many=True).data)
+
+    def post(self, request, *args, **kwargs):
+        serializer = StockAlertEventAckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        queryset = StockAlertEvent.objects.filter(delivered_at__isnull=True)
+        if serializer.validated_data.get('up_to_id'):
+            queryset = queryset.filter(id__lte=serializer.validated_data['up_to_id'])
+        if serializer.validated_data.get('ids'):
+            queryset = queryset.filter(id__in=serializer.validated_data['ids'])
+        delivered = queryset.update(delivered_at=timezone.now())
+        return Response({"delivered": delivered}, status=status.HTTP_200_OK)
+
+
+class StockCountSessionViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                               viewsets.GenericViewSet):
+    """
+    Inventarizatsiya sessiyalari: ochish (POST), skaner to'plamlari (scan), farqlar (variances),
+    o'tkazish (post) va bekor qilish (cancel).
+    """
+    queryset = StockCountSession.objects.select_related('kassa', 'category', 'opened_by', 'posted_by') \
+        .annotate(lines_count=Count('lines')).order_by('-created_at')
+    serializer_class = StockCountSessionSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['kassa', 'status']
+
+    def perform_create(self, serializer):
+        serializer.save(opened_by=self.request.user)
+
+    @action(detail=True, methods=['post'])
+    def scan(self, request, pk=None):
+        from .stock_count import record_scans, StockCountError
+        session = self.get_object()
+        serializer = StockCountScanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = record_scans(session, serializer.get_scans(), mode=serializer.validated_data['mode'])
+        except StockCountError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def variances(self, request, pk=None):
+        from .stock_count import count_variances, variance_summary
+        session = self.get_object()
+        queryset = count_variances(session).values('id', 'name', 'barcode', 'system_quantity', 'current_quantity',
+                                                   'counted_quantity', 'variance')
+        page = self.paginate_queryset(queryset)
+        data = StockCountVarianceSerializer(page if page is not None else queryset, many=True).data
+        if page is not None:
+            response = self.get_paginated_response(data)
+            response.data['summary'] = variance_summary(session)
+            return response
+        return Response({'summary': variance_summary(session), 'results': data})
+
+    @action(detail=True, methods=['post'], url_path='post')
+    def post_count(self, request, pk=None):
+        from .stock_count import post_stock_count, StockCountError
+        session = self.get_object()
+        try:
+            session = post_stock_count(session, user=request.user)
+        except StockCountError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        except Exception as e:
+            print(f"Inventarizatsiyani o'tkazishda xatolik: {e}")
+            return Response({"error": "Inventarizatsiyani o'tkazishda ichki xatolik."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(self.get_serializer(self.get_queryset().get(pk=session.pk)).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        from .stock_count import cancel_stock_count, StockCountError
+        session = self.get_object()
+        try:
+            cancel_stock_count(session, user=request.user)
+        except StockCountError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(self.get_queryset().get(pk=session.pk)).data, status=status.HTTP_200_OK)
+
+
 class InventoryHistoryListView(generics.ListAPIView):
     """Ombor amaliyotlari tarixi"""
     # store filtri olib tashlandi
     queryset = InventoryOperation.objects.select_related(
-        'product', 'user__profile', 'kassa', 'related_operation__product'
-    ).all().order_by('-timestamp')
+        'product__category', 'product__default_kassa_for_new_stock', 'user__profile', 'kassa',
+        'related_operation__product'
+    ).all().order_by(*HISTORY_ORDERING)
     serializer_class = InventoryOperationSerializer
     permission_classes = [permissions.IsAuthenticated] # Yoki IsStorekeeper/IsAdmin
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    # Keyset sahifalash (timestamp, id) bo'yicha qat'iy tartib talab qiladi - OrderingFilter olib tashlandi
+    pagination_class = InventoryHistoryCursorPagination
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     # store filtri olib tashlandi
-    filterset_fields = {
-        'timestamp': ['date', 'date__gte', 'date__lte'],
-        'product': ['exact'],
-        'user': ['exact'],
-        'kassa': ['exact'],
-        'operation_type': ['exact', 'in'],
-    }
+    filterset_class = InventoryHistoryFilter
     search_fields = ['product__name', 'user__username', 'comment', 'kassa__name']
-    ordering_fields = ['timestamp', 'product__name']
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
@@ -500,6 +653,25 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
                                 status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    # Bir nechta qatorni (yoki hammasini) bitta so'rovda qabul qilish
+    @action(detail=True, methods=['post'], url_path='receive-many')
+    def receive_many(self, request, pk=None):
+        purchase_order = self.get_object()
+        serializer = ReceivePurchaseItemsBulkSerializer(data=request.data, context={'request': request,
+                                                                                   'purchase_order': purchase_order})
+        serializer.is_valid(raise_exception=True)
+        try:
+            serializer.save(user=request.user)
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_409_CONFLICT)
+        except Exception as e:
+            print(f"Xarid #{purchase_order.id} qatorlarini qabul qilishda xatolik: {e}")
+            return Response({"error": f"Mahsulotlarni qabul qilishda xatolik: {str(e)}"},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        purchase_order = self.get_queryset().get(pk=purchase_order.pk)  # Yangilangan qatorlar bilan, bir marta
+        return Response(PurchaseOrderDetailSerializer(purchase_order, context={'request': request}).data,
+                        status=status.HTTP_200_OK)
+
     # Xarid uchun to'lov qilish actioni (soddalashtirilgan)
     @action(detail=True, methods=['post'], url_path='make-payment')
     def make_payment_for_purchase(self, request, pk=None):
@@ -27,7 +27,7 @@
 
 # products/admin.py
 from django.contrib import admin
-from .models import Kassa, Category, Product
+from .models import Kassa, Category, Product, BarcodeSequence, ProductPriceHistory
 
 
 @admin.register(Kassa)
@@ -86,4 +86,21 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(BarcodeSequence)
+class BarcodeSequenceAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'symbology', 'length', 'next_value', 'updated_at')
+    list_filter = ('symbology',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(ProductPriceHistory)
+class ProductPriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ('product', 'old_price_uzs', 'new_price_uzs', 'old_price_usd', 'new_price_usd', 'usd_to_uzs_rate',
+                    'source', 'user', 'created_at')
+    list_filter = ('source', 'created_at')
+    search_fields = ('product__name', 'product__barcode')
+    raw_id_fields = ('product',)
+    readonly_fields = ('created_at',)
@@ -0,0 +1,288 @@
+# products/importer.py
+import csv
+import io
+import os
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from inventory.alerts import sync_low_stock_alerts
+from inventory.valuation import record_receipt
+from inventory.barcode_index import mark_barcode_index_dirty
+from inventory.models import ProductStock, InventoryOperation
+from .models import Kassa, Category, Product
+from .services import generate_unique_barcode_values
+
+IMPORT_CHUNK_SIZE = 1000
+# Bir so'rovdagi IN (...) parametrlari (SQLite chegarasi 999)
+_IN_CHUNK = 900
+
+IMPORT_COLUMNS = [
+    'name', 'barcode', 'category', 'price_uzs', 'price_usd', 'purchase_price_uzs', 'purchase_price_usd',
+    'purchase_date', 'description', 'storage_capacity', 'color', 'series_region', 'battery_health',
+    'supplier_name_manual', 'supplier_phone_manual', 'quantity', 'kassa',
+]
+_DECIMAL_COLUMNS = ('price_uzs', 'price_usd', 'purchase_price_uzs', 'purchase_price_usd')
+_TEXT_COLUMNS = ('description', 'storage_capacity', 'color', 'series_region',
+                 'supplier_name_manual', 'supplier_phone_manual')
+
+
+class ImportFileError(Exception):
+    """Faylni umuman o'qib bo'lmaydi (format, ustunlar)"""
+
+
+def _iter_csv(uploaded_file):
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    if not reader.fieldnames or 'name' not in [name.strip().lower() for name in reader.fieldnames]:
+        raise ImportFileError("Faylda 'name' ustuni topilmadi.")
+    for row in reader:
+        yield {(key or '').strip().lower(): value for key, value in row.items()}
+
+
+def _iter_xlsx(uploaded_file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError("XLSX uchun openpyxl o'rnatilmagan. Faylni CSV formatida yuboring.")
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+        if 'name' not in header:
+            raise ImportFileError("Faylda 'name' ustuni topilmadi.")
+        for values in rows:
+            yield {key: value for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+def iter_import_rows(uploaded_file, filename):
+    """Fayl qatorlarini (dict) bittalab o'qiydi, butun faylni xotiraga yuklamaydi"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return _iter_csv(uploaded_file)
+    if extension in ('.xlsx', '.xlsm'):
+        return _iter_xlsx(uploaded_file)
+    raise ImportFileError("Faqat .csv yoki .xlsx fayllar qabul qilinadi.")
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _decimal(value, errors, column):
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        result = Decimal(value.replace(' ', '').replace(',', '.'))
+    except InvalidOperation:
+        errors[column] = "Son bo'lishi kerak."
+        return None
+    if result < 0:
+        errors[column] = "Manfiy bo'lmasligi kerak."
+    return result.quantize(Decimal('0.01'))
+
+
+def _integer(value, errors, column, minimum=0, maximum=None):
+    value = _text(value)
+    if value is None:
+        return None
+    try:
+        result = int(Decimal(value))
+    except (InvalidOperation, ValueError):
+        errors[column] = "Butun son bo'lishi kerak."
+        return None
+    if result < minimum or (maximum is not None and result > maximum):
+        errors[column] = f"{minimum}..{maximum if maximum is not None else ''} oralig'ida bo'lishi kerak."
+    return result
+
+
+class ProductImporter:
+    """
+    CSV/XLSX dan mahsulotlarni bo'laklab (IMPORT_CHUNK_SIZE) import qiladi:
+    - kategoriya va kassalar oldindan lug'atlarga yuklanadi, qatorlar shular bo'yicha tekshiriladi;
+    - mavjud shtrix-kodlar har bir bo'lak uchun bitta so'rov bilan tekshiriladi;
+    - bo'sh shtrix-kodlar BarcodeAllocator dan bir yo'la olinadi;
+    - Product, ProductStock va INITIAL InventoryOperation lar bulk_create bilan yoziladi.
+    Xato qatorlar o'tkazib yuboriladi va hisobotda qaytariladi, qolganlari import qilinadi.
+    Har bir bo'lak alohida tranzaksiya (dry_run=True da hech narsa yozilmaydi).
+    """
+
+    def __init__(self, user=None, default_kassa=None, auto_barcode=True, dry_run=False, chunk_size=IMPORT_CHUNK_SIZE):
+        self.user = user if user is not None and user.is_authenticated else \
+            User.objects.filter(is_superuser=True, is_active=True).first()
+        self.auto_barcode = auto_barcode
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.categories_by_id, self.categories_by_name = {}, {}
+        for category in Category.objects.all():
+            self.categories_by_id[category.id] = category
+            self.categories_by_name[category.name.strip().lower()] = category
+        self.kassas_by_id, self.kassas_by_name = {}, {}
+        for kassa in Kassa.objects.filter(is_active=True).order_by('id'):
+            self.kassas_by_id[kassa.id] = kassa
+            self.kassas_by_name[kassa.name.strip().lower()] = kassa
+        self.default_kassa = default_kassa or next(iter(self.kassas_by_id.values()), None)
+        self.seen_barcodes = set()
+        self.report = {'valid': 0, 'created': 0, 'stock_rows': 0, 'initial_quantity': 0, 'failed': 0, 'errors': []}
+
+    def _lookup(self, value, by_id, by_name):
+        value = _text(value)
+        if value is None:
+            return None, False
+        if value.isdigit() and int(value) in by_id:
+            return by_id[int(value)], True
+        found = by_name.get(value.lower())
+        return found, found is not None
+
+    def _parse_row(self, row):
+        errors = {}
+        data = {'name': _text(row.get('name')), 'barcode': _text(row.get('barcode'))}
+        if not data['name']:
+            errors['name'] = "Majburiy."
+        elif len(data['name']) > 255:
+            errors['name'] = "255 belgidan oshmasligi kerak."
+        for column in _DECIMAL_COLUMNS:
+            data[column] = _decimal(row.get(column), errors, column)
+        if not ((data['price_uzs'] or 0) > 0 or (data['price_usd'] or 0) > 0):
+            errors['price_uzs'] = "Narx USD yoki UZS da 0 dan katta bo'lishi shart."
+        for column in _TEXT_COLUMNS:
+            data[column] = _text(row.get(column))
+        data['battery_health'] = _integer(row.get('battery_health'), errors, 'battery_health', 0, 100)
+        data['quantity'] = _integer(row.get('quantity'), errors, 'quantity', 0) or 0
+
+        purchase_date = row.get('purchase_date')
+        if hasattr(purchase_date, 'date'):
+            purchase_date = purchase_date.date()
+        elif _text(purchase_date):
+            try:
+                purchase_date = datetime.strptime(_text(purchase_date), '%Y-%m-%d').date()
+            except ValueError:
+                errors['purchase_date'] = "YYYY-MM-DD formatida bo'lishi kerak."
+                purchase_date = None
+        else:
+            purchase_date = None
+        data['purchase_date'] = purchase_date
+
+        category, found = self._lookup(row.get('category'), self.categories_by_id, self.categories_by_name)
+        if _text(row.get('category')) and not found:
+            errors['category'] = f"Kategoriya topilmadi: {row.get('category')}"
+        data['category'] = category
+
+        kassa, found = self._lookup(row.get('kassa'), self.kassas_by_id, self.kassas_by_name)
+        if _text(row.get('kassa')) and not found:
+            errors['kassa'] = f"Aktiv kassa topilmadi: {row.get('kassa')}"
+        data['kassa'] = kassa or self.default_kassa
+        if data['quantity'] and data['kassa'] is None:
+            errors['kassa'] = "Omborga kirim uchun aktiv kassa topilmadi."
+        if data['quantity'] and self.user is None:
+            errors['quantity'] = "Kirimni qayd etish uchun foydalanuvchi topilmadi."
+
+        if data['barcode']:
+            if len(data['barcode']) > 100:
+                errors['barcode'] = "100 belgidan oshmasligi kerak."
+            elif data['barcode'] in self.seen_barcodes:
+                errors['barcode'] = "Fayl ichida takrorlangan."
+        elif not self.auto_barcode:
+            errors['barcode'] = "Majburiy (auto_barcode o'chirilgan)."
+        return data, errors
+
+    def _fail(self, row_number, errors):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < 1000:  # Hisobot juda katta bo'lib ketmasin
+            self.report['errors'].append({'row': row_number, 'errors': errors})
+
+    def _process_chunk(self, rows):
+        parsed = []
+        for row_number, row in rows:
+            data, errors = self._parse_row(row)
+            if errors:
+                self._fail(row_number, errors)
+                continue
+            if data['barcode']:
+                self.seen_barcodes.add(data['barcode'])
+            parsed.append((row_number, data))
+
+        given = [data['barcode'] for _, data in parsed if data['barcode']]
+        taken = set()
+        for start in range(0, len(given), _IN_CHUNK):
+            taken.update(Product.objects.filter(barcode__in=given[start:start + _IN_CHUNK])
+                         .values_list('barcode', flat=True))
+        valid = []
+        for row_number, data in parsed:
+            if data['barcode'] in taken:
+                self._fail(row_number, {'barcode': "Bu shtrix-kod yoki IMEI allaqachon mavjud."})
+            else:
+                valid.append(data)
+        self.report['valid'] += len(valid)
+        if not valid or self.dry_run:
+            return
+
+        with transaction.atomic():
+            # Bo'sh shtrix-kodlar: kategoriya prefiksi bo'yicha guruhlab, bir yo'la
+            need_barcode = {}
+            for data in valid:
+                if not data['barcode']:
+                    need_barcode.setdefault(data['category'].id if data['category'] else None, []).append(data)
+            for category_id, items in need_barcode.items():
+                for data, barcode_value in zip(items, generate_unique_barcode_values(len(items), category_id=category_id)):
+                    data['barcode'] = barcode_value
+
+            products = Product.objects.bulk_create([
+                Product(
+                    name=data['name'], barcode=data['barcode'], category=data['category'],
+                    price_uzs=data['price_uzs'], price_usd=data['price_usd'],
+                    purchase_price_uzs=data['purchase_price_uzs'], purchase_price_usd=data['purchase_price_usd'],
+                    purchase_date=data['purchase_date'], description=data['description'],
+                    storage_capacity=data['storage_capacity'], color=data['color'],
+                    series_region=data['series_region'], battery_health=data['battery_health'],
+                    supplier_name_manual=data['supplier_name_manual'],
+                    supplier_phone_manual=data['supplier_phone_manual'],
+                    default_kassa_for_new_stock=data['kassa'],
+                ) for data in valid
+            ])
+            stocks, operations = [], []
+            for product, data in zip(products, valid):
+                if data['kassa'] is None:
+                    continue
+                stocks.append(ProductStock(product=product, kassa=data['kassa'], quantity=data['quantity']))
+                if data['quantity'] > 0:
+                    operations.append(InventoryOperation(
+                        product=product, kassa=data['kassa'], user=self.user, quantity=data['quantity'],
+                        operation_type=InventoryOperation.OperationType.INITIAL, comment=f"{product.name} (import)"
+                    ))
+            ProductStock.objects.bulk_create(stocks)
+            InventoryOperation.objects.bulk_create(operations)
+            received = {}
+            for stock in stocks:
+                received.setdefault(stock.kassa_id, {})[stock.product_id] = stock.quantity
+            for kassa_id, quantities in received.items():
+                record_receipt(kassa_id, quantities)  # Fayldagi xarid narxida baholanadi
+            sync_low_stock_alerts(product_ids=[stock.product_id for stock in stocks])
+            mark_barcode_index_dirty()
+
+        self.report['created'] += len(products)
+        self.report['stock_rows'] += len(stocks)
+        self.report['initial_quantity'] += sum(operation.quantity for operation in operations)
+
+    def run(self, rows):
+        """rows: qatorlar (dict) iteratori. Natija: hisobot"""
+        chunk = []
+        for row_number, row in enumerate(rows, start=2):  # 1-qator sarlavha
+            if not any(_text(value) for value in row.values()):
+                continue  # Bo'sh qator
+            chunk.append((row_number, row))
+            if len(chunk) >= self.chunk_size:
+                self._process_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._process_chunk(chunk)
+        self.report['dry_run'] = self.dry_run
+        return self.report
@@ -0,0 +1,85 @@
+# products/label_render.py
+# Bu modul faqat python-barcode va Pillow ga bog'liq (Django modellarisiz), chunki uning
+# funksiyalari ProcessPoolExecutor ishchi jarayonlarida chaqiriladi.
+from io import BytesIO
+
+import barcode
+from barcode.writer import ImageWriter
+from PIL import Image, ImageDraw, ImageFont
+
+
+def render_barcode_png(value, barcode_image_type, options):
+    """python-barcode + Pillow orqali PNG (bytes). Keshsiz, faqat kesh topilmaganda chaqiriladi."""
+    BARCODE_CLASS = barcode.get_barcode_class(barcode_image_type)
+    # Code128 qisqa raqamli kodlarni ham yaxshi qabul qiladi.
+    instance = BARCODE_CLASS(value, writer=ImageWriter())
+    buffer = BytesIO()
+    instance.write(buffer, options=options)
+    return buffer.getvalue()
+
+
+def _load_font(font_path, size):
+    try:
+        return ImageFont.truetype(font_path, size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def _fit_text(draw, text, font, max_width):
+    if draw.textlength(text, font=font) <= max_width:
+        return text
+    while text and draw.textlength(text + '...', font=font) > max_width:
+        text = text[:-1]
+    return text + '...'
+
+
+def render_label_page(labels, layout):
+    """
+    Bitta varaq (A4) ni chizadi: layout['columns'] x layout['rows'] yorliq.
+    labels: [{'key', 'barcode_number', 'barcode_png' (yoki None), 'name', 'lines'}]
+    Natija: (varaq PNG bytes, {kalit: png} - shu yerda yangi chizilgan shtrix-kodlar)
+    """
+    page_width, page_height = layout['page_size']
+    columns, rows, margin = layout['columns'], layout['rows'], layout['margin']
+    cell_width = (page_width - 2 * margin) // columns
+    cell_height = (page_height - 2 * margin) // rows
+    padding = max(4, cell_width // 30)
+
+    page = Image.new('L', (page_width, page_height), 255)
+    draw = ImageDraw.Draw(page)
+    title_font = _load_font(layout['font_path'], layout['title_font_size'])
+    text_font = _load_font(layout['font_path'], layout['text_font_size'])
+    rendered = {}
+
+    for index, label in enumerate(labels):
+        column, row = index % columns, index // columns
+        left, top = margin + column * cell_width, margin + row * cell_height
+        inner_width = cell_width - 2 * padding
+        if layout.get('draw_borders'):
+            draw.rectangle([left, top, left + cell_width - 1, top + cell_height - 1], outline=200)
+
+        y = top + padding
+        draw.text((left + padding, y), _fit_text(draw, label['name'] or '', title_font, inner_width),
+                  font=title_font, fill=0)
+        y += layout['title_font_size'] + 4
+        for line in label['lines']:
+            draw.text((left + padding, y), _fit_text(draw, line, text_font, inner_width), font=text_font, fill=0)
+            y += layout['text_font_size'] + 2
+
+        png = label['barcode_png'] or rendered.get(label['key'])
+        if png is None:
+            png = render_barcode_png(label['barcode_number'], layout['symbology'], layout['writer_options'])
+            rendered[label['key']] = png
+        with Image.open(BytesIO(png)) as barcode_image:
+            box_width, box_height = inner_width, top + cell_height - padding - y
+            if box_height <= 0:
+                continue
+            barcode_image = barcode_image.convert('L')
+            scale = min(box_width / barcode_image.width, box_height / barcode_image.height)
+            size = (max(1, int(barcode_image.width * scale)), max(1, int(barcode_image.height * scale)))
+            barcode_image = barcode_image.resize(size, Image.LANCZOS)
+            page.paste(barcode_image, (left + (cell_width - size[0]) // 2, y))
+
+    buffer = BytesIO()
+    page.save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue(), rendered
@@ -0,0 +1,44 @@
+# products/management/commands/import_products.py
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from products.importer import ProductImporter, ImportFileError, iter_import_rows, IMPORT_CHUNK_SIZE
+from products.models import Kassa
+
+
+class Command(BaseCommand):
+    help = "CSV/XLSX fayldan mahsulotlarni ommaviy import qiladi (API dagi /api/products/import/ bilan bir xil)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fayl yo'li (.csv yoki .xlsx)")
+        parser.add_argument('--kassa', type=int, help="Standart kassa ID si")
+        parser.add_argument('--user', help="Kirimni qayd etuvchi foydalanuvchi (username)")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+        parser.add_argument('--no-auto-barcode', action='store_true')
+        parser.add_argument('--dry-run', action='store_true', help="Faqat tekshirish")
+
+    def handle(self, *args, **options):
+        kassa = None
+        if options['kassa']:
+            kassa = Kassa.objects.filter(pk=options['kassa'], is_active=True).first()
+            if kassa is None:
+                raise CommandError(f"Aktiv kassa topilmadi (ID: {options['kassa']}).")
+        user = User.objects.filter(username=options['user']).first() if options['user'] else None
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as source:
+                importer = ProductImporter(user=user, default_kassa=kassa, auto_barcode=not options['no_auto_barcode'],
+                                           dry_run=options['dry_run'], chunk_size=max(1, options['chunk_size']))
+                report = importer.run(iter_import_rows(source, options['path']))
+        except (ImportFileError, OSError) as e:
+            raise CommandError(str(e))
+
+        errors = report.pop('errors')
+        for error in errors[:20]:
+            self.stdout.write(self.style.WARNING(f"  {error['row']}-qator: {json.dumps(error['errors'], ensure_ascii=False)}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{json.dumps(report, ensure_ascii=False)} ({time.perf_counter() - started:.1f}s)"))
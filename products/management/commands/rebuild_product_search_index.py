@@ -0,0 +1,16 @@
+# products/management/commands/rebuild_product_search_index.py
+from django.core.management.base import BaseCommand, CommandError
+
+from products.search import ensure_product_search_index, is_search_index_supported, rebuild_product_search_index
+
+
+class Command(BaseCommand):
+    help = ("Mahsulot qidiruv indeksini (SQLite FTS5) yaratadi yoki products_product dan "
+            "to'liq qayta to'ldiradi. Odatda kerak emas: indeks triggerlar bilan yangilanadi.")
+
+    def handle(self, *args, **options):
+        if not is_search_index_supported():
+            raise CommandError("FTS5 qidiruv indeksi faqat SQLite bazasida ishlaydi.")
+        if not ensure_product_search_index():
+            rebuild_product_search_index()
+        self.stdout.write(self.style.SUCCESS("Mahsulot qidiruv indeksi qayta qurildi."))
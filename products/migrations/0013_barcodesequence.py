@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_alter_product_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarcodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(blank=True, default='', max_length=10, verbose_name='Prefiks')),
+                ('symbology', models.CharField(choices=[('plain', 'Oddiy raqamli (Code128)'), ('ean13', 'EAN-13 (nazorat raqami bilan)')], default='plain', max_length=10, verbose_name='Turi')),
+                ('length', models.PositiveSmallIntegerField(verbose_name='Umumiy uzunlik (nazorat raqamisiz)')),
+                ('next_value', models.BigIntegerField(default=1, verbose_name='Keyingi qiymat')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan sana')),
+            ],
+            options={
+                'verbose_name': 'Shtrix-kod hisoblagichi',
+                'verbose_name_plural': 'Shtrix-kod hisoblagichlari',
+                'constraints': [models.UniqueConstraint(fields=('prefix', 'symbology', 'length'), name='unique_barcode_sequence')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 18:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_barcodesequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price_usd', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Eski narx (USD)')),
+                ('new_price_usd', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Yangi narx (USD)')),
+                ('old_price_uzs', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='Eski narx (UZS)')),
+                ('new_price_uzs', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='Yangi narx (UZS)')),
+                ('usd_to_uzs_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True, verbose_name='USD->UZS Kursi')),
+                ('source', models.CharField(choices=[('manual', "Qo'lda tahrirlash"), ('reprice', "Kurs bo'yicha qayta narxlash")], default='manual', max_length=10, verbose_name='Manba')),
+                ('comment', models.CharField(blank=True, max_length=255, null=True, verbose_name='Izoh')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Sana')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='products.product', verbose_name='Mahsulot')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Foydalanuvchi')),
+            ],
+            options={
+                'verbose_name': 'Narx tarixi',
+                'verbose_name_plural': 'Narxlar tarixi',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['product', '-created_at'], name='price_history_product_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 # products/models.py
+from django.conf import settings
 from django.core.validators import RegexValidator
 from django.db import models
 from django.core.exceptions import ValidationError
@@ -37,7 +38,7 @@ class Product(models.Model):
     series_region = models.CharField(max_length=100, blank=True, null=True, verbose_name="Seriyasi (Region, Masalan: LL/A)")
     battery_health = models.PositiveIntegerField(null=True, blank=True, verbose_name="Batareya Holati (%)")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Yaratilgan sana")
-    updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan sana")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Yangilangan sana")
     is_active = models.BooleanField(default=True, verbose_name="Aktiv")
     default_kassa_for_new_stock = models.ForeignKey(Kassa, on_delete=models.SET_NULL, null=True, blank=True, related_name='default_new_products_stock', verbose_name="Yangi mahsulot uchun standart kassa (omborga qo'shish uchun)")
 
@@ -66,6 +67,56 @@ class Product(models.Model):
     class Meta: verbose_name = "Mahsulot"; verbose_name_plural = "Mahsulotlar"; ordering = ['name']
 
 
+class BarcodeSequence(models.Model):
+    """
+    Shtrix-kodlar hisoblagichi (prefiks + turi + uzunlik bo'yicha).
+    Qiymatlar bloklab band qilinadi (next_value bitta UPDATE bilan oshiriladi),
+    blok ichidagilar xotiradan beriladi.
+    """
+    class Symbology(models.TextChoices):
+        PLAIN = 'plain', 'Oddiy raqamli (Code128)'
+        EAN13 = 'ean13', 'EAN-13 (nazorat raqami bilan)'
+
+    prefix = models.CharField(max_length=10, blank=True, default='', verbose_name="Prefiks")
+    symbology = models.CharField(max_length=10, choices=Symbology.choices, default=Symbology.PLAIN, verbose_name="Turi")
+    length = models.PositiveSmallIntegerField(verbose_name="Umumiy uzunlik (nazorat raqamisiz)")
+    next_value = models.BigIntegerField(default=1, verbose_name="Keyingi qiymat")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan sana")
+
+    class Meta:
+        verbose_name = "Shtrix-kod hisoblagichi"
+        verbose_name_plural = "Shtrix-kod hisoblagichlari"
+        constraints = [models.UniqueConstraint(fields=['prefix', 'symbology', 'length'], name='unique_barcode_sequence')]
+
+    def __str__(self): return f"{self.prefix or '-'} / {self.symbology} / {self.length}: {self.next_value}"
+
+
+class ProductPriceHistory(models.Model):
+    """Mahsulot sotish narxi o'zgarishlari tarixi (qayta narxlash yoki qo'lda tahrirlash)"""
+    class Source(models.TextChoices):
+        MANUAL = 'manual', "Qo'lda tahrirlash"
+        REPRICE = 'reprice', "Kurs bo'yicha qayta narxlash"
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history', verbose_name="Mahsulot")
+    old_price_usd = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Eski narx (USD)")
+    new_price_usd = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Yangi narx (USD)")
+    old_price_uzs = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True, verbose_name="Eski narx (UZS)")
+    new_price_uzs = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True, verbose_name="Yangi narx (UZS)")
+    usd_to_uzs_rate = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True, verbose_name="USD->UZS Kursi")
+    source = models.CharField(max_length=10, choices=Source.choices, default=Source.MANUAL, verbose_name="Manba")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Foydalanuvchi")
+    comment = models.CharField(max_length=255, blank=True, null=True, verbose_name="Izoh")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Sana")
+
+    class Meta:
+        verbose_name = "Narx tarixi"
+        verbose_name_plural = "Narxlar tarixi"
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['product', '-created_at'], name='price_history_product_idx')]
+
+    def __str__(self): return f"{self.product_id}: {self.old_price_uzs} -> {self.new_price_uzs} UZS ({self.get_source_display()})"
+
+
 
 
 # # products/models.py
@@ -0,0 +1,129 @@
+# products/repricing.py
+from decimal import Decimal, ROUND_HALF_UP, ROUND_CEILING, ROUND_FLOOR
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.barcode_index import mark_barcode_index_dirty
+from .models import Product, ProductPriceHistory
+
+REPRICE_CHUNK_SIZE = 1000
+# dry_run javobidagi farqlar ro'yxati chegarasi (hisoblagichlar baribir to'liq)
+REPRICE_DIFF_LIMIT = 500
+# Bo'lakdagi turli yangi narxlar shundan kam bo'lsa, har bir narx uchun bitta UPDATE ... WHERE id IN (...)
+# (yaxlitlashda narxlar kam xil bo'ladi); aks holda bulk_update (CASE WHEN) - u Django da ancha sekin.
+REPRICE_GROUPED_UPDATE_MAX = 100
+
+USD_TO_UZS = 'usd_to_uzs'
+UZS_TO_USD = 'uzs_to_usd'
+REPRICE_DIRECTIONS = {
+    USD_TO_UZS: ('price_usd', 'price_uzs'),  # (manba, natija)
+    UZS_TO_USD: ('price_uzs', 'price_usd'),
+}
+ROUNDING_MODES = {'nearest': ROUND_HALF_UP, 'up': ROUND_CEILING, 'down': ROUND_FLOOR}
+
+
+class RepricingError(Exception):
+    """Qayta narxlash parametrlari noto'g'ri"""
+
+
+def round_price(value, round_to=None, rounding='nearest'):
+    """round_to qadamiga yaxlitlaydi (masalan 1000 so'm yoki 0.5$), natija 2 xonali"""
+    mode = ROUNDING_MODES[rounding]
+    if round_to:
+        value = (value / round_to).quantize(Decimal('1'), rounding=mode) * round_to
+    return value.quantize(Decimal('0.01'), rounding=mode)
+
+
+def calculate_price(source_price, direction, rate, markup_percent=Decimal('0'), round_to=None, rounding='nearest'):
+    factor = Decimal('1') + Decimal(markup_percent) / Decimal('100')
+    if direction == USD_TO_UZS:
+        value = source_price * rate * factor
+    else:
+        value = source_price / rate * factor
+    return round_price(value, round_to, rounding)
+
+
+def reprice_products(direction=USD_TO_UZS, rate=None, category_ids=None, markup_percent=Decimal('0'), round_to=None,
+                     rounding='nearest', only_active=True, dry_run=False, user=None, comment=None,
+                     chunk_size=REPRICE_CHUNK_SIZE):
+    """
+    Kurs bo'yicha sotish narxlarini qayta hisoblaydi: price_uzs = price_usd * kurs * (1 + ustama%)
+    (yoki teskarisi), so'ng round_to qadamiga yaxlitlaydi.
+    Mahsulotlar ID bo'yicha bo'laklab o'qiladi, har bir bo'lak (alohida tranzaksiyada) narxlar bo'yicha
+    guruhlangan UPDATE lar yoki bulk_update + narx tarixi bulk_create bilan yoziladi.
+    dry_run=True da faqat farqlar qaytariladi.
+    """
+    from settings_app.models import CurrencyRate  # Sikl importning oldini olish uchun
+
+    if direction not in REPRICE_DIRECTIONS:
+        raise RepricingError(f"Noto'g'ri yo'nalish: {direction}")
+    if rounding not in ROUNDING_MODES:
+        raise RepricingError(f"Noto'g'ri yaxlitlash turi: {rounding}")
+    rate = Decimal(rate if rate is not None else CurrencyRate.load().usd_to_uzs_rate)
+    if rate <= 0:
+        raise RepricingError("Valyuta kursi 0 dan katta bo'lishi kerak.")
+    source_field, target_field = REPRICE_DIRECTIONS[direction]
+    target = Product._meta.get_field(target_field)
+    max_value = Decimal(10) ** (target.max_digits - target.decimal_places)
+
+    queryset = Product.objects.filter(**{f'{source_field}__gt': 0})
+    if category_ids:
+        queryset = queryset.filter(category_id__in=category_ids)
+    if only_active:
+        queryset = queryset.filter(is_active=True)
+    queryset = queryset.order_by('pk').values_list('pk', 'name', 'price_usd', 'price_uzs')
+
+    report = {'direction': direction, 'rate': rate, 'checked': 0, 'changed': 0, 'unchanged': 0, 'skipped': 0,
+              'dry_run': dry_run, 'diff': []}
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        report['checked'] += len(rows)
+
+        changes = []
+        for pk, name, price_usd, price_uzs in rows:
+            source_price = price_usd if direction == USD_TO_UZS else price_uzs
+            old_price = price_uzs if direction == USD_TO_UZS else price_usd
+            new_price = calculate_price(source_price, direction, rate, markup_percent, round_to, rounding)
+            if new_price >= max_value or new_price <= 0:
+                report['skipped'] += 1  # Maydonga sig'maydi yoki 0 ga yaxlitlandi
+                continue
+            if new_price == old_price:
+                report['unchanged'] += 1
+                continue
+            changes.append((pk, price_usd, price_uzs, new_price))
+            if len(report['diff']) < REPRICE_DIFF_LIMIT:
+                report['diff'].append({'id': pk, 'name': name, 'field': target_field,
+                                       'old': old_price, 'new': new_price})
+        report['changed'] += len(changes)
+        if dry_run or not changes:
+            continue
+
+        now = timezone.now()  # bulk_update auto_now ni qo'ymaydi (POS katalog deltasi uchun kerak)
+        history = []
+        with transaction.atomic():
+            groups = {}
+            for pk, _, _, new_price in changes:
+                groups.setdefault(new_price, []).append(pk)
+            if len(groups) <= REPRICE_GROUPED_UPDATE_MAX:
+                for new_price, pks in groups.items():
+                    Product.objects.filter(pk__in=pks).update(updated_at=now, **{target_field: new_price})
+            else:
+                Product.objects.bulk_update(
+                    [Product(pk=pk, updated_at=now, **{target_field: new_price}) for pk, _, _, new_price in changes],
+                    [target_field, 'updated_at']
+                )
+            for pk, price_usd, price_uzs, new_price in changes:
+                history.append(ProductPriceHistory(
+                    product_id=pk, old_price_usd=price_usd, old_price_uzs=price_uzs,
+                    new_price_usd=new_price if target_field == 'price_usd' else price_usd,
+                    new_price_uzs=new_price if target_field == 'price_uzs' else price_uzs,
+                    usd_to_uzs_rate=rate, source=ProductPriceHistory.Source.REPRICE, user=user, comment=comment,
+                ))
+            ProductPriceHistory.objects.bulk_create(history)
+            mark_barcode_index_dirty()
+    return report
@@ -0,0 +1,188 @@
+# products/search.py
+import re
+
+from django.conf import settings
+from django.db import connection, connections, DEFAULT_DB_ALIAS
+from rest_framework import filters
+
+# Ikkita FTS5 jadval: so'z/prefiks qidiruvi uchun unicode61 va xato yozilgan so'zlar uchun trigram.
+# Jadvallar SQL triggerlar bilan products_product / products_category ga sinxron turadi,
+# shuning uchun queryset.update() va bulk_create ham indeksni yangilaydi.
+FTS_TABLE = 'products_product_fts'
+FTS_TRIGRAM_TABLE = 'products_product_fts_trigram'
+FTS_COLUMNS = ('name', 'barcode', 'color', 'storage_capacity', 'series_region', 'category_name')
+# bm25 ustun og'irliklari (FTS_COLUMNS tartibida)
+FTS_WEIGHTS = (10.0, 8.0, 2.0, 2.0, 2.0, 3.0)
+
+_TRIGGERS = ('products_product_fts_ai', 'products_product_fts_au', 'products_product_fts_ad',
+             'products_category_fts_au')
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_INDEXED_PRODUCT_COLUMNS = 'name, barcode, color, storage_capacity, series_region, category_id'
+
+
+def _row_select(alias):
+    return (f"{alias}.id, {alias}.name, {alias}.barcode, {alias}.color, {alias}.storage_capacity, "
+            f"{alias}.series_region, (SELECT c.name FROM products_category c WHERE c.id = {alias}.category_id)")
+
+
+def _schema_statements():
+    columns = ', '.join(FTS_COLUMNS)
+    insert_new = '\n'.join(
+        f"INSERT INTO {table}(rowid, {columns}) SELECT {_row_select('new')};"
+        for table in (FTS_TABLE, FTS_TRIGRAM_TABLE)
+    )
+    delete_old = '\n'.join(f"DELETE FROM {table} WHERE rowid = old.id;" for table in (FTS_TABLE, FTS_TRIGRAM_TABLE))
+    update_category = '\n'.join(
+        f"UPDATE {table} SET category_name = new.name "
+        f"WHERE rowid IN (SELECT id FROM products_product WHERE category_id = new.id);"
+        for table in (FTS_TABLE, FTS_TRIGRAM_TABLE)
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns}, "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TRIGRAM_TABLE} USING fts5({columns}, tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS products_product_fts_ai AFTER INSERT ON products_product BEGIN\n{insert_new}\nEND",
+        # Faqat indeksdagi ustunlar o'zgarganda (narxlarni ommaviy yangilash indeksni qayta yozmasin)
+        f"CREATE TRIGGER IF NOT EXISTS products_product_fts_au AFTER UPDATE OF {_INDEXED_PRODUCT_COLUMNS} "
+        f"ON products_product BEGIN\n"
+        f"{delete_old}\n{insert_new}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS products_product_fts_ad AFTER DELETE ON products_product BEGIN\n{delete_old}\nEND",
+        f"CREATE TRIGGER IF NOT EXISTS products_category_fts_au AFTER UPDATE OF name ON products_category BEGIN\n"
+        f"{update_category}\nEND",
+    ]
+
+
+def _connection(using=None):
+    return connections[using or DEFAULT_DB_ALIAS]
+
+
+def is_search_index_supported(using=None):
+    return _connection(using).vendor == 'sqlite'
+
+
+def rebuild_product_search_index(using=None):
+    """FTS jadvallarini products_product dan to'liq qayta to'ldiradi"""
+    conn = _connection(using)
+    columns = ', '.join(FTS_COLUMNS)
+    with conn.cursor() as cursor:
+        for table in (FTS_TABLE, FTS_TRIGRAM_TABLE):
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f"INSERT INTO {table}(rowid, {columns}) SELECT {_row_select('p')} FROM products_product p")
+
+
+def ensure_product_search_index(using=None, **kwargs):
+    """
+    Jadval va triggerlar borligini tekshiradi, yo'q bo'lsa yaratib indeksni to'ldiradi.
+    post_migrate da chaqiriladi: SQLite da Django products_product jadvalini qayta qurganda
+    (AlterField va h.k.) triggerlar o'chib ketadi, bu yerda ular tiklanadi.
+    """
+    conn = _connection(using)
+    if conn.vendor != 'sqlite':
+        return False
+    statements = _schema_statements()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s)"
+                       % ', '.join(['%s'] * (len(_TRIGGERS) + 4)),
+                       ['products_product', 'products_category', FTS_TABLE, FTS_TRIGRAM_TABLE, *_TRIGGERS])
+        existing = dict(cursor.fetchall())
+        if not set(existing) >= {'products_product', 'products_category'}:
+            return False  # products migratsiyalari hali qo'llanmagan
+        # Trigger ta'rifi o'zgargan bo'lsa (eski versiya) - qayta yaratiladi, indeksni to'ldirish shart emas
+        outdated = [name for name in _TRIGGERS if name in existing and
+                    existing[name] != next(st for st in statements if f' {name} ' in st).replace(' IF NOT EXISTS', '')]
+        missing = not set(existing) >= {FTS_TABLE, FTS_TRIGRAM_TABLE, *_TRIGGERS}
+        if not missing and not outdated:
+            return False
+        for name in outdated:
+            cursor.execute(f"DROP TRIGGER {name}")
+        for statement in statements:
+            cursor.execute(statement)
+    if missing:
+        rebuild_product_search_index(using)
+        print("Mahsulot qidiruv indeksi (FTS5) yaratildi/tiklandi.")
+    return True
+
+
+def _tokens(term):
+    return [token.lower() for token in _TOKEN_RE.findall(term or '')][:8]
+
+
+def _match_expression(tokens):
+    # Har bir so'z prefiks sifatida, hammasi bo'lishi shart (AND)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _trigram_expression(tokens):
+    # Xato yozilgan so'zlar uchun: trigramlardan istalgani (OR), ko'p mos kelgani yuqorida
+    trigrams = {token[i:i + 3] for token in tokens if len(token) >= 3 for i in range(len(token) - 2)}
+    return ' OR '.join(f'"{trigram}"' for trigram in sorted(trigrams))
+
+
+def _weights_sql():
+    return ', '.join(str(weight) for weight in FTS_WEIGHTS)
+
+
+def _ranked_ids(table, expression, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY bm25({table}, {_weights_sql()}) LIMIT %s",
+            [expression, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _has_match(table, expression):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT 1 FROM {table} WHERE {table} MATCH %s LIMIT 1", [expression])
+        return cursor.fetchone() is not None
+
+
+def search_match(term):
+    """
+    (FTS jadvali, MATCH ifodasi) yoki None. Avval so'z/prefiks bo'yicha;
+    umuman mos kelmasa trigram bo'yicha (xatolarga chidamli).
+    """
+    tokens = _tokens(term)
+    if not tokens:
+        return None
+    expression = _match_expression(tokens)
+    if _has_match(FTS_TABLE, expression):
+        return FTS_TABLE, expression
+    expression = _trigram_expression(tokens)
+    if expression and _has_match(FTS_TRIGRAM_TABLE, expression):
+        return FTS_TRIGRAM_TABLE, expression
+    return None
+
+
+def search_product_ids(term, limit=None):
+    """Qidiruv so'ziga mos mahsulot ID lari (eng mosi birinchi, limit tagacha)"""
+    limit = limit or getattr(settings, 'PRODUCT_SEARCH_LIMIT', 200)
+    match = search_match(term)
+    return _ranked_ids(*match, limit) if match else []
+
+
+class ProductFullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter o'rniga FTS5 indeksidan foydalanadi (?search=...).
+    FTS jadvali mahsulotlarga JOIN qilinadi (ID lar ro'yxati kesilmaydi): view filtrlari
+    (aktivlik, kategoriya, kassa qoldig'i) barcha mos kelganlarga qo'llanadi, sahifalash esa keyin.
+    Natijalar moslik darajasi bo'yicha tartiblanadi (?ordering= berilsa u ustun).
+    FTS ishlamaydigan bazada odatdagi SearchFilter (LIKE) ishlaydi.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        term = ' '.join(self.get_search_terms(request))
+        if not term or not is_search_index_supported():
+            return super().filter_queryset(request, queryset, view)
+        match = search_match(term)
+        if match is None:
+            return queryset.none()
+        table, expression = match
+        product_table = queryset.model._meta.db_table
+        # bm25 faqat MATCH bilan bir so'rovda ishlaydi - shuning uchun subquery emas, JOIN
+        return queryset.extra(
+            select={'search_rank': f"bm25({table}, {_weights_sql()})"},
+            tables=[table],
+            where=[f"{table}.rowid = {product_table}.id", f"{table} MATCH %s"],
+            params=[expression],
+        ).order_by('search_rank', 'pk')
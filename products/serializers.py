@@ -3,12 +3,95 @@ from rest_framework import serializers
 from decimal import Decimal
 from django.db import transaction
 from django.db.models import F
-from .models import Kassa, Category, Product
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .models import Kassa, Category, Product, BarcodeSequence, ProductPriceHistory
 from .services import generate_unique_barcode_value
 from inventory.models import ProductStock, InventoryOperation
 from django.contrib.auth.models import User # Yoki settings.AUTH_USER_MODEL
 
 
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Oldindan yuklangan {pk: obj} lug'atidan foydalanadigan PrimaryKeyRelatedField:
+    - PrefetchingListSerializer har bir ro'yxat uchun uni maydonning o'ziga yozadi;
+    - paketli sinxronizatsiyada context['prefetched_objects'][Model] dan olinadi.
+    Lug'at bo'lmasa oddiy PrimaryKeyRelatedField kabi ishlaydi (har qiymatga bitta so'rov).
+    """
+    prefetched_objects = None
+
+    def get_prefetched_objects(self):
+        if self.prefetched_objects is not None:
+            return self.prefetched_objects
+        return self.context.get('prefetched_objects', {}).get(self.queryset.model)
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return self.queryset.model._meta.pk.to_python(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+    def to_internal_value(self, data):
+        objects = self.get_prefetched_objects()
+        if objects is None:
+            return super().to_internal_value(data)
+        obj = objects.get(self.to_pk(data))
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class PrefetchingListSerializer(serializers.ListSerializer):
+    """
+    many=True ro'yxatlar uchun: bola serializerdagi har bir PrefetchedPrimaryKeyRelatedField
+    qiymatlarini bitta in_bulk so'rovi bilan yuklaydi (qatorlar soniga bog'liq emas).
+    Topilmagan va aktiv bo'lmagan ID lar birgalikda bitta xatoda qaytariladi.
+    Ulash: class Meta: list_serializer_class = PrefetchingListSerializer
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.prefetch_related_fields(data)
+        return super().to_internal_value(data)
+
+    def prefetch_related_fields(self, data):
+        errors = []
+        for field_name, field in self.child.fields.items():
+            if not isinstance(field, PrefetchedPrimaryKeyRelatedField) or field.read_only:
+                continue
+            if self.context.get('prefetched_objects', {}).get(field.queryset.model) is not None:
+                continue  # Paket darajasida allaqachon yuklangan
+
+            pks = []
+            for item in data:
+                if not isinstance(item, dict) or item.get(field_name) in (None, ''):
+                    continue
+                try:
+                    pk = field.to_pk(item[field_name])
+                except serializers.ValidationError:
+                    continue  # Noto'g'ri turdagi qiymat - qatorning o'zida xato beriladi
+                if pk not in pks:
+                    pks.append(pk)
+
+            field.prefetched_objects = field.get_queryset().in_bulk(pks) if pks else {}
+            missing = [pk for pk in pks if pk not in field.prefetched_objects]
+            if not missing:
+                continue
+            # Bazada bormi (lekin aktiv emas / tanlab bo'lmaydi) yoki umuman yo'qmi
+            existing = set(field.queryset.model._default_manager.filter(pk__in=missing)
+                           .values_list('pk', flat=True))
+            label = field.label or field_name
+            not_found = [str(pk) for pk in missing if pk not in existing]
+            unavailable = [str(pk) for pk in missing if pk in existing]
+            if not_found:
+                errors.append(f"{label}: topilmadi (ID: {', '.join(not_found)}).")
+            if unavailable:
+                errors.append(f"{label}: aktiv emas yoki tanlab bo'lmaydi (ID: {', '.join(unavailable)}).")
+        if errors:
+            raise serializers.ValidationError(errors)
+
+
 class KassaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Kassa
@@ -151,9 +234,9 @@ class ProductSerializer(serializers.ModelSerializer):
                 defaults={'quantity': 0}
             )
             if initial_quantity_to_add > 0:
-                stock.quantity = F('quantity') + initial_quantity_to_add
-                stock.save()
-                stock.refresh_from_db()
+                from inventory.services import increment_stock  # Sikl importning oldini olish uchun
+                # Qoldiq, WAC qiymati va kam qoldiq holati bitta joyda
+                increment_stock(target_kassa, {product_instance.id: initial_quantity_to_add})
 
                 operation_comment = f"{product_instance.name}"
                 InventoryOperation.objects.create(
@@ -172,18 +255,91 @@ class ProductSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):  # update metodi ham class ichida
         validated_data.pop('identifier_type', None)
         validated_data.pop('add_to_stock_quantity', None)
-        return super().update(instance, validated_data)
+        old_price_usd, old_price_uzs = instance.price_usd, instance.price_uzs
+        instance = super().update(instance, validated_data)
+        if (old_price_usd, old_price_uzs) != (instance.price_usd, instance.price_uzs):
+            from settings_app.models import CurrencyRate
+            request = self.context.get('request')
+            ProductPriceHistory.objects.create(
+                product=instance, old_price_usd=old_price_usd, old_price_uzs=old_price_uzs,
+                new_price_usd=instance.price_usd, new_price_uzs=instance.price_uzs,
+                usd_to_uzs_rate=CurrencyRate.load().usd_to_uzs_rate, source=ProductPriceHistory.Source.MANUAL,
+                user=request.user if request and request.user.is_authenticated else None
+            )
+        return instance
 
 
 class ProductLabelDataSerializer(serializers.Serializer):
     # ... (o'zgarishsiz)
     name = serializers.CharField(read_only=True)
     barcode_image_base64 = serializers.CharField(read_only=True)
+    barcode_image_url = serializers.CharField(read_only=True)  # ?image=url bo'lganda
     barcode_number = serializers.CharField(read_only=True)
     storage_capacity = serializers.CharField(required=False, allow_null=True)
     battery_health = serializers.IntegerField(required=False, allow_null=True)
     series_region = serializers.CharField(required=False, allow_null=True)
 
+
+class BarcodeBatchRequestSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=10000, label="Soni")
+    category_id = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), required=False, allow_null=True,
+                                                     label="Kategoriya (prefiks uchun)")
+    symbology = serializers.ChoiceField(choices=BarcodeSequence.Symbology.choices,
+                                        default=BarcodeSequence.Symbology.PLAIN, label="Turi")
+
+
+class ProductPriceHistorySerializer(serializers.ModelSerializer):
+    source_display = serializers.CharField(source='get_source_display', read_only=True)
+    user_username = serializers.CharField(source='user.username', read_only=True, allow_null=True)
+
+    class Meta:
+        model = ProductPriceHistory
+        fields = ['id', 'product', 'old_price_usd', 'new_price_usd', 'old_price_uzs', 'new_price_uzs',
+                  'usd_to_uzs_rate', 'source', 'source_display', 'user', 'user_username', 'comment', 'created_at']
+
+
+class RepriceRequestSerializer(serializers.Serializer):
+    """Kurs bo'yicha qayta narxlash parametrlari (products/repricing.py)"""
+    direction = serializers.ChoiceField(choices=['usd_to_uzs', 'uzs_to_usd'], default='usd_to_uzs',
+                                        label="Yo'nalish", help_text="usd_to_uzs: price_uzs = price_usd * kurs")
+    rate = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=Decimal('0.01'), required=False,
+                                    label="Kurs", help_text="Berilmasa joriy CurrencyRate ishlatiladi")
+    category_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                         label="Kategoriyalar", help_text="Bo'sh bo'lsa barcha kategoriyalar")
+    markup_percent = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=Decimal('-99'),
+                                              max_value=Decimal('1000'), default=Decimal('0'), label="Ustama (%)")
+    round_to = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0.01'), required=False,
+                                       allow_null=True, label="Yaxlitlash qadami", help_text="Masalan: 1000 (so'm) yoki 1 ($)")
+    rounding = serializers.ChoiceField(choices=['nearest', 'up', 'down'], default='nearest', label="Yaxlitlash turi")
+    only_active = serializers.BooleanField(default=True, label="Faqat aktiv mahsulotlar")
+    dry_run = serializers.BooleanField(default=False, label="Faqat farqlarni ko'rsatish (yozmaslik)")
+    comment = serializers.CharField(max_length=255, required=False, allow_blank=True, label="Izoh")
+
+
+class ProductImportRequestSerializer(serializers.Serializer):
+    file = serializers.FileField(label="CSV yoki XLSX fayl")
+    kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True), required=False,
+                                                  allow_null=True, label="Standart kassa (kassa ustuni bo'sh bo'lsa)")
+    auto_barcode = serializers.BooleanField(default=True, label="Bo'sh shtrix-kodlarni avtomatik berish")
+    dry_run = serializers.BooleanField(default=False, label="Faqat tekshirish (yozmaslik)")
+
+
+class LabelSheetRequestSerializer(serializers.Serializer):
+    """Ko'p yorliqli varaq: product_ids yoki purchase_order_id dan biri"""
+    product_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False,
+                                        allow_empty=False, max_length=2000, label="Mahsulotlar ID lari")
+    purchase_order_id = serializers.IntegerField(required=False, min_value=1, label="Xarid ID si",
+                                                 help_text="Har bir element uchun buyurtma qilingan miqdorcha yorliq")
+    copies = serializers.IntegerField(default=1, min_value=1, max_value=100, label="Nusxalar soni",
+                                      help_text="product_ids uchun har bir mahsulotdan nechta yorliq")
+    output = serializers.ChoiceField(choices=['pdf', 'png'], default='pdf', label="Natija formati",
+                                     help_text="pdf - bitta PDF, png - varaqlar ZIP arxivda (oqim bilan)")
+
+    def validate(self, data):
+        if bool(data.get('product_ids')) == bool(data.get('purchase_order_id')):
+            raise serializers.ValidationError("product_ids yoki purchase_order_id dan bittasini yuboring.")
+        return data
+
 # # products/serializers.py
 # from rest_framework import serializers
 # from decimal import Decimal  # Narxlar uchun
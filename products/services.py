@@ -1,92 +1,468 @@
 # products/services.py
-import random
-import string  # Bu endi string.digits uchun kerak
 import base64
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+from itertools import repeat
 
-import barcode
-from barcode.writer import ImageWriter
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction, connection
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+from PIL import Image
 
-from .models import Product, Category
+from .models import Product, Category, BarcodeSequence
+from .label_render import render_barcode_png, render_label_page
 
 
-def generate_unique_barcode_value(category_id=None, data_length=9):  # DATA_LENGTH NI 9 QILDIK
+EAN13_DATA_LENGTH = 12
+# Bitta UPDATE bilan band qilinadigan qiymatlar soni (xotiradan beriladi)
+BARCODE_BLOCK_SIZE = 100
+
+
+def ean13_checksum(data):
+    """12 xonali ma'lumot uchun EAN-13 nazorat raqami"""
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(data))
+    return str((10 - total % 10) % 10)
+
+
+def _category_barcode_prefix(category_id):
+    if not category_id:
+        return ""
+    prefix = Category.objects.filter(pk=category_id).values_list('barcode_prefix', flat=True).first()
+    prefix = str(prefix or '').strip()
+    if prefix and not prefix.isdigit():
+        print(f"WARNING: Kategoriya prefiksi '{prefix}' raqam emas. Prefiks e'tiborga olinmaydi.")
+        return ""
+    return prefix
+
+
+class BarcodeAllocator:
     """
-    Kategoriya prefiksi bilan (agar mavjud bo'lsa) yoki prefikssiz,
-    FAQAT RAQAMLARDAN iborat unikal shtrix-kod generatsiya qiladi.
-    Qavslar ishlatilmaydi. data_length - bu tasodifiy raqamlar qismining uzunligi.
+    Ketma-ket (yoki EAN-13) shtrix-kodlarni BarcodeSequence hisoblagichidan bloklab oladi.
+    Blok bitta UPDATE ... SET next_value = next_value + n bilan band qilinadi, shuning uchun
+    parallel so'rovlar (va boshqa jarayonlar) bir xil qiymat olmaydi. Blokdagi eski tasodifiy
+    kodlar bilan to'qnashganlar bitta so'rov bilan chiqarib tashlanadi.
+    Ishlatilmay qolgan qiymatlar jarayon to'xtaganda yo'qoladi (faqat bo'shliq qoladi).
+    Chaqiruvchining tranzaksiyasi ichida faqat keragicha olinadi va xotiraga qo'yilmaydi:
+    tranzaksiya bekor qilinsa hisoblagich ham qaytadi, xotiradagi kodlar esa qayta berilib qolardi.
     """
-    prefix_from_category = ""
-    if category_id:
-        try:
-            category = Category.objects.get(pk=category_id)
-            if category.barcode_prefix:
-                # Prefiks faqat raqamlardan iborat ekanligiga ishonch hosil qilish
-                # Modelda RegexValidator(r'^[0-9]*$') bo'lishi kerak
-                prefix_from_category = str(category.barcode_prefix).strip()
-                if not prefix_from_category.isdigit():
-                    print(
-                        f"WARNING: Kategoriya prefiksi '{prefix_from_category}' raqam emas. Prefiks e'tiborga olinmaydi.")
-                    prefix_from_category = ""  # Agar raqam bo'lmasa, ishlatmaymiz
-        except Category.DoesNotExist:
-            pass
-
-    # Faqat raqamlardan iborat random qism
-    characters_for_data = string.digits
-
-    while True:
-        random_part = ''.join(random.choices(characters_for_data, k=data_length))
-        # Prefiks + Random raqamlar
-        full_barcode_value = prefix_from_category + random_part
-
-        # Skanerlar uchun Code128 yaxshi, lekin agar faqat raqamlar bo'lsa, EAN turi ham bo'lishi mumkin.
-        # Uzunlikni tekshirish: Agar siz EAN standartiga o'tmoqchi bo'lsangiz,
-        # masalan EAN-13 uchun full_barcode_value 12 raqamli bo'lishi kerak (13-chi checksum).
-        # Hozircha umumiy uzunlikni tekshirmaymiz, Code128 ga ishonamiz.
-
-        if not Product.objects.filter(barcode=full_barcode_value).exists():
-            return full_barcode_value
 
+    def __init__(self):
+        self._pools = {}
+        self._lock = threading.Lock()
 
-def generate_barcode_image(barcode_value_from_db, barcode_image_type='Code128', writer_options_override=None):
+    def _format(self, prefix, symbology, length, value):
+        body_length = length - len(prefix)
+        body = str(value).zfill(body_length)
+        if len(body) > body_length:
+            raise ValidationError(f"'{prefix}' prefiksi uchun {length} xonali shtrix-kodlar tugadi.")
+        code = prefix + body
+        if symbology == BarcodeSequence.Symbology.EAN13:
+            code += ean13_checksum(code)
+        return code
+
+    def _reserve(self, prefix, symbology, length, count):
+        """count ta bo'sh (bazada yo'q) kodni bitta tranzaksiyada band qiladi"""
+        codes = []
+        with transaction.atomic():
+            sequence, _ = BarcodeSequence.objects.get_or_create(prefix=prefix, symbology=symbology, length=length)
+            while len(codes) < count:
+                need = count - len(codes)
+                BarcodeSequence.objects.filter(pk=sequence.pk).update(next_value=F('next_value') + need)
+                end = BarcodeSequence.objects.values_list('next_value', flat=True).get(pk=sequence.pk)
+                block = [self._format(prefix, symbology, length, value) for value in range(end - need, end)]
+                taken = set()
+                for start in range(0, len(block), 900):  # SQLite parametrlar chegarasi
+                    taken.update(Product.objects.filter(barcode__in=block[start:start + 900])
+                                 .values_list('barcode', flat=True))
+                codes.extend(code for code in block if code not in taken)
+        return codes
+
+    def allocate(self, count, category_id=None, symbology=BarcodeSequence.Symbology.PLAIN, data_length=None):
+        """count ta unikal kod. Avval xotiradagi blokdan, yetmasa bazadan yangi blok."""
+        prefix = _category_barcode_prefix(category_id)
+        if symbology == BarcodeSequence.Symbology.EAN13:
+            length = EAN13_DATA_LENGTH
+            if len(prefix) >= length:
+                raise ValidationError("EAN-13 uchun prefiks juda uzun.")
+        else:
+            length = len(prefix) + (data_length or max(1, 9 - len(prefix)))
+        key = (prefix, symbology, length)
+        with self._lock:
+            pool = self._pools.setdefault(key, deque())
+            codes = [pool.popleft() for _ in range(min(count, len(pool)))]
+            if len(codes) < count:
+                missing = count - len(codes)
+                # Kam so'ralganda butun blok olamiz, katta so'rovda faqat keragicha.
+                # Tashqi tranzaksiya ichida blok xotiraga olinmaydi (bekor qilinsa takrorlanmasligi uchun)
+                block_size = 0 if connection.in_atomic_block else getattr(settings, 'BARCODE_BLOCK_SIZE',
+                                                                          BARCODE_BLOCK_SIZE)
+                reserved = self._reserve(prefix, symbology, length, max(missing, block_size))
+                codes.extend(reserved[:missing])
+                pool.extend(reserved[missing:])
+        return codes
+
+
+barcode_allocator = BarcodeAllocator()
+
+
+def generate_unique_barcode_values(count, category_id=None, symbology=BarcodeSequence.Symbology.PLAIN):
+    """Import/kirim uchun bir yo'la N ta unikal shtrix-kod (bitta tranzaksiya)"""
+    return barcode_allocator.allocate(count, category_id=category_id, symbology=symbology)
+
+
+def generate_unique_barcode_value(category_id=None, data_length=9, symbology=BarcodeSequence.Symbology.PLAIN):
     """
-    Shtrix-kod rasmini generatsiya qiladi.
-    Rasm ostidagi matnni python-barcode kutubxonasi o'zi chiqaradi.
+    Kategoriya prefiksi bilan (agar mavjud bo'lsa) yoki prefikssiz,
+    FAQAT RAQAMLARDAN iborat unikal shtrix-kod qaytaradi (ketma-ket, hisoblagichdan).
+    data_length - prefiksdan keyingi qism uzunligi (EAN-13 da e'tiborga olinmaydi).
     """
+    return barcode_allocator.allocate(1, category_id=category_id, symbology=symbology, data_length=data_length)[0]
 
-    data_to_encode = str(barcode_value_from_db).strip()
-    if not data_to_encode:
-        print("Xatolik: Shtrix-kod qiymati rasm generatsiyasi uchun bo'sh.")
-        return None
 
-    # Standart writer options
-    default_writer_options = {
-        'module_height': 15.0,  # Balandlikni oshirish mumkin (masalan, 15.0 - 20.0)
-        'module_width': 0.3,  # Chiziq qalinligi (0.2 dan 0.5 gacha sinab ko'ring)
-        'font_size': 10,  # Matn o'lchami
-        'text_distance': 5.0,  # Matn va chiziqlar orasidagi masofa
-        'quiet_zone': 7.0,  # Chetdagi bo'sh joy (skaner uchun muhim)
-        'write_text': True  # Matnni chiqarish
-    }
+# Shtrix-kod rasmlari keshi: MEDIA_ROOT/barcodes/<xesh[:2]>/<xesh>.png, oldida jarayon ichidagi LRU.
+# Rasm faqat (qiymat, simvologiya, writer sozlamalari) ga bog'liq, shuning uchun xesh - doimiy kalit.
+BARCODE_IMAGE_DIR = 'barcodes'
+DEFAULT_BARCODE_WRITER_OPTIONS = {
+    'module_height': 15.0,  # Balandlikni oshirish mumkin (masalan, 15.0 - 20.0)
+    'module_width': 0.3,  # Chiziq qalinligi (0.2 dan 0.5 gacha sinab ko'ring)
+    'font_size': 10,  # Matn o'lchami
+    'text_distance': 5.0,  # Matn va chiziqlar orasidagi masofa
+    'quiet_zone': 7.0,  # Chetdagi bo'sh joy (skaner uchun muhim)
+    'write_text': True  # Matnni chiqarish
+}
+
+
+class _BarcodeImageLRU:
+    """Eng ko'p ishlatilgan PNG lar xotirada (kalit -> bytes)"""
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
 
-    final_writer_options = default_writer_options.copy()
+    def get(self, key):
+        with self._lock:
+            png = self._items.get(key)
+            if png is not None:
+                self._items.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        max_size = getattr(settings, 'BARCODE_IMAGE_LRU_SIZE', 512)
+        with self._lock:
+            self._items[key] = png
+            self._items.move_to_end(key)
+            while len(self._items) > max_size:
+                self._items.popitem(last=False)
+
+
+_barcode_image_lru = _BarcodeImageLRU()
+
+
+def _writer_options(writer_options_override=None):
+    options = DEFAULT_BARCODE_WRITER_OPTIONS.copy()
     if writer_options_override:
-        final_writer_options.update(writer_options_override)
-    final_writer_options.setdefault('write_text', True)
+        options.update(writer_options_override)
+    options.setdefault('write_text', True)
+    return options
+
+
+def barcode_image_key(value, barcode_image_type, options):
+    raw = json.dumps([value, barcode_image_type, options], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def barcode_image_path(key):
+    return f"{BARCODE_IMAGE_DIR}/{key[:2]}/{key}.png"
+
+
+def _read_cached_png(key):
+    """LRU, so'ng diskdagi kesh. Topilmasa None"""
+    png = _barcode_image_lru.get(key)
+    if png is not None:
+        return png
+    path = barcode_image_path(key)
+    try:
+        if default_storage.exists(path):
+            with default_storage.open(path, 'rb') as cached_file:
+                png = cached_file.read()
+    except OSError as e:
+        print(f"Shtrix-kod keshini o'qishda xatolik: {e} ({path})")
+    if png:
+        _barcode_image_lru.put(key, png)
+        return png
+    return None
+
 
+def store_barcode_png(key, png):
+    path = barcode_image_path(key)
     try:
-        BARCODE_CLASS = barcode.get_barcode_class(barcode_image_type)
-        # Code128 qisqa raqamli kodlarni ham yaxshi qabul qiladi.
-        instance = BARCODE_CLASS(data_to_encode, writer=ImageWriter())
+        saved_name = default_storage.save(path, ContentFile(png))
+        if saved_name != path:
+            # Parallel so'rov shu faylni bizdan oldin yozgan, nusxani o'chiramiz
+            default_storage.delete(saved_name)
+    except OSError as e:
+        print(f"Shtrix-kod keshini yozishda xatolik: {e} ({path})")
+    _barcode_image_lru.put(key, png)
 
-        buffer = BytesIO()
-        instance.write(buffer, options=final_writer_options)
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.read()).decode('utf-8')
-        return f"data:image/png;base64,{image_base64}"
 
+def get_cached_barcode_png(barcode_value, barcode_image_type='Code128', writer_options_override=None):
+    """(kalit, png yoki None) - chizmaydi, faqat keshdan qidiradi"""
+    options = _writer_options(writer_options_override)
+    key = barcode_image_key(str(barcode_value).strip(), barcode_image_type, options)
+    return key, _read_cached_png(key)
+
+
+def get_barcode_png(barcode_value_from_db, barcode_image_type='Code128', writer_options_override=None):
+    """
+    Shtrix-kod PNG sini keshdan oladi yoki bir marta chizib keshga yozadi.
+    Natija: (kalit, png_bytes) yoki xatolikda (None, None).
+    """
+    data_to_encode = str(barcode_value_from_db).strip()
+    if not data_to_encode:
+        print("Xatolik: Shtrix-kod qiymati rasm generatsiyasi uchun bo'sh.")
+        return None, None
+
+    options = _writer_options(writer_options_override)
+    key = barcode_image_key(data_to_encode, barcode_image_type, options)
+    png = _read_cached_png(key)
+    if png is not None:
+        return key, png
+
+    try:
+        png = render_barcode_png(data_to_encode, barcode_image_type, options)
     except Exception as e:
         print(f"Shtrix-kod rasmini generatsiya qilishda xatolik: {e} (qiymat: {data_to_encode})")
         import traceback
         print(traceback.format_exc())
-        return None
\ No newline at end of file
+        return None, None
+    store_barcode_png(key, png)
+    return key, png
+
+
+def barcode_image_url(key):
+    return default_storage.url(barcode_image_path(key))
+
+
+def generate_barcode_image(barcode_value_from_db, barcode_image_type='Code128', writer_options_override=None):
+    """
+    Shtrix-kod rasmini data URI (base64) ko'rinishida qaytaradi.
+    Rasm ostidagi matnni python-barcode kutubxonasi o'zi chiqaradi. Rasm keshdan olinadi.
+    """
+    key, png = get_barcode_png(barcode_value_from_db, barcode_image_type, writer_options_override)
+    if png is None:
+        return None
+    image_base64 = base64.b64encode(png).decode('utf-8')
+    return f"data:image/png;base64,{image_base64}"
+
+
+# --- Yorliqlar varag'i (ko'p yorliqni bitta PDF/PNG da chop etish) ---
+
+LABEL_SHEET_DPI = 200
+DEFAULT_LABEL_SHEET_LAYOUT = {
+    'page_size': (1654, 2339),  # A4, 200 dpi
+    'columns': 3,
+    'rows': 8,
+    'margin': 40,
+    'title_font_size': 28,
+    'text_font_size': 22,
+    'draw_borders': True,
+}
+
+_label_pool = None
+_label_pool_lock = threading.Lock()
+
+
+def build_label_data(product):
+    """print-label-data dagi ma'lumotlar (iPhone uchun batareya va region ham)"""
+    label_data = {
+        "name": product.name,
+        "barcode_number": product.barcode,
+        "storage_capacity": product.storage_capacity,
+    }
+    if product.category and product.category.name and 'iphone' in product.category.name.lower():
+        label_data["battery_health"] = product.battery_health
+        label_data["series_region"] = product.series_region
+    return label_data
+
+
+def _label_lines(label_data):
+    lines = []
+    if label_data.get('storage_capacity'):
+        lines.append(str(label_data['storage_capacity']))
+    if label_data.get('battery_health') is not None:
+        lines.append(f"Batareya: {label_data['battery_health']}%")
+    if label_data.get('series_region'):
+        lines.append(str(label_data['series_region']))
+    return [' | '.join(lines)] if lines else []
+
+
+def _label_layout():
+    layout = DEFAULT_LABEL_SHEET_LAYOUT.copy()
+    layout.update(getattr(settings, 'LABEL_SHEET_LAYOUT', {}))
+    layout['font_path'] = str(settings.BASE_DIR / 'static' / 'fonts' / 'arial.ttf')
+    layout['symbology'] = 'Code128'
+    layout['writer_options'] = _writer_options()
+    return layout
+
+
+def _get_label_pool():
+    """Yorliq chizish uchun umumiy jarayonlar havzasi (API workerlarini CPU bilan band qilmaslik uchun)"""
+    global _label_pool
+    with _label_pool_lock:
+        if _label_pool is None:
+            workers = getattr(settings, 'LABEL_RENDER_WORKERS', None) or min(4, os.cpu_count() or 1)
+            _label_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _label_pool
+
+
+def _reset_label_pool():
+    global _label_pool
+    with _label_pool_lock:
+        if _label_pool is not None:
+            _label_pool.shutdown(wait=False, cancel_futures=True)
+        _label_pool = None
+
+
+def iter_label_pages(labels_data):
+    """
+    Yorliqlarni varaqlarga bo'lib, jarayonlar havzasida chizadi va varaqlarni tartib bilan
+    (PNG bytes) qaytaradi. Keshdagi shtrix-kodlar ishchiga tayyor holda beriladi, keshda
+    yo'qlari ishchida chiziladi va shu yerda keshga yoziladi (qayta chop etishda chizilmaydi).
+    """
+    layout = _label_layout()
+    per_page = layout['columns'] * layout['rows']
+    entries = []
+    for label_data in labels_data:
+        key, png = get_cached_barcode_png(label_data['barcode_number'])
+        entries.append({
+            'key': key, 'barcode_png': png, 'barcode_number': str(label_data['barcode_number']).strip(),
+            'name': label_data['name'], 'lines': _label_lines(label_data),
+        })
+    pages = [entries[start:start + per_page] for start in range(0, len(entries), per_page)]
+
+    if len(pages) <= 1:
+        results = (render_label_page(page, layout) for page in pages)
+    else:
+        try:
+            results = _get_label_pool().map(render_label_page, pages, repeat(layout))
+        except BrokenProcessPool:
+            _reset_label_pool()
+            raise
+
+    for page_png, rendered in results:
+        for key, png in rendered.items():
+            store_barcode_png(key, png)
+        yield page_png
+
+
+def stream_label_sheet_pdf(labels_data):
+    """
+    PDF ni varaqma-varaq oqim sifatida qaytaradi: butun fayl xotirada yig'ilmaydi.
+    Har bir varaq 1-bitli rasm (oq-qora, hajm ~5 barobar kichik), Flate bilan siqiladi.
+    Pages obyekti va xref jadvali oxirida yoziladi - ular faqat barcha varaqlar tayyor bo'lgach yuboriladi.
+    """
+    offsets = {}
+    written = 0
+    chunk = []
+
+    def emit(number, body):
+        nonlocal written
+        data = f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        offsets[number] = written
+        written += len(data)
+        chunk.append(data)
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    written = len(header)
+    chunk.append(header)
+    emit(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    page_ids = []
+    next_id = 3
+    for page_png in iter_label_pages(labels_data):
+        image = Image.open(BytesIO(page_png)).convert('1')
+        width, height = image.size
+        # '1' rejimida 1 - oq, 0 - qora: DeviceGray 1-bit bilan bir xil
+        pixels = zlib.compress(image.tobytes())
+        width_pt, height_pt = width * 72 / LABEL_SHEET_DPI, height * 72 / LABEL_SHEET_DPI
+        image_id, content_id, page_id = next_id, next_id + 1, next_id + 2
+        next_id += 3
+        emit(image_id, (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                        f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode "
+                        f"/Length {len(pixels)} >>\nstream\n").encode() + pixels + b"\nendstream")
+        content = f"q {width_pt:.2f} 0 0 {height_pt:.2f} 0 0 cm /Im0 Do Q".encode()
+        emit(content_id, f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+        emit(page_id, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] "
+                       f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>").encode())
+        page_ids.append(page_id)
+        yield b''.join(chunk)
+        chunk.clear()
+
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    emit(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode())
+    xref = [f"xref\n0 {next_id}\n0000000000 65535 f \n"]
+    xref += [f"{offsets[number]:010d} 00000 n \n" for number in range(1, next_id)]
+    xref.append(f"trailer\n<< /Size {next_id} /Root 1 0 R >>\nstartxref\n{written}\n%%EOF\n")
+    chunk.append(''.join(xref).encode())
+    yield b''.join(chunk)
+
+
+class _ZipStream:
+    """zipfile uchun faqat yoziladigan oqim: yozilganlarni bo'laklab olib ketamiz"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data, self._chunks = b''.join(self._chunks), []
+        return data
+
+
+def stream_label_sheet_zip(labels_data):
+    """Varaqlarni (page-001.png, ...) tayyor bo'lishi bilan ZIP oqimi sifatida qaytaradi"""
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for number, page_png in enumerate(iter_label_pages(labels_data), start=1):
+            archive.writestr(f"page-{number:03d}.png", page_png)
+            yield stream.pop()
+    yield stream.pop()
+
+
+def guard_label_stream(chunks):
+    """
+    Oqimni javobga tayyorlaydi. Birinchi bo'lak shu yerda olinadi - boshidagi xatolar view ichida
+    500 javobga aylanadi. Oqim davomidagi xato yozib qo'yiladi va qayta ko'tariladi: server ulanishni
+    uzadi, oxirgi qism (PDF xref / ZIP katalogi) yuborilmaydi - mijoz kesilgan faylni to'liq 200 deb olmaydi.
+    """
+    first = next(chunks, b'')
+
+    def guarded():
+        yield first
+        try:
+            yield from chunks
+        except Exception as e:
+            print(f"Yorliqlar oqimida xatolik, javob uziladi: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+    return guarded()
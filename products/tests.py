@@ -1,3 +1,29 @@
-from django.test import TestCase
+from django.db import transaction
+from django.test import TransactionTestCase
 
-# Create your tests here.
+from .models import Product
+from .services import BarcodeAllocator
+
+
+class _Rollback(Exception):
+    pass
+
+
+class BarcodeAllocatorRollbackTests(TransactionTestCase):
+    """Bekor qilingan yaratishdan keyin kodlar takrorlanmasligi (xotiradagi blok + hisoblagich)"""
+
+    def test_rolled_back_create_does_not_repeat_codes(self):
+        worker = BarcodeAllocator()
+        try:
+            with transaction.atomic():
+                code = worker.allocate(1)[0]
+                Product.objects.create(name="Bekor qilinadi", barcode=code)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        other_worker = BarcodeAllocator()
+        codes = worker.allocate(3) + other_worker.allocate(3) + worker.allocate(2)
+        self.assertEqual(len(codes), len(set(codes)))
+        for index, code in enumerate(codes):
+            Product.objects.create(name=f"Mahsulot {index}", barcode=code)
+        self.assertEqual(Product.objects.count(), len(codes))
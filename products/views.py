@@ -1,12 +1,47 @@
 # products/views.py
+import base64
+
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework import viewsets, status, filters, permissions
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .models import Kassa, Category, Product
+from .models import Kassa, Category, Product, BarcodeSequence
 from .serializers import *
-from .services import generate_unique_barcode_value, generate_barcode_image  # YANGILANGAN IMPORTLAR
+from .services import generate_unique_barcode_value, generate_unique_barcode_values, get_barcode_png, barcode_image_url, build_label_data, \
+    stream_label_sheet_pdf, stream_label_sheet_zip, guard_label_stream  # YANGILANGAN IMPORTLAR
+from .search import ProductFullTextSearchFilter
+from .importer import ProductImporter, ImportFileError, iter_import_rows, IMPORT_COLUMNS
+from .repricing import reprice_products, RepricingError
+
+
+# ?image= qiymatlari: base64 (data URI, avvalgidek), url (MEDIA dagi keshlangan fayl), png (rasmning o'zi)
+BARCODE_IMAGE_MODES = ('base64', 'url', 'png')
+
+
+def _barcode_png_response(request, key, png):
+    """
+    URL mahsulot ID siga bog'liq (kontentga emas): shtrix-kod o'zgarsa rasm ham o'zgaradi.
+    Shuning uchun har safar ETag bilan tekshiriladi (o'zgarmagan bo'lsa 304), javob esa
+    autentifikatsiyali bo'lgani uchun umumiy keshlarda saqlanmaydi.
+    Uzoq muddat keshlanadigan, kontentga bog'liq manzil - ?image=url (MEDIA dagi xeshli fayl).
+    """
+    etag = f'"{key}"'
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = HttpResponse(png, content_type='image/png')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _barcode_image_fields(request, key, png, image_mode):
+    if image_mode == 'url':
+        return {"barcode_image_url": request.build_absolute_uri(barcode_image_url(key))}
+    return {"barcode_image_base64": f"data:image/png;base64,{base64.b64encode(png).decode('utf-8')}"}
 
 
 class KassaViewSet(viewsets.ModelViewSet):
@@ -34,9 +69,9 @@ class ProductViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.select_related('category').all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductFullTextSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'is_active']
-    search_fields = ['name', 'barcode', 'description', 'category__name']
+    search_fields = ['name', 'barcode', 'description', 'category__name']  # FTS ishlamaydigan bazada (LIKE)
     ordering_fields = ['name', 'price_uzs', 'price_usd', 'created_at']
 
     def get_queryset(self):
@@ -52,7 +87,8 @@ class ProductViewSet(viewsets.ModelViewSet):
         return queryset.filter(is_active=True).order_by('name')
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'generate_barcode', 'barcode_data']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'generate_barcode', 'generate_barcodes',
+                           'barcode_data', 'import_products', 'reprice']:
             return [permissions.IsAdminUser()]
         return [permissions.IsAuthenticated()]
 
@@ -83,25 +119,47 @@ class ProductViewSet(viewsets.ModelViewSet):
                 pass
 
         random_part_actual_length = max(1, 9 - prefix_len)
+        symbology = request.query_params.get('symbology', BarcodeSequence.Symbology.PLAIN)
+        if symbology not in BarcodeSequence.Symbology.values:
+            return Response({"error": f"symbology: {', '.join(BarcodeSequence.Symbology.values)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         barcode_number = generate_unique_barcode_value(
             category_id=category_id,
-            data_length=random_part_actual_length
+            data_length=random_part_actual_length,
+            symbology=symbology
         )
         return Response({"barcode": barcode_number}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='generate-barcodes')
+    def generate_barcodes(self, request):
+        """Import/kirim uchun bir yo'la N ta unikal shtrix-kod: {"count": 500, "category_id": 1, "symbology": "ean13"}"""
+        serializer = BarcodeBatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        category = data.get('category_id')
+        barcodes = generate_unique_barcode_values(data['count'], category_id=category.id if category else None,
+                                                  symbology=data['symbology'])
+        return Response({"count": len(barcodes), "barcodes": barcodes}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['get'], url_path='barcode-data')
     def barcode_data(self, request, pk=None):
         product = self.get_object()
         if not product.barcode:
             return Response({"error": "Mahsulot uchun shtrix-kod mavjud emas."}, status=status.HTTP_404_NOT_FOUND)
+        image_mode = request.query_params.get('image', 'base64')
+        if image_mode not in BARCODE_IMAGE_MODES:
+            return Response({"error": f"image parametri: {', '.join(BARCODE_IMAGE_MODES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        # barcode_image_type='Code128' (yoki services.py dagi default)
-        barcode_image_base64 = generate_barcode_image(product.barcode, barcode_image_type='Code128')
+        # barcode_image_type='Code128' (yoki services.py dagi default). Rasm keshdan olinadi
+        key, png = get_barcode_png(product.barcode, barcode_image_type='Code128')
 
-        if not barcode_image_base64:
+        if png is None:
             return Response({"error": "Shtrix-kod rasmini generatsiya qilib bo'lmadi."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if image_mode == 'png':
+            return _barcode_png_response(request, key, png)
 
         price_display = "Narx belgilanmagan"
         if product.price_uzs is not None:
@@ -112,8 +170,8 @@ class ProductViewSet(viewsets.ModelViewSet):
         data_for_serializer = {
             "name": product.name,
             "price_display_str": price_display,
-            "barcode_image_base64": barcode_image_base64,
-            "barcode_number": product.barcode
+            "barcode_number": product.barcode,
+            **_barcode_image_fields(request, key, png, image_mode)
         }
         serializer = ProductLabelDataSerializer(
             instance=data_for_serializer)  # Bu serializer avvalgi javobda to'g'rilangan edi
@@ -127,25 +185,125 @@ class ProductViewSet(viewsets.ModelViewSet):
         if not barcode_to_print:
             return Response({"error": "Chop etish uchun shtrix-kod/IMEI mavjud emas."},
                             status=status.HTTP_404_NOT_FOUND)
+        image_mode = request.query_params.get('image', 'base64')
+        if image_mode not in BARCODE_IMAGE_MODES:
+            return Response({"error": f"image parametri: {', '.join(BARCODE_IMAGE_MODES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-        # Rasm generatsiyasi (Code128 bilan)
-        barcode_image_base64 = generate_barcode_image(barcode_to_print, barcode_image_type='Code128')
+        # Rasm (Code128 bilan), keshdan
+        key, png = get_barcode_png(barcode_to_print, barcode_image_type='Code128')
 
-        if not barcode_image_base64:
+        if png is None:
             return Response({"error": "Shtrix-kod/IMEI rasmini generatsiya qilib bo'lmadi."},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if image_mode == 'png':
+            return _barcode_png_response(request, key, png)
 
-        label_data = {
-            "name": product.name,
-            "barcode_image_base64": barcode_image_base64,
-            "barcode_number": barcode_to_print,
-            "storage_capacity": product.storage_capacity,  # Xotirani qo'shamiz
-        }
-
-        # Kategoriya nomini tekshirib, iPhone uchun qo'shimcha ma'lumotlarni qo'shish
-        if product.category and product.category.name and 'iphone' in product.category.name.lower():
-            label_data["battery_health"] = product.battery_health
-            label_data["series_region"] = product.series_region
+        # Nomi, xotira va iPhone uchun batareya/region (services.build_label_data)
+        label_data = {**build_label_data(product), **_barcode_image_fields(request, key, png, image_mode)}
 
         serializer = ProductLabelDataSerializer(instance=label_data)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_products(self, request):
+        """
+        CSV/XLSX fayldan mahsulotlarni ommaviy import qilish (multipart: file).
+        Ustunlar: name (majburiy), barcode, category (ID yoki nom), price_uzs, price_usd, quantity, kassa, ...
+        Ixtiyoriy: kassa_id (standart kassa), auto_barcode (true), dry_run (false - faqat tekshirish).
+        """
+        serializer = ProductImportRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        uploaded_file = data['file']
+        try:
+            importer = ProductImporter(user=request.user, default_kassa=data.get('kassa_id'),
+                                       auto_barcode=data['auto_barcode'], dry_run=data['dry_run'])
+            report = importer.run(iter_import_rows(uploaded_file.file, uploaded_file.name))
+        except ImportFileError as e:
+            return Response({"error": str(e), "columns": IMPORT_COLUMNS}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            print(f"Mahsulot importida xatolik: {e}")
+            import traceback
+            traceback.print_exc()
+            return Response({"error": "Importda kutilmagan xatolik yuz berdi."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='reprice')
+    def reprice(self, request):
+        """
+        Sotish narxlarini valyuta kursi bo'yicha ommaviy qayta hisoblash.
+        dry_run=true - hech narsa yozilmaydi, o'zgaradigan narxlar (diff) qaytariladi.
+        """
+        serializer = RepriceRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            report = reprice_products(user=request.user, **serializer.validated_data)
+        except RepricingError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            print(f"Qayta narxlashda xatolik: {e}")
+            return Response({"error": "Qayta narxlashda kutilmagan xatolik yuz berdi."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='price-history')
+    def price_history(self, request, pk=None):
+        """Mahsulot narxi o'zgarishlari (eng yangisi birinchi)"""
+        product = self.get_object()
+        queryset = product.price_history.select_related('user')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(ProductPriceHistorySerializer(page, many=True).data)
+        return Response(ProductPriceHistorySerializer(queryset, many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='labels')
+    def labels(self, request):
+        """
+        Ko'p mahsulot uchun yorliqlar varag'i (A4, bir varaqda bir nechta yorliq).
+        output=pdf - bitta PDF fayl, output=png - varaqlar ZIP arxivda; ikkalasi ham varaq tayyor bo'lishi bilan yuboriladi.
+        """
+        serializer = LabelSheetRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if data.get('purchase_order_id'):
+            from inventory.models import PurchaseOrderItem
+            items = PurchaseOrderItem.objects.filter(purchase_order_id=data['purchase_order_id']) \
+                .select_related('product__category').order_by('id')
+            if not items:
+                return Response({"error": "Xarid topilmadi yoki unda mahsulot yo'q."}, status=status.HTTP_404_NOT_FOUND)
+            products_with_copies = [(item.product, item.quantity_ordered) for item in items]
+        else:
+            products_by_id = Product.objects.select_related('category').in_bulk(data['product_ids'])
+            missing = [product_id for product_id in data['product_ids'] if product_id not in products_by_id]
+            if missing:
+                return Response({"error": f"Mahsulotlar topilmadi (ID: {missing})."}, status=status.HTTP_404_NOT_FOUND)
+            products_with_copies = [(products_by_id[product_id], data['copies']) for product_id in data['product_ids']]
+
+        without_barcode = [product.id for product, _ in products_with_copies if not product.barcode]
+        if without_barcode:
+            return Response({"error": f"Shtrix-kodi yo'q mahsulotlar (ID: {without_barcode})."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        labels_data = [build_label_data(product) for product, copies in products_with_copies for _ in range(copies)]
+        if len(labels_data) > 5000:
+            return Response({"error": "Bir so'rovda 5000 tadan ko'p yorliq chop etib bo'lmaydi."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            if data['output'] == 'png':
+                response = StreamingHttpResponse(guard_label_stream(stream_label_sheet_zip(labels_data)),
+                                                 content_type='application/zip')
+                response['Content-Disposition'] = 'attachment; filename="labels.zip"'
+            else:
+                response = StreamingHttpResponse(guard_label_stream(stream_label_sheet_pdf(labels_data)),
+                                                 content_type='application/pdf')
+                response['Content-Disposition'] = 'attachment; filename="labels.pdf"'
+            return response
+        except Exception as e:
+            print(f"Yorliqlar varag'ini chizishda xatolik: {e}")
+            import traceback
+            traceback.print_exc()
+            return Response({"error": "Yorliqlarni chizishda xatolik yuz berdi."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,143 @@
+# reports/reorder.py
+import math
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Sum, F, Q
+from django.utils import timezone
+
+from products.models import Product, Kassa
+from sales.models import Sale, SaleItem
+from inventory.models import ProductStock, InventoryOperation
+from inventory.snapshots import day_end
+
+# Sotuv tezligi oynalari (kun) va ularning vazni: yaqin davr ko'proq ta'sir qiladi
+REORDER_WINDOWS = (7, 30, 90)
+REORDER_VELOCITY_WEIGHTS = {7: 0.5, 30: 0.3, 90: 0.2}
+DEFAULT_LEAD_TIME_DAYS = 7  # Buyurtmadan yetib kelguncha
+DEFAULT_COVER_DAYS = 30  # Yetib kelgandan keyin shuncha kunga yetsin
+REORDER_CACHE_PREFIX = 'reorder_velocity'
+STOCK_FETCH_CHUNK_SIZE = 500
+# Qaytarilgan sotuvlar ham hisobga olinadi (quantity - quantity_returned)
+_SOLD_STATUSES = [Sale.SaleStatus.COMPLETED, Sale.SaleStatus.PARTIALLY_RETURNED, Sale.SaleStatus.RETURNED]
+
+
+def _window_sums(queryset, time_field, amount, group_fields, period_end):
+    """Bitta GROUP BY so'rovi: har bir oyna uchun shartli SUM (oynalar soni bo'yicha so'rov emas)"""
+    longest = max(REORDER_WINDOWS)
+    annotations = {
+        f'sold_{days}': Sum(amount, filter=Q(**{f'{time_field}__gte': period_end - timedelta(days=days)}))
+        for days in REORDER_WINDOWS
+    }
+    return queryset.filter(**{f'{time_field}__gte': period_end - timedelta(days=longest),
+                              f'{time_field}__lt': period_end}) \
+        .order_by().values_list(*group_fields).annotate(**annotations)
+
+
+def get_sales_velocity(today=None, refresh=False):
+    """
+    Kechagacha (bugun hisobga olinmaydi) har bir (mahsulot, kassa) uchun 7/30/90 kunlik sarf:
+    SaleItem (sof sotuv) + InventoryOperation REMOVE (hisobdan chiqarish).
+    Natija: {(product_id, kassa_id): [sold_7, sold_30, sold_90]} - kun oxirigacha keshlanadi.
+    """
+    today = today or timezone.localdate()
+    cache_key = f"{REORDER_CACHE_PREFIX}:{today.isoformat()}"
+    if not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return {(product_id, kassa_id): sums for product_id, kassa_id, sums in cached}
+
+    period_end = day_end(today - timedelta(days=1))
+    totals = {}
+    sources = (
+        _window_sums(SaleItem.objects.filter(sale__status__in=_SOLD_STATUSES), 'sale__created_at',
+                     F('quantity') - F('quantity_returned'), ('product_id', 'sale__kassa_id'), period_end),
+        _window_sums(InventoryOperation.objects.filter(operation_type=InventoryOperation.OperationType.REMOVE),
+                     'timestamp', -F('quantity'), ('product_id', 'kassa_id'), period_end),
+    )
+    for rows in sources:
+        for product_id, kassa_id, *sums in rows:
+            current = totals.setdefault((product_id, kassa_id), [0] * len(REORDER_WINDOWS))
+            for index, value in enumerate(sums):
+                current[index] += value or 0
+
+    timeout = max(int((day_end(today) - timezone.now()).total_seconds()), 60)
+    cache.set(cache_key, [(product_id, kassa_id, sums) for (product_id, kassa_id), sums in totals.items()], timeout)
+    return totals
+
+
+def daily_velocity(sums):
+    """Oynalar bo'yicha kunlik sotuvning vaznli o'rtachasi"""
+    return sum(REORDER_VELOCITY_WEIGHTS[days] * sold / days for days, sold in zip(REORDER_WINDOWS, sums))
+
+
+def get_reorder_suggestions(kassa_id=None, category_id=None, lead_time_days=DEFAULT_LEAD_TIME_DAYS,
+                            cover_days=DEFAULT_COVER_DAYS, currency='UZS', refresh=False):
+    """
+    Buyurtma tavsiyalari: tezlik * (lead_time + cover) + minimal miqdor - joriy qoldiq.
+    Tezlik keshdan (kuniga bir marta hisoblanadi), qoldiqlar va mahsulotlar bo'laklab bitta-bitta so'rov bilan.
+    'purchase_order_draft' ni to'g'ridan-to'g'ri /api/inventory/purchase-orders/ ga yuborish mumkin
+    (supplier_id yoki new_supplier_name qo'shib).
+    """
+    if lead_time_days < 0 or cover_days <= 0:
+        raise ValueError("lead_time_days >= 0 va cover_days > 0 bo'lishi kerak.")
+    if currency not in Sale.SaleCurrency.values:
+        raise ValueError(f"Noto'g'ri valyuta: {currency}")
+    today = timezone.localdate()
+    velocity = get_sales_velocity(today, refresh=refresh)
+    if kassa_id:
+        velocity = {pair: sums for pair, sums in velocity.items() if pair[1] == int(kassa_id)}
+
+    product_ids = sorted({product_id for product_id, _ in velocity})
+    stocks = {}
+    for start in range(0, len(product_ids), STOCK_FETCH_CHUNK_SIZE):
+        queryset = ProductStock.objects.filter(product_id__in=product_ids[start:start + STOCK_FETCH_CHUNK_SIZE])
+        if kassa_id:
+            queryset = queryset.filter(kassa_id=kassa_id)
+        for product_id, stock_kassa_id, quantity, minimum in queryset.order_by().values_list(
+                'product_id', 'kassa_id', 'quantity', 'minimum_stock_level'):
+            stocks[(product_id, stock_kassa_id)] = (quantity, minimum)
+
+    horizon = lead_time_days + cover_days
+    candidates = []
+    for (product_id, pair_kassa_id), sums in velocity.items():
+        per_day = daily_velocity(sums)
+        if per_day <= 0:
+            continue
+        quantity, minimum = stocks.get((product_id, pair_kassa_id), (0, 0))
+        suggested = math.ceil(per_day * horizon) + minimum - quantity
+        if suggested <= 0:
+            continue
+        candidates.append((product_id, pair_kassa_id, sums, per_day, quantity, minimum, suggested))
+
+    products = Product.objects.select_related('category').in_bulk({row[0] for row in candidates})
+    kassas = Kassa.objects.in_bulk({row[1] for row in candidates})
+    price_field = 'purchase_price_usd' if currency == Sale.SaleCurrency.USD else 'purchase_price_uzs'
+    data, draft_items = [], []
+    for product_id, pair_kassa_id, sums, per_day, quantity, minimum, suggested in candidates:
+        product = products.get(product_id)
+        if product is None or not product.is_active:
+            continue
+        if category_id and product.category_id != int(category_id):
+            continue
+        price = getattr(product, price_field)
+        data.append({
+            'product_id': product_id, 'product_name': product.name, 'barcode': product.barcode,
+            'category_name': product.category.name if product.category else None, 'kassa_id': pair_kassa_id,
+            'kassa_name': kassas[pair_kassa_id].name if pair_kassa_id in kassas else None,
+            **{f'sold_{days}d': sold for days, sold in zip(REORDER_WINDOWS, sums)},
+            'daily_velocity': round(per_day, 3), 'quantity': quantity, 'minimum_stock_level': minimum,
+            'days_of_cover': round(quantity / per_day, 1), 'suggested_quantity': suggested,
+            'purchase_price': price,
+        })
+        if price:
+            draft_items.append({'product_id': product_id, 'quantity_ordered': suggested,
+                                'purchase_price_currency': price, 'target_kassa_id': pair_kassa_id})
+    data.sort(key=lambda row: (row['days_of_cover'], row['product_name']))
+    return {
+        'generated_for': today.isoformat(), 'windows': list(REORDER_WINDOWS), 'lead_time_days': lead_time_days,
+        'cover_days': cover_days, 'data': data,
+        'purchase_order_draft': {
+            'currency': currency, 'notes': f"Buyurtma tavsiyasi ({today.isoformat()})", 'items': draft_items,
+        },
+    }
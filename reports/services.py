@@ -9,9 +9,11 @@ from decimal import Decimal
 
 # Model importlari
 from users.models import User, UserProfile
-from sales.models import Sale, SaleItem, Customer, KassaTransaction, Kassa  # SaleCurrency endi Sale orqali olinadi
+from sales.models import Sale, SaleItem, Customer, KassaTransaction, KassaBalance, Kassa  # SaleCurrency endi Sale orqali olinadi
 from products.models import Product, Category
-from inventory.models import ProductStock, InventoryOperation
+from inventory.models import ProductStock, InventoryOperation, LowStockAlert, InventoryValuation
+from inventory.history import history_date_range, fetch_history_page, parse_page_size, HISTORY_REPORT_PAGE_SIZE, \
+    HISTORY_ORDERING
 from installments.models import InstallmentPlan, InstallmentPayment
 
 # reports/services.py
@@ -62,40 +64,15 @@ def get_date_range_from_period(period_type, start_date_str=None, end_date_str=No
 
 
 def get_kassa_balance_currency(kassa_id, currency_code):
-    """Belgilangan kassa va valyuta uchun balansni hisoblaydi."""
+    """
+    Belgilangan kassa va valyuta uchun balans.
+    KassaBalance jadvalidan bitta (kassa, valyuta) kalit bo'yicha o'qiladi;
+    jadval KassaTransaction yozilganda shu tranzaksiyada yangilanadi.
+    """
     try:
-        kassa = Kassa.objects.get(pk=kassa_id)
-
-        # Kirim turlari (shu valyutada)
-        income_transaction_types = [
-            KassaTransaction.TransactionType.SALE,
-            KassaTransaction.TransactionType.INSTALLMENT_PAYMENT,
-            KassaTransaction.TransactionType.CASH_IN,
-            KassaTransaction.TransactionType.EXCHANGE_BUY_CURRENCY  # Bu valyuta olinganda
-        ]
-        # Chiqim turlari (shu valyutada)
-        expense_transaction_types = [
-            KassaTransaction.TransactionType.CASH_OUT,
-            KassaTransaction.TransactionType.RETURN_REFUND,
-            KassaTransaction.TransactionType.EXCHANGE_SELL_CURRENCY  # Bu valyuta sotilganda
-        ]
-
-        balance_agg = KassaTransaction.objects.filter(kassa=kassa, currency=currency_code).aggregate(
-            total_income=Sum(
-                Case(When(transaction_type__in=income_transaction_types, then=F('amount')), default=Value(Decimal(0))),
-                output_field=DecimalField(decimal_places=2)
-            ),
-            total_expense=Sum(
-                Case(When(transaction_type__in=expense_transaction_types, then=F('amount')), default=Value(Decimal(0))),
-                output_field=DecimalField(decimal_places=2)
-            )
-        )
-        income = balance_agg.get('total_income') or Decimal(0)
-        expense = balance_agg.get('total_expense') or Decimal(0)
-        return income - expense
-    except Kassa.DoesNotExist:
-        print(f"Kassa topilmadi: ID={kassa_id}")
-        return Decimal(0)  # Yoki None qaytarish xatolikni bildirish uchun
+        balance = KassaBalance.objects.filter(kassa_id=kassa_id, currency=currency_code) \
+            .values_list('balance', flat=True).first()
+        return balance if balance is not None else Decimal(0)
     except Exception as e:
         print(f"Balans hisoblashda xato (Kassa ID: {kassa_id}, Valyuta: {currency_code}): {e}")
         return None  # Xatolik yuz berdi
@@ -265,6 +242,30 @@ def get_kassa_balance_currency(kassa_id, currency_code):
 #         results['kassa_balance_usd'] = None
 #         results['kassa_name'] = "Umumiy"
 #     return results
+def calculate_net_profit_by_currency(sales_queryset, group_by=()):
+    """
+    Sotuvlar bo'yicha sof foyda: SUM((narx - tan_narx) * (miqdor - qaytarilgan)).
+    Tan narx SaleItem.cost_price_at_sale dan (sotuv paytidagi), yo'q bo'lsa foyda 0 deb olinadi.
+    group_by bo'sh bo'lsa {valyuta: foyda}, aks holda qo'shimcha guruhlar bilan qatorlar ro'yxati qaytadi.
+    """
+    price = Case(
+        When(sale__currency=Sale.SaleCurrency.USD, then=Coalesce('price_at_sale_usd', Value(Decimal(0)))),
+        default=Coalesce('price_at_sale_uzs', Value(Decimal(0))),
+        output_field=DecimalField(max_digits=17, decimal_places=2)
+    )
+    profit = Sum(
+        (price - Coalesce('cost_price_at_sale', price)) * (F('quantity') - F('quantity_returned')),
+        output_field=DecimalField(max_digits=20, decimal_places=2), default=Decimal(0)
+    )
+    rows = list(SaleItem.objects.filter(sale__in=sales_queryset.order_by().values('pk'))
+                .values('sale__currency', *group_by).annotate(profit=profit).order_by())
+    for row in rows:  # SQLite SUM ni float sifatida qaytarishi mumkin
+        row['profit'] = Decimal(str(row['profit'] or 0)).quantize(Decimal('0.01'))
+    if group_by:
+        return rows
+    return {row['sale__currency']: row['profit'] for row in rows}
+
+
 def get_dashboard_stats(kassa_id=None, target_date_str=None, target_month_str=None,
                         period_type='all'):  # period_type qoladi, agar target_date/month bo'lmasa
     """
@@ -308,23 +309,10 @@ def get_dashboard_stats(kassa_id=None, target_date_str=None, target_month_str=No
     base_sales_filter_for_profit = Q(status=Sale.SaleStatus.COMPLETED)  # Sof foyda uchun
     kassa_q_filter_sale = Q(kassa_id=kassa_id) if kassa_id else Q()
 
-    # --- Yordamchi funksiya (sof foyda uchun, avvalgidek) ---
+    # --- Yordamchi funksiya (sof foyda uchun): bitta SQL SUM, valyuta bo'yicha guruhlangan ---
     def calculate_net_profit_for_sales(sales_queryset):
-        net_profit_uzs = Decimal(0);
-        net_profit_usd = Decimal(0)
-        for sale in sales_queryset.prefetch_related('items__product'):
-            for item in sale.items.all():
-                actual_sold_quantity = item.quantity  # Yoki item.quantity - item.quantity_returned
-                if actual_sold_quantity <= 0: continue
-                if sale.currency == Sale.SaleCurrency.UZS:
-                    sp = item.price_at_sale_uzs or Decimal(0)
-                    cp = item.product.purchase_price_uzs if item.product.purchase_price_uzs is not None else sp  # Agar tan narx yo'q bo'lsa, foyda 0
-                    net_profit_uzs += (sp - cp) * actual_sold_quantity
-                elif sale.currency == Sale.SaleCurrency.USD:
-                    sp = item.price_at_sale_usd or Decimal(0)
-                    cp = item.product.purchase_price_usd if item.product.purchase_price_usd is not None else sp
-                    net_profit_usd += (sp - cp) * actual_sold_quantity
-        return net_profit_uzs, net_profit_usd
+        profits = calculate_net_profit_by_currency(sales_queryset)
+        return profits.get(Sale.SaleCurrency.UZS, Decimal(0)), profits.get(Sale.SaleCurrency.USD, Decimal(0))
 
     # --- "Kunlik" (target_date_for_daily_stats uchun) Statistikalar ---
     # Bu qism har doim hisoblanadi va 'today_...' kalitlari bilan qaytariladi,
@@ -424,9 +412,7 @@ def get_dashboard_stats(kassa_id=None, target_date_str=None, target_month_str=No
     # Yoki bularni har doim qaytarish mumkin. Hozircha, agar aniq sana/oy so'ralsa, bularni qaytarmaymiz.
     if period_type == 'all' and not target_date_str and not target_month_str:
         results['total_products'] = Product.objects.filter(is_active=True).count()
-        accessory_categories = Category.objects.filter(is_accessory_category=True)
-        results['low_stock_products'] = ProductStock.objects.filter(quantity__lte=F('minimum_stock_level'),
-                                                                    product__category__in=accessory_categories).count()
+        results['low_stock_products'] = LowStockAlert.objects.count()  # inventory/alerts.py yangilab boradi
         results['total_customers'] = Customer.objects.count()
         results['new_customers_today'] = Customer.objects.filter(
             created_at__date=current_day_for_calc).count()  # Joriy kun uchun
@@ -620,9 +606,61 @@ def get_installments_report_data(period_type='all_time', start_date_str=None, en
             'period_type': period_type}
 
 
-# --- Ombor Hisobotlari (O'zgarishsiz) ---
-def get_inventory_stock_report(kassa_id=None, category_id=None, low_stock_only=False):
-    # ... (avvalgi kod) ...
+# --- Ombor Hisobotlari ---
+def _get_inventory_stock_report_as_of(as_of, kassa_id=None, category_id=None, low_stock_only=False):
+    """Snapshot + undan keyingi amaliyotlar bo'yicha o'tgan sanadagi qoldiqlar (inventory/snapshots.py)"""
+    from inventory.snapshots import get_stock_as_of, nearest_snapshot_date, day_end
+
+    if isinstance(as_of, str):
+        try:
+            as_of = date.fromisoformat(as_of)
+        except ValueError:
+            raise ValueError("as_of sanasi YYYY-MM-DD formatida bo'lishi kerak.")
+    if as_of >= timezone.localdate():
+        raise ValueError("as_of o'tgan sana bo'lishi kerak (joriy qoldiq uchun as_of bermang).")
+
+    quantities = get_stock_as_of(as_of, kassa_id=kassa_id, category_id=category_id, include_zero=True)
+    # Minimal miqdor tarixiy emas - joriy ProductStock dan. ProductStock juftliklari o'sha kuni
+    # 0 bo'lgan bo'lsa ham hisobotga kiradi (joriy hisobotdagidek), mahsulot o'sha paytda mavjud bo'lsa
+    stock_filters = Q()
+    if kassa_id: stock_filters &= Q(kassa_id=kassa_id)
+    if category_id: stock_filters &= Q(product__category_id=category_id)
+    period_end = day_end(as_of)
+    minimum_levels = {}
+    for product_id, kassa, level, product_created_at in ProductStock.objects.filter(stock_filters).order_by() \
+            .values_list('product_id', 'kassa_id', 'minimum_stock_level', 'product__created_at') \
+            .iterator(chunk_size=5000):
+        minimum_levels[(product_id, kassa)] = level
+        if product_created_at < period_end:
+            quantities.setdefault((product_id, kassa), 0)
+    product_ids = {product_id for product_id, _ in quantities}
+    products = Product.objects.select_related('category').in_bulk(product_ids)
+    kassas = Kassa.objects.in_bulk({kassa for _, kassa in quantities})
+
+    snapshot_date = nearest_snapshot_date(as_of)
+    report_data = []
+    for (product_id, kassa), quantity in quantities.items():
+        product, kassa_obj = products[product_id], kassas[kassa]
+        minimum_stock_level = minimum_levels.get((product_id, kassa), 0)
+        if low_stock_only and quantity > minimum_stock_level:
+            continue
+        report_data.append({
+            'product_id': product_id, 'product_name': product.name, 'barcode': product.barcode,
+            'category_name': product.category.name if product.category else None,
+            'kassa_id': kassa, 'kassa_name': kassa_obj.name,
+            'quantity': quantity, 'minimum_stock_level': minimum_stock_level,
+            'is_low_stock': quantity < minimum_stock_level, 'price_uzs': product.price_uzs,
+            'price_usd': product.price_usd, 'as_of': as_of.isoformat(),
+            'snapshot_date': snapshot_date.isoformat() if snapshot_date else None,
+        })
+    report_data.sort(key=lambda row: (row['kassa_name'], row['product_name']))
+    return report_data
+
+
+def get_inventory_stock_report(kassa_id=None, category_id=None, low_stock_only=False, as_of=None):
+    """as_of (sana) berilsa - shu kun oxiridagi qoldiq (snapshot + keyingi amaliyotlar), aks holda joriy"""
+    if as_of:
+        return _get_inventory_stock_report_as_of(as_of, kassa_id, category_id, low_stock_only)
     filters = Q()
     if kassa_id: filters &= Q(kassa_id=kassa_id)
     if category_id: filters &= Q(product__category_id=category_id)
@@ -642,19 +680,77 @@ def get_inventory_stock_report(kassa_id=None, category_id=None, low_stock_only=F
     return report_data
 
 
+def get_inventory_valuation_report(kassa_id=None, category_id=None, currency='UZS', detail=False):
+    """
+    Qoldiq qiymati (o'rtacha tortilgan tan narx bo'yicha) - InventoryValuation jadvali yig'indisi,
+    xaridlarni qayta hisoblamaydi. detail=True bo'lsa mahsulotlar kesimida ham.
+    """
+    if currency not in Sale.SaleCurrency.values:
+        raise ValueError(f"Noto'g'ri valyuta: {currency}")
+    filters = Q(currency=currency, quantity__gt=0)
+    if kassa_id: filters &= Q(kassa_id=kassa_id)
+    if category_id: filters &= Q(product__category_id=category_id)
+    valuations = InventoryValuation.objects.filter(filters).order_by()
+    totals = valuations.aggregate(total_value=Coalesce(Sum('total_value'), Decimal(0)),
+                                  total_quantity=Coalesce(Sum('quantity'), 0))
+    report = {
+        'currency': currency, 'total_value': totals['total_value'], 'total_quantity': totals['total_quantity'],
+        'by_kassa': list(valuations.values('kassa_id', kassa_name=F('kassa__name'))
+                         .annotate(total_value=Sum('total_value'), total_quantity=Sum('quantity'))
+                         .order_by('kassa_name')),
+        'by_category': list(valuations.values(category_id=F('product__category_id'),
+                                              category_name=F('product__category__name'))
+                            .annotate(total_value=Sum('total_value'), total_quantity=Sum('quantity'))
+                            .order_by('-total_value')),
+    }
+    if detail:
+        report['products'] = [
+            {'product_id': row['product_id'], 'product_name': row['product__name'], 'kassa_id': row['kassa_id'],
+             'quantity': row['quantity'], 'total_value': row['total_value'],
+             'average_cost': (row['total_value'] / row['quantity']).quantize(Decimal('0.01'))}
+            for row in valuations.values('product_id', 'product__name', 'kassa_id', 'quantity', 'total_value')
+            .order_by('-total_value')
+        ]
+    return report
+
+
+def get_kassa_cash_flow_report(kassa_id=None):
+    """
+    Kassalar bo'yicha pul oqimi va balanslar: oxirgi yopilgan smenaning yig'indilari + undan keyingi
+    amaliyotlar (sales.services.get_kassa_cash_flow). balances KassaBalance jadvali bilan ham solishtiriladi.
+    """
+    from sales.services import get_kassa_cash_flow  # Sikl importning oldini olish uchun
+    kassas = Kassa.objects.filter(pk=kassa_id) if kassa_id else Kassa.objects.order_by('name')
+    report_data = []
+    for kassa in kassas:
+        row = get_kassa_cash_flow(kassa.id)
+        row['kassa_name'] = kassa.name
+        row['stored_balances'] = {currency: get_kassa_balance_currency(kassa.id, currency)
+                                  for currency in Sale.SaleCurrency.values}
+        report_data.append(row)
+    if kassa_id and not report_data:
+        raise ValueError(f"Kassa topilmadi: {kassa_id}")
+    return report_data
+
+
 def get_inventory_history_report(period_type='daily', start_date_str=None, end_date_str=None, kassa_id=None,
-                                 product_id=None, user_id=None, operation_type=None):
-    # ... (avvalgi kod) ...
+                                 product_id=None, user_id=None, operation_type=None, cursor=None, limit=None):
+    # cursor yoki limit berilsa - keyset sahifalash: limit ta qator va keyingi sahifa uchun next_cursor
+    # (OFFSET/COUNT yo'q). Berilmasa avvalgidek butun davr (next_cursor None).
     start_date, end_date = get_date_range_from_period(period_type, start_date_str, end_date_str)
+    paginate = bool(cursor or limit)
+    limit = parse_page_size(limit, HISTORY_REPORT_PAGE_SIZE) if paginate else None
     filters = Q()
-    if start_date: filters &= Q(timestamp__date__gte=start_date)
-    if end_date: filters &= Q(timestamp__date__lte=end_date)
     if kassa_id: filters &= Q(kassa_id=kassa_id)
     if product_id: filters &= Q(product_id=product_id)
     if user_id: filters &= Q(user_id=user_id)
     if operation_type: filters &= Q(operation_type=operation_type)
-    operations = InventoryOperation.objects.filter(filters).select_related('product', 'kassa',
-                                                                           'user__profile').order_by('-timestamp')
+    operations = history_date_range(InventoryOperation.objects.filter(filters), start_date, end_date) \
+        .select_related('product', 'kassa', 'user__profile')
+    if paginate:
+        operations, next_cursor = fetch_history_page(operations, cursor, limit)
+    else:
+        operations, next_cursor = operations.order_by(*HISTORY_ORDERING), None
     report_data = []
     for op in operations:
         report_data.append({
@@ -667,7 +763,8 @@ def get_inventory_history_report(period_type='daily', start_date_str=None, end_d
         })
     return {'data': report_data,
             'start_date': start_date.isoformat() if start_date else None,
-            'end_date': end_date.isoformat() if end_date else None}
+            'end_date': end_date.isoformat() if end_date else None,
+            'next_cursor': next_cursor}
 
 
 def get_sales_chart_data(period_type='monthly', currency='UZS', kassa_id=None, start_date_str=None, end_date_str=None):
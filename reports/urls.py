@@ -8,6 +8,9 @@ from .views import (
     InstallmentsReportView,
     InventoryStockReportView,
     InventoryHistoryReportView,
+    ReorderSuggestionsView,
+    InventoryValuationReportView,
+    KassaCashFlowReportView,
     SalesChartView # YANGI VIEWNI IMPORT QILISH
 )
 
@@ -19,7 +22,10 @@ urlpatterns = [
     path('installments/', InstallmentsReportView.as_view(), name='report-installments'),
     path('inventory/stock/', InventoryStockReportView.as_view(), name='report-inventory-stock'),
     path('inventory/history/', InventoryHistoryReportView.as_view(), name='report-inventory-history'),
+    path('inventory/valuation/', InventoryValuationReportView.as_view(), name='report-inventory-valuation'),
+    path('inventory/reorder-suggestions/', ReorderSuggestionsView.as_view(), name='report-reorder-suggestions'),
 
     # YANGI YO'L: Sotuvlar grafigi uchun
+    path('kassa/cash-flow/', KassaCashFlowReportView.as_view(), name='report-kassa-cash-flow'),
     path('sales-chart/', SalesChartView.as_view(), name='report-sales-chart'),
 ]
\ No newline at end of file
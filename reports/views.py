@@ -243,7 +243,8 @@ class InventoryStockReportView(views.APIView):
             report_data = get_inventory_stock_report(
                 kassa_id=qp.get('kassa_id'),
                 category_id=qp.get('category_id'),
-                low_stock_only=qp.get('low_stock_only', 'false').lower() == 'true'
+                low_stock_only=qp.get('low_stock_only', 'false').lower() == 'true',
+                as_of=qp.get('as_of')  # YYYY-MM-DD: shu kun oxiridagi qoldiq
             )
             return Response(report_data)
         except ValueError as ve:  # Servisdagi validatsiya xatolari uchun
@@ -256,6 +257,78 @@ class InventoryStockReportView(views.APIView):
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class InventoryValuationReportView(views.APIView):
+    """Ombor qiymati (WAC): jami, kassalar va kategoriyalar kesimida; detail=true - mahsulotlar bo'yicha"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        qp = request.query_params
+        try:
+            report_data = get_inventory_valuation_report(
+                kassa_id=qp.get('kassa_id'),
+                category_id=qp.get('category_id'),
+                currency=qp.get('currency', 'UZS').upper(),
+                detail=qp.get('detail', 'false').lower() == 'true'
+            )
+            return Response(report_data)
+        except ValueError as ve:
+            return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            print(f"Error in InventoryValuationReportView: {e}");
+            import traceback;
+            traceback.print_exc()
+            return Response({"error": "Ombor qiymati hisobotini yaratishda xatolik."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ReorderSuggestionsView(views.APIView):
+    """
+    Sotuv tezligi (7/30/90 kun) bo'yicha buyurtma tavsiyalari va PurchaseOrder loyihasi.
+    Parametrlar: kassa_id, category_id, lead_time_days, cover_days, currency (UZS/USD), refresh=true (keshsiz).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        from .reorder import get_reorder_suggestions, DEFAULT_LEAD_TIME_DAYS, DEFAULT_COVER_DAYS
+        qp = request.query_params
+        try:
+            report_data = get_reorder_suggestions(
+                kassa_id=qp.get('kassa_id'),
+                category_id=qp.get('category_id'),
+                lead_time_days=int(qp.get('lead_time_days', DEFAULT_LEAD_TIME_DAYS)),
+                cover_days=int(qp.get('cover_days', DEFAULT_COVER_DAYS)),
+                currency=qp.get('currency', 'UZS').upper(),
+                refresh=qp.get('refresh', 'false').lower() == 'true'
+            )
+            return Response(report_data)
+        except ValueError as ve:
+            return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            print(f"Error in ReorderSuggestionsView: {e}");
+            import traceback;
+            traceback.print_exc()
+            return Response({"error": "Buyurtma tavsiyalarini yaratishda xatolik."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class KassaCashFlowReportView(views.APIView):
+    """Kassa pul oqimi: oxirgi smena nazorat nuqtasi + undan keyingi amaliyotlar (?kassa_id=)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            report_data = get_kassa_cash_flow_report(kassa_id=request.query_params.get('kassa_id'))
+            return Response(report_data)
+        except ValueError as ve:
+            return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            print(f"Error in KassaCashFlowReportView: {e}");
+            import traceback;
+            traceback.print_exc()
+            return Response({"error": "Kassa pul oqimi hisobotini yaratishda xatolik."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class InventoryHistoryReportView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -269,7 +342,8 @@ class InventoryHistoryReportView(views.APIView):
             report_data = get_inventory_history_report(
                 period_type=period_type, start_date_str=start_date_str, end_date_str=end_date_str,
                 kassa_id=qp.get('kassa_id'), product_id=qp.get('product_id'),
-                user_id=qp.get('user_id'), operation_type=qp.get('operation_type')
+                user_id=qp.get('user_id'), operation_type=qp.get('operation_type'),
+                cursor=qp.get('cursor'), limit=qp.get('limit')
             )
             return Response(report_data)
         except ValueError as ve:
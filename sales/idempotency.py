@@ -0,0 +1,104 @@
+# sales/idempotency.py
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def get_idempotency_ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 48))
+
+
+def payload_fingerprint(data, prefix=''):
+    """Ma'lumotning (kalitlar tartibidan qat'i nazar) sha256 izi"""
+    body = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(f"{prefix}{body}".encode('utf-8')).hexdigest()
+
+
+def request_fingerprint(request):
+    """Metod, yo'l va so'rov tanasidan sha256 iz"""
+    return payload_fingerprint(request.data, prefix=f"{request.method}:{request.path}:")
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(scope):
+    """
+    View metodi uchun dekorator. So'rovda Idempotency-Key sarlavhasi bo'lsa:
+    - shu kalit bilan avval muvaffaqiyatli javob saqlangan bo'lsa, amaliyot
+      bajarilmasdan o'sha javob qaytariladi;
+    - kalit boshqa so'rov tanasi bilan ishlatilgan bo'lsa 422 qaytariladi;
+    - aks holda view bitta tranzaksiyada bajariladi va 2xx javob kalit bilan
+      birga saqlanadi (xato javoblar saqlanmaydi, ularni qayta yuborish mumkin).
+    Sarlavha bo'lmasa view odatdagidek ishlaydi.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            key = key.strip()
+            if not key or len(key) > 255:
+                return Response({"error": f"{IDEMPOTENCY_HEADER} 1-255 belgidan iborat bo'lishi kerak."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            user = request.user if request.user and request.user.is_authenticated else None
+            fingerprint = request_fingerprint(request)
+            lookup = {'key': key, 'user': user, 'scope': scope}
+
+            with transaction.atomic():
+                record = IdempotencyKey.objects.filter(**lookup).first()
+                if record is not None:
+                    if record.created_at >= timezone.now() - get_idempotency_ttl():
+                        if record.fingerprint != fingerprint:
+                            return Response(
+                                {"error": f"Bu {IDEMPOTENCY_HEADER} boshqa so'rov uchun ishlatilgan."},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                        return _replay(record)
+                    record.delete()  # Muddati o'tgan kalit
+
+                response = view_method(self, request, *args, **kwargs)
+                if not (200 <= response.status_code < 300):
+                    return response
+
+                try:
+                    with transaction.atomic():
+                        IdempotencyKey.objects.create(
+                            fingerprint=fingerprint, response_status=response.status_code,
+                            response_body=response.data, **lookup
+                        )
+                    return response
+                except IntegrityError:
+                    # Parallel so'rov shu kalit bilan bizdan oldin tugagan: o'zimiznikini bekor qilamiz
+                    transaction.set_rollback(True)
+
+            record = IdempotencyKey.objects.filter(**lookup).first()
+            if record is None or record.fingerprint != fingerprint:
+                return Response({"error": f"Bu {IDEMPOTENCY_HEADER} boshqa so'rov uchun ishlatilgan."},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            return _replay(record)
+        return wrapper
+    return decorator
+
+
+def prune_idempotency_keys(now=None):
+    """Muddati o'tgan kalitlarni o'chiradi, o'chirilganlar sonini qaytaradi"""
+    cutoff = (now or timezone.now()) - get_idempotency_ttl()
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,46 @@
+# sales/management/commands/backfill_sale_item_costs.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from sales.models import SaleItem
+from sales.services import get_cost_price_in_currency
+
+
+class Command(BaseCommand):
+    help = ("cost_price_at_sale bo'sh bo'lgan eski SaleItem yozuvlarini mahsulotning joriy xarid narxi "
+            "(sotuv valyutasida) bilan to'ldiradi. Bo'laklab ishlaydi, qayta ishga tushirish xavfsiz.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Bitta tranzaksiyadagi qatorlar soni")
+        parser.add_argument('--dry-run', action='store_true', help="Faqat sanash, yozmaslik")
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        queryset = SaleItem.objects.filter(cost_price_at_sale__isnull=True).select_related('sale', 'product') \
+            .only('id', 'cost_price_at_sale', 'sale__currency',
+                  'product__purchase_price_uzs', 'product__purchase_price_usd').order_by('id')
+
+        last_id, scanned, updated = 0, 0, 0
+        while True:
+            chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            scanned += len(chunk)
+
+            to_update = []
+            for item in chunk:
+                cost = get_cost_price_in_currency(item.product, item.sale.currency)
+                if cost is not None:
+                    item.cost_price_at_sale = cost
+                    to_update.append(item)
+            if to_update and not options['dry_run']:
+                with transaction.atomic():
+                    SaleItem.objects.bulk_update(to_update, ['cost_price_at_sale'])
+            updated += len(to_update)
+            self.stdout.write(f"... {scanned} ta ko'rildi, {updated} ta to'ldirildi (oxirgi id: {last_id})")
+
+        action = "to'ldirilishi mumkin" if options['dry_run'] else "to'ldirildi"
+        self.stdout.write(self.style.SUCCESS(
+            f"Jami: {scanned} ta qator ko'rildi, {updated} ta {action}. "
+            f"Xarid narxi yo'q mahsulotlar bo'sh qoldi (foyda 0 deb hisoblanadi)."))
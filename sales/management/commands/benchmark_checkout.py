@@ -0,0 +1,86 @@
+# sales/management/commands/benchmark_checkout.py
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from inventory.models import ProductStock, InventoryOperation
+from products.models import Kassa, Product
+from sales.models import Sale, SaleItem
+from sales.services import apply_sale_items
+
+
+class _Rollback(Exception):
+    """Benchmark ma'lumotlarini bazada qoldirmaslik uchun"""
+
+
+def _legacy_apply_sale_items(sale, items_data, user=None):
+    """Avvalgi (qatorma-qator) yo'l: har bir qator uchun 4 ta so'rov"""
+    kassa = sale.kassa
+    for item_data in items_data:
+        product = item_data['product_id']
+        quantity = item_data['quantity']
+        SaleItem.objects.create(sale=sale, product=product, quantity=quantity,
+                                price_at_sale_uzs=item_data['price'],
+                                original_price_at_sale_usd_item=product.price_usd,
+                                original_price_at_sale_uzs_item=product.price_uzs)
+        stock = ProductStock.objects.select_for_update().get(product=product, kassa=kassa)
+        stock.quantity -= quantity
+        stock.save(update_fields=['quantity'])
+        InventoryOperation.objects.create(product=product, kassa=kassa, user=user, quantity=-quantity,
+                                          operation_type=InventoryOperation.OperationType.SALE,
+                                          comment=f"Sotuv #{sale.id}")
+
+
+class Command(BaseCommand):
+    help = ("Sotuv yaratishning eski (qatorma-qator) va yangi (set-based) yo'llarini "
+            "so'rovlar soni va vaqt bo'yicha solishtiradi. Barcha ma'lumotlar oxirida bekor qilinadi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1,10,50,200', help="Savat o'lchamlari (vergul bilan)")
+        parser.add_argument('--repeat', type=int, default=5, help="Har bir o'lcham uchun takrorlash soni")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        repeat = max(1, options['repeat'])
+        try:
+            with transaction.atomic():
+                self._run(sizes, repeat)
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, repeat):
+        kassa = Kassa.objects.create(name=f"Benchmark kassa {time.time_ns()}")
+        products = [
+            Product(name=f"Benchmark mahsulot {i}", price_uzs=Decimal('1000.00'), price_usd=Decimal('1.00'))
+            for i in range(max(sizes))
+        ]
+        products = Product.objects.bulk_create(products)
+        ProductStock.objects.bulk_create([
+            ProductStock(product=product, kassa=kassa, quantity=10 ** 6) for product in products
+        ])
+
+        self.stdout.write(f"{'qatorlar':>9} | {'eski: so`rov':>13} {'eski: ms':>10} | {'yangi: so`rov':>14} {'yangi: ms':>10}")
+        for size in sizes:
+            items_data = [
+                {'product_id': product, 'quantity': 1, 'price': Decimal('1000.00')} for product in products[:size]
+            ]
+            legacy = self._measure(kassa, items_data, _legacy_apply_sale_items, repeat)
+            bulk = self._measure(kassa, items_data, apply_sale_items, repeat)
+            self.stdout.write(f"{size:>9} | {legacy[0]:>13} {legacy[1]:>10.2f} | {bulk[0]:>14} {bulk[1]:>10.2f}")
+
+    def _measure(self, kassa, items_data, apply_func, repeat):
+        query_count, elapsed_total = 0, 0.0
+        for _ in range(repeat):
+            sale = Sale.objects.create(kassa=kassa, currency=Sale.SaleCurrency.UZS,
+                                       payment_type=Sale.PaymentType.CASH)
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    apply_func(sale, items_data)
+                    elapsed_total += time.perf_counter() - started
+            query_count = len(ctx.captured_queries)
+        return query_count, elapsed_total / repeat * 1000
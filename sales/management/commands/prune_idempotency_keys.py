@@ -0,0 +1,13 @@
+# sales/management/commands/prune_idempotency_keys.py
+from django.core.management.base import BaseCommand
+
+from sales.idempotency import prune_idempotency_keys, get_idempotency_ttl
+
+
+class Command(BaseCommand):
+    help = "Muddati (IDEMPOTENCY_KEY_TTL_HOURS) o'tgan Idempotency-Key yozuvlarini o'chiradi. Cron orqali ishga tushiring."
+
+    def handle(self, *args, **options):
+        deleted = prune_idempotency_keys()
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} ta eskirgan kalit o'chirildi (TTL: {get_idempotency_ttl()})."))
@@ -0,0 +1,33 @@
+# sales/management/commands/verify_kassa_balances.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from sales.services import find_kassa_balance_drift, rebuild_kassa_balances
+
+
+class Command(BaseCommand):
+    help = ("KassaBalance jadvalini KassaTransaction jurnalidan qayta hisoblab solishtiradi va farqlarni "
+            "ko'rsatadi (oxirgi yopilgan smenadan keyingi amaliyotlar; --full bilan butun jurnal). "
+            "--fix bilan farqli qatorlar jurnaldagi qiymatga tenglashtiriladi.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kassa', type=int, help="Faqat shu kassa ID si")
+        parser.add_argument('--fix', action='store_true', help="Farqlarni tuzatish")
+        parser.add_argument('--full', action='store_true',
+                            help="Nazorat nuqtalarisiz, butun jurnal bo'yicha (nuqtalarning o'zini ham tekshiradi)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = find_kassa_balance_drift(options.get('kassa'), full=options['full'])
+            if not drift:
+                self.stdout.write(self.style.SUCCESS("Farq topilmadi: KassaBalance jurnal bilan mos."))
+                return
+            for kassa_id, currency, actual, expected in drift:
+                actual_display = "yo'q" if actual is None else actual
+                self.stdout.write(self.style.WARNING(
+                    f"Kassa #{kassa_id} {currency}: jadvalda {actual_display}, jurnalda {expected}"))
+            if options['fix']:
+                rebuild_kassa_balances(drift)
+                self.stdout.write(self.style.SUCCESS(f"{len(drift)} ta balans tuzatildi."))
+            else:
+                self.stdout.write(f"{len(drift)} ta farq. Tuzatish uchun --fix bilan ishga tushiring.")
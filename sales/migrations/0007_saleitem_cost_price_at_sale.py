@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 18:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_supplier_name_manual_and_more'),
+        ('sales', '0006_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='saleitem',
+            name='cost_price_at_sale',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=17, null=True, verbose_name='Tan narx (sotuv valyutasida, sotuv paytida)'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['status', 'created_at'], name='sale_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2 on 2026-10-18 18:29
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Sum, Case, When, F, Value, DecimalField
+
+INCOME_TYPES = ['SALE', 'INSTALLMENT', 'CASH_IN', 'EXCHANGE_BUY']
+EXPENSE_TYPES = ['CASH_OUT', 'REFUND', 'EXCHANGE_SELL']
+
+
+def populate_kassa_balances(apps, schema_editor):
+    """Mavjud KassaTransaction lardan boshlang'ich balanslarni hisoblash"""
+    KassaTransaction = apps.get_model('sales', 'KassaTransaction')
+    KassaBalance = apps.get_model('sales', 'KassaBalance')
+    rows = KassaTransaction.objects.values('kassa_id', 'currency').annotate(
+        total=Sum(Case(
+            When(transaction_type__in=INCOME_TYPES, then=F('amount')),
+            When(transaction_type__in=EXPENSE_TYPES, then=-F('amount')),
+            default=Value(Decimal(0)), output_field=DecimalField(max_digits=17, decimal_places=2)
+        ))
+    ).order_by()
+    KassaBalance.objects.bulk_create([
+        KassaBalance(kassa_id=row['kassa_id'], currency=row['currency'],
+                     balance=Decimal(str(row['total'] or 0)).quantize(Decimal('0.01')))
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_supplier_name_manual_and_more'),
+        ('sales', '0007_saleitem_cost_price_at_sale'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KassaBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('UZS', "O'zbek so'mi"), ('USD', 'AQSH dollari')], max_length=3, verbose_name='Valyuta')),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=17, verbose_name='Balans')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Yangilangan vaqt')),
+                ('kassa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='products.kassa', verbose_name='Kassa')),
+            ],
+            options={
+                'verbose_name': 'Kassa Balansi',
+                'verbose_name_plural': 'Kassa Balanslari',
+                'constraints': [models.UniqueConstraint(fields=('kassa', 'currency'), name='unique_kassa_balance')],
+            },
+        ),
+        migrations.RunPython(populate_kassa_balances, migrations.RunPython.noop),
+    ]
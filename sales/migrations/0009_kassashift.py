@@ -0,0 +1,46 @@
+# Generated by Django 5.2 on 2026-10-18 18:30
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_supplier_name_manual_and_more'),
+        ('sales', '0008_kassabalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KassaShift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('Open', 'Ochiq'), ('Closed', 'Yopilgan')], default='Open', max_length=10, verbose_name='Holati')),
+                ('opened_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Ochilgan vaqt')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='Yopilgan vaqt')),
+                ('opening_transaction_id', models.BigIntegerField(default=0, verbose_name='Ochilishdagi oxirgi amaliyot ID')),
+                ('last_transaction_id', models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='Nazorat nuqtasi (oxirgi amaliyot ID)')),
+                ('opening_balances', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Ochilishdagi balanslar {valyuta: summa}')),
+                ('closing_balances', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Yopilishdagi balanslar {valyuta: summa}')),
+                ('totals', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name="Smena yig'indilari {tur: {valyuta: summa}}")),
+                ('cumulative_totals', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name="Boshidan jami yig'indilar {tur: {valyuta: summa}}")),
+                ('counted_cash', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Sanalgan naqd pul {valyuta: summa}')),
+                ('transactions_count', models.PositiveIntegerField(default=0, verbose_name='Amaliyotlar soni')),
+                ('comment', models.TextField(blank=True, null=True, verbose_name='Izoh')),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='closed_shifts', to=settings.AUTH_USER_MODEL, verbose_name='Yopgan xodim')),
+                ('kassa', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='shifts', to='products.kassa', verbose_name='Kassa')),
+                ('opened_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='opened_shifts', to=settings.AUTH_USER_MODEL, verbose_name='Ochgan xodim')),
+            ],
+            options={
+                'verbose_name': 'Kassa Smenasi',
+                'verbose_name_plural': 'Kassa Smenalari',
+                'ordering': ['-opened_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'Open')), fields=('kassa',), name='unique_open_shift_per_kassa')],
+            },
+        ),
+    ]
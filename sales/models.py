@@ -255,11 +255,13 @@
 
 # sales/models.py
 from decimal import Decimal
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.conf import settings
 from products.models import Product, Kassa
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 # installments.models import InstallmentPayment # KassaTransaction da to'g'ridan-to'g'ri bog'liqlik bor
@@ -306,7 +308,9 @@ class Sale(models.Model):
                               verbose_name="Holati")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Sana va vaqt")
 
-    class Meta: verbose_name = "Sotuv"; verbose_name_plural = "Sotuvlar"; ordering = ['-created_at']
+    class Meta:
+        verbose_name = "Sotuv"; verbose_name_plural = "Sotuvlar"; ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'], name='sale_status_created_idx')]  # Hisobotlar uchun
 
     def __str__(
             self): customer_name = self.customer.full_name if self.customer else "Noma'lum mijoz"; return f"Sotuv #{self.id} ({customer_name}) - Yakuniy: {self.final_amount_currency} {self.currency}"
@@ -332,6 +336,9 @@ class SaleItem(models.Model):
                                                           verbose_name="Asl Narx (USD) (element uchun)")  # O'ZGARTIRILDI: Nomini aniqlashtirish
     original_price_at_sale_uzs_item = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True,
                                                           verbose_name="Asl Narx (UZS) (element uchun)")  # O'ZGARTIRILDI: Nomini aniqlashtirish
+    # Sotuv paytidagi tan narx (sotuv valyutasida). Keyin xarid narxi o'zgarsa ham foyda o'zgarmaydi
+    cost_price_at_sale = models.DecimalField(max_digits=17, decimal_places=2, null=True, blank=True,
+                                             verbose_name="Tan narx (sotuv valyutasida, sotuv paytida)")
 
     class Meta:
         unique_together = (
@@ -420,21 +427,121 @@ class KassaTransaction(models.Model):
 
     class Meta: verbose_name = "Kassa Amaliyoti"; verbose_name_plural = "Kassa Amaliyotlari"; ordering = ['-timestamp']
 
+    # Kirim/Chiqim turlari (balans hisoblash uchun yagona manba)
+    INCOME_TYPES = [TransactionType.SALE, TransactionType.INSTALLMENT_PAYMENT,
+                    TransactionType.CASH_IN, TransactionType.EXCHANGE_BUY_CURRENCY]
+    # EXCHANGE_SELL_CURRENCY bu yerda chiqim, chunki sotilayotgan valyuta kassadan chiqadi
+    EXPENSE_TYPES = [TransactionType.CASH_OUT, TransactionType.RETURN_REFUND,
+                     TransactionType.EXCHANGE_SELL_CURRENCY]
+
+    @property
+    def signed_amount(self):
+        """Balansga ta'siri: kirim (+), chiqim (-), noma'lum tur 0"""
+        if self.transaction_type in self.INCOME_TYPES:
+            return self.amount
+        if self.transaction_type in self.EXPENSE_TYPES:
+            return -self.amount
+        return Decimal(0)
+
+    def save(self, *args, **kwargs):
+        # KassaBalance amaliyot bilan bitta tranzaksiyada yangilanadi
+        with transaction.atomic():
+            if self.pk:
+                old = KassaTransaction.objects.filter(pk=self.pk).first()
+                if old is not None:
+                    KassaBalance.apply_delta(old.kassa_id, old.currency, -old.signed_amount)
+            super().save(*args, **kwargs)
+            KassaBalance.apply_delta(self.kassa_id, self.currency, self.signed_amount)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            KassaBalance.apply_delta(self.kassa_id, self.currency, -self.signed_amount)
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
-        # Kirim/Chiqim turlarini aniqlash uchun ro'yxatlar
-        income_op_types = [self.TransactionType.SALE, self.TransactionType.INSTALLMENT_PAYMENT,
-                           self.TransactionType.CASH_IN, self.TransactionType.EXCHANGE_BUY_CURRENCY]
-        # EXCHANGE_SELL_CURRENCY bu yerda chiqim, chunki sotilayotgan valyuta kassadan chiqadi
-        expense_op_types = [self.TransactionType.CASH_OUT, self.TransactionType.RETURN_REFUND,
-                            self.TransactionType.EXCHANGE_SELL_CURRENCY]
-
-        sign = "+" if self.transaction_type in income_op_types else "-"
-        if self.transaction_type not in income_op_types and self.transaction_type not in expense_op_types:
+        sign = "+" if self.transaction_type in self.INCOME_TYPES else "-"
+        if self.transaction_type not in self.INCOME_TYPES and self.transaction_type not in self.EXPENSE_TYPES:
             sign = "?"  # Noma'lum operatsiya turi uchun
 
         return f"{self.kassa.name}: {sign}{self.amount} {self.currency} ({self.get_transaction_type_display()}) - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
 
 
+class KassaBalance(models.Model):
+    """
+    Kassa va valyuta bo'yicha joriy balans (KassaTransaction lardan hisoblangan qiymat).
+    KassaTransaction.save()/delete() da yangilanadi; queryset.update()/delete() kabi
+    ommaviy amallar uni chetlab o'tadi - ular uchun verify_kassa_balances --fix.
+    """
+    kassa = models.ForeignKey(Kassa, on_delete=models.CASCADE, related_name='balances', verbose_name="Kassa")
+    currency = models.CharField(max_length=3, choices=Sale.SaleCurrency.choices, verbose_name="Valyuta")
+    balance = models.DecimalField(max_digits=17, decimal_places=2, default=Decimal(0), verbose_name="Balans")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Yangilangan vaqt")
+
+    class Meta:
+        verbose_name = "Kassa Balansi"; verbose_name_plural = "Kassa Balanslari"
+        constraints = [models.UniqueConstraint(fields=['kassa', 'currency'], name='unique_kassa_balance')]
+
+    def __str__(self): return f"{self.kassa_id}: {self.balance} {self.currency}"
+
+    @classmethod
+    def apply_delta(cls, kassa_id, currency, delta):
+        """Balansni F() bilan atomar o'zgartiradi, yozuv bo'lmasa yaratadi"""
+        if not delta:
+            return
+        updated = cls.objects.filter(kassa_id=kassa_id, currency=currency).update(
+            balance=F('balance') + delta, updated_at=timezone.now())
+        if not updated:
+            cls.objects.bulk_create([cls(kassa_id=kassa_id, currency=currency)], ignore_conflicts=True)
+            cls.objects.filter(kassa_id=kassa_id, currency=currency).update(
+                balance=F('balance') + delta, updated_at=timezone.now())
+
+
+class KassaShift(models.Model):
+    """
+    Kassa smenasi (ochish/yopish, Z-hisobot).
+    Yopilganda smena ichidagi amaliyot yig'indilari (tur va valyuta bo'yicha) hamda
+    boshidan shu paytgacha bo'lgan jami yig'indilar last_transaction_id nazorat nuqtasi
+    bilan saqlanadi. Keyingi hisob-kitoblar faqat shu nuqtadan keyingi amaliyotlarni qo'shadi.
+    """
+
+    class ShiftStatus(models.TextChoices):
+        OPEN = 'Open', 'Ochiq'
+        CLOSED = 'Closed', 'Yopilgan'
+
+    kassa = models.ForeignKey(Kassa, on_delete=models.PROTECT, related_name='shifts', verbose_name="Kassa")
+    status = models.CharField(max_length=10, choices=ShiftStatus.choices, default=ShiftStatus.OPEN,
+                              verbose_name="Holati")
+    opened_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='opened_shifts', verbose_name="Ochgan xodim")
+    closed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='closed_shifts', verbose_name="Yopgan xodim")
+    opened_at = models.DateTimeField(default=timezone.now, verbose_name="Ochilgan vaqt")
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name="Yopilgan vaqt")
+    # Smena oralig'i: opening_transaction_id < KassaTransaction.id <= last_transaction_id
+    opening_transaction_id = models.BigIntegerField(default=0, verbose_name="Ochilishdagi oxirgi amaliyot ID")
+    last_transaction_id = models.BigIntegerField(null=True, blank=True, db_index=True,
+                                                 verbose_name="Nazorat nuqtasi (oxirgi amaliyot ID)")
+    opening_balances = models.JSONField(encoder=DjangoJSONEncoder, default=dict, blank=True,
+                                        verbose_name="Ochilishdagi balanslar {valyuta: summa}")
+    closing_balances = models.JSONField(encoder=DjangoJSONEncoder, default=dict, blank=True,
+                                        verbose_name="Yopilishdagi balanslar {valyuta: summa}")
+    totals = models.JSONField(encoder=DjangoJSONEncoder, default=dict, blank=True,
+                              verbose_name="Smena yig'indilari {tur: {valyuta: summa}}")
+    cumulative_totals = models.JSONField(encoder=DjangoJSONEncoder, default=dict, blank=True,
+                                         verbose_name="Boshidan jami yig'indilar {tur: {valyuta: summa}}")
+    counted_cash = models.JSONField(encoder=DjangoJSONEncoder, default=dict, blank=True,
+                                    verbose_name="Sanalgan naqd pul {valyuta: summa}")
+    transactions_count = models.PositiveIntegerField(default=0, verbose_name="Amaliyotlar soni")
+    comment = models.TextField(blank=True, null=True, verbose_name="Izoh")
+
+    class Meta:
+        verbose_name = "Kassa Smenasi"; verbose_name_plural = "Kassa Smenalari"; ordering = ['-opened_at']
+        constraints = [models.UniqueConstraint(fields=['kassa'], condition=models.Q(status='Open'),
+                                               name='unique_open_shift_per_kassa')]
+
+    def __str__(self): return f"Smena #{self.id} ({self.kassa_id}) - {self.get_status_display()}"
+
+
 class SaleReturnItem(models.Model):
     sale_return = models.ForeignKey(SaleReturn, related_name='items', on_delete=models.CASCADE,
                                     verbose_name="Qaytarish Operatsiyasi")
@@ -444,4 +551,26 @@ class SaleReturnItem(models.Model):
     class Meta: verbose_name = "Qaytarilgan Element"; verbose_name_plural = "Qaytarilgan Elementlar"
 
     def __str__(
-            self): return f"{self.quantity_returned} dona {self.sale_item.product.name} (Qaytarish #{self.sale_return.id})"
\ No newline at end of file
+            self): return f"{self.quantity_returned} dona {self.sale_item.product.name} (Qaytarish #{self.sale_return.id})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Idempotency-Key sarlavhasi bilan kelgan yozish so'rovlarining saqlangan javoblari.
+    Terminal timeoutdan keyin so'rovni qayta yuborsa, amaliyot qayta bajarilmaydi,
+    saqlangan javob qaytariladi.
+    """
+    key = models.CharField(max_length=255, verbose_name="Kalit")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='idempotency_keys', verbose_name="Foydalanuvchi")
+    scope = models.CharField(max_length=50, verbose_name="Amaliyot turi")
+    fingerprint = models.CharField(max_length=64, verbose_name="So'rov izi (sha256)")
+    response_status = models.PositiveSmallIntegerField(verbose_name="Javob statusi")
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, null=True, blank=True, verbose_name="Javob")
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Yaratilgan vaqt")
+
+    class Meta:
+        verbose_name = "Idempotentlik Kaliti"; verbose_name_plural = "Idempotentlik Kalitlari"
+        constraints = [models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key')]
+
+    def __str__(self): return f"{self.scope}: {self.key} ({self.response_status})"
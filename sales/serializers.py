@@ -686,6 +686,7 @@
 #         return SaleDetailSerializer(instance=sale, context=self.context).data
 
 # sales/serializers.py
+from datetime import timedelta
 from decimal import Decimal
 
 from django.core.validators import RegexValidator
@@ -696,12 +697,15 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.validators import UniqueValidator
 
 # Modellarni import qilish
-from .models import Customer, Sale, SaleItem, KassaTransaction, SaleReturn, SaleReturnItem
+from .models import Customer, Sale, SaleItem, KassaTransaction, SaleReturn, SaleReturnItem, KassaShift
 from products.models import Product, Kassa
 from inventory.models import ProductStock, InventoryOperation
+from .services import apply_sale_items
+from inventory.services import increment_stock
 
 from products.serializers import ProductSerializer as ProductListSerializer, \
     KassaSerializer  # ProductSerializer ni ProductListSerializer deb nomladik chalkashmaslik uchun
+from products.serializers import PrefetchedPrimaryKeyRelatedField, PrefetchingListSerializer
 from users.serializers import UserSerializer
 
 from installments.models import InstallmentPlan
@@ -786,12 +790,16 @@ class SaleDetailSerializer(SaleListSerializer):
 
 class SaleItemInputSerializer(serializers.Serializer):
     # ... (o'zgarishsiz)
-    product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.filter(is_active=True),
-                                                    label="Mahsulot ID")
+    product_id = PrefetchedPrimaryKeyRelatedField(queryset=Product.objects.filter(is_active=True),
+                                                  label="Mahsulot ID")
     quantity = serializers.IntegerField(min_value=1, label="Miqdor")
     price = serializers.DecimalField(max_digits=17, decimal_places=2, required=True,
                                      label="Mahsulot narxi (sotuvchi tushib berilgan narx)")
 
+    class Meta:
+        # Savatdagi barcha product_id lar bitta so'rov bilan tekshiriladi
+        list_serializer_class = PrefetchingListSerializer
+
     def validate(self, data):
         product = data['product_id'];
         price = data['price']
@@ -809,11 +817,11 @@ class NewCustomerInputSerializer(serializers.Serializer):
 class SaleCreateSerializer(serializers.Serializer):
     items = SaleItemInputSerializer(many=True, required=True, min_length=1)
     payment_type = serializers.ChoiceField(choices=Sale.PaymentType.choices)
-    kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True))
+    kassa_id = PrefetchedPrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True))
     currency = serializers.ChoiceField(choices=Sale.SaleCurrency.choices)
 
     # Mijoz endi har doim ixtiyoriy
-    customer_id = serializers.PrimaryKeyRelatedField(queryset=Customer.objects.all(), required=False, allow_null=True)
+    customer_id = PrefetchedPrimaryKeyRelatedField(queryset=Customer.objects.all(), required=False, allow_null=True)
     new_customer = NewCustomerInputSerializer(required=False, allow_null=True)
 
     installment_down_payment = serializers.DecimalField(required=False, default=Decimal(0), min_value=Decimal(0),
@@ -906,6 +914,7 @@ class SaleCreateSerializer(serializers.Serializer):
         installment_term_months = validated_data.pop('installment_term_months', None);
         installment_initial_amount_for_plan = validated_data.pop('installment_initial_amount',
                                                                  self.context.get('calculated_final_total_in_currency'))
+        sale_created_at = validated_data.pop('client_created_at', None) or timezone.now()  # Oflayn sotuvlar uchun
         customer_for_sale = customer_id_obj
         if not customer_for_sale and new_customer_data: phone = new_customer_data.get(
             'phone_number'); customer_for_sale, _ = Customer.objects.get_or_create(phone_number=phone, defaults={
@@ -921,31 +930,9 @@ class SaleCreateSerializer(serializers.Serializer):
                                    original_total_amount_currency=original_total,
                                    final_amount_currency=final_total_for_sale,
                                    amount_actually_paid_at_sale=amount_to_register_as_paid, payment_type=payment_type,
-                                   status=Sale.SaleStatus.COMPLETED)
-        for item_data_loop in items_data:
-            product = item_data_loop['product_id'];
-            quantity = item_data_loop['quantity'];
-            final_price_for_item_in_sale_currency = item_data_loop['price'];
-            price_usd_to_save, price_uzs_to_save = None, None;
-            original_price_usd_item, original_price_uzs_item = product.price_usd, product.price_uzs
-            if sale_currency_code == Sale.SaleCurrency.UZS:
-                price_uzs_to_save = final_price_for_item_in_sale_currency
-            elif sale_currency_code == Sale.SaleCurrency.USD:
-                price_usd_to_save = final_price_for_item_in_sale_currency
-            SaleItem.objects.create(sale=sale, product=product, quantity=quantity, price_at_sale_usd=price_usd_to_save,
-                                    price_at_sale_uzs=price_uzs_to_save,
-                                    original_price_at_sale_usd_item=original_price_usd_item,
-                                    original_price_at_sale_uzs_item=original_price_uzs_item)
-            try:
-                stock = ProductStock.objects.select_for_update().get(product=product, kassa=kassa)
-            except ProductStock.DoesNotExist:
-                raise ValidationError(f"{product.name} uchun {kassa.name} da ombor yozuvi topilmadi.")
-            if stock.quantity < quantity: raise ValidationError(f"{product.name} uchun qoldiq yetarli emas.")
-            stock.quantity -= quantity;
-            stock.save(update_fields=['quantity'])
-            InventoryOperation.objects.create(product=product, kassa=kassa, user=user, quantity=-quantity,
-                                              operation_type=InventoryOperation.OperationType.SALE,
-                                              comment=f"Sotuv #{sale.id}")
+                                   status=Sale.SaleStatus.COMPLETED, created_at=sale_created_at)
+        # Elementlar, qoldiqlar va ombor amaliyotlari bulk so'rovlar bilan yoziladi (sales/services.py)
+        apply_sale_items(sale, items_data, user=user)
         if amount_to_register_as_paid > 0:
             kassa_trans_type = KassaTransaction.TransactionType.SALE
             if payment_type == Sale.PaymentType.INSTALLMENT: kassa_trans_type = KassaTransaction.TransactionType.INSTALLMENT_PAYMENT
@@ -966,6 +953,23 @@ class SaleCreateSerializer(serializers.Serializer):
             if plan_serializer.is_valid(raise_exception=True): plan_serializer.save()
         return sale
 
+
+class SaleSyncItemSerializer(SaleCreateSerializer):
+    """Oflayn terminaldan keladigan bitta sotuv (SaleCreateSerializer + mijoz vaqti va kaliti)"""
+    client_created_at = serializers.DateTimeField(required=False, allow_null=True,
+                                                  label="Terminalda sotuv qilingan vaqt")
+    idempotency_key = serializers.CharField(max_length=255, required=False, allow_blank=True,
+                                            label="Terminaldagi sotuvning noyob kaliti")
+
+    def validate_client_created_at(self, value):
+        if value and value > timezone.now() + timedelta(minutes=5):
+            raise serializers.ValidationError("Sotuv vaqti kelajakda bo'lishi mumkin emas.")
+        return value
+
+    def create(self, validated_data):
+        validated_data.pop('idempotency_key', None)
+        return super().create(validated_data)
+
 # class SaleCreateSerializer(serializers.Serializer):
 #     # ... (maydonlar o'zgarishsiz)
 #     items = SaleItemInputSerializer(many=True, required=True, min_length=1)
@@ -1133,9 +1137,13 @@ class SaleCreateSerializer(serializers.Serializer):
 
 class SaleReturnItemInputSerializer(serializers.Serializer):
     # ... (o'zgarishsiz)
-    sale_item_id = serializers.PrimaryKeyRelatedField(queryset=SaleItem.objects.all(), label="Sotuv Elementi ID")
+    sale_item_id = PrefetchedPrimaryKeyRelatedField(
+        queryset=SaleItem.objects.select_related('sale__kassa', 'product'), label="Sotuv Elementi ID")
     quantity = serializers.IntegerField(min_value=1, label="Qaytariladigan miqdor")
 
+    class Meta:
+        list_serializer_class = PrefetchingListSerializer
+
 
 class SaleReturnSerializer(serializers.Serializer):
     # ... (refund_method o'zgarishsiz)
@@ -1152,14 +1160,11 @@ class SaleReturnSerializer(serializers.Serializer):
         sale_id = None;
         sale_items_map = {}
         for item_data in items:
-            sale_item_id = item_data['sale_item_id'].id;
+            # sale_item_id ro'yxat bo'yicha bitta so'rov bilan (sale, product bilan birga) yuklangan
+            sale_item = item_data['sale_item_id'];
+            sale_item_id = sale_item.id;
             quantity_to_return = item_data['quantity']
-            try:
-                sale_item = SaleItem.objects.select_related('sale__kassa', 'product').get(id=sale_item_id);
-                sale_items_map[sale_item_id] = sale_item
-            except SaleItem.DoesNotExist:
-                raise serializers.ValidationError({
-                                                      f"items_to_return[{items.index(item_data)}].sale_item_id": f"ID={sale_item_id} bilan sotuv elementi topilmadi."})
+            sale_items_map[sale_item_id] = sale_item
             current_sale_id = sale_item.sale_id
             if sale_id is None:
                 sale_id = current_sale_id; sale = sale_item.sale; self.context['sale_instance'] = sale;
@@ -1217,10 +1222,8 @@ class SaleReturnSerializer(serializers.Serializer):
                                    operation_type=InventoryOperation.OperationType.RETURN,
                                    comment=f"Sotuv #{sale.id} qaytarish #{sale_return_obj.id}"))
 
-        stocks_to_update = ProductStock.objects.select_for_update().filter(product_id__in=product_stock_updates.keys(),
-                                                                           kassa=kassa)
-        for stock in stocks_to_update: stock.quantity += product_stock_updates[stock.product_id]
-        ProductStock.objects.bulk_update(stocks_to_update, ['quantity'])
+        # Qoldiqni F() bilan oshirish (o'qib-yozishdagi yo'qotishlarsiz)
+        increment_stock(kassa, product_stock_updates)
         InventoryOperation.objects.bulk_create(inventory_ops_to_create)
         SaleItem.objects.bulk_update(sale_items_to_update, ['quantity_returned'])
 
@@ -1352,6 +1355,41 @@ class CashOutSerializer(BaseCashOperationSerializer):
         return transaction
 
 
+class KassaShiftSerializer(serializers.ModelSerializer):
+    kassa_name = serializers.CharField(source='kassa.name', read_only=True)
+    opened_by_username = serializers.CharField(source='opened_by.username', read_only=True, allow_null=True)
+    closed_by_username = serializers.CharField(source='closed_by.username', read_only=True, allow_null=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+
+    class Meta:
+        model = KassaShift
+        fields = [
+            'id', 'kassa', 'kassa_name', 'status', 'status_display',
+            'opened_by_username', 'closed_by_username', 'opened_at', 'closed_at',
+            'opening_balances', 'closing_balances', 'totals', 'counted_cash',
+            'transactions_count', 'last_transaction_id', 'comment'
+        ]
+        read_only_fields = fields
+
+
+class KassaShiftOpenSerializer(serializers.Serializer):
+    kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True), label="Kassa")
+    comment = serializers.CharField(required=False, allow_blank=True, label="Izoh")
+
+
+class KassaShiftCloseSerializer(serializers.Serializer):
+    counted_cash = serializers.DictField(
+        child=serializers.DecimalField(max_digits=17, decimal_places=2, min_value=Decimal(0)),
+        required=False, label="Sanalgan naqd pul", help_text='Masalan: {"UZS": "1500000", "USD": "120"}')
+    comment = serializers.CharField(required=False, allow_blank=True, label="Izoh")
+
+    def validate_counted_cash(self, value):
+        unknown = [currency for currency in value if currency not in Sale.SaleCurrency.values]
+        if unknown:
+            raise serializers.ValidationError(f"Noma'lum valyuta: {', '.join(unknown)}")
+        return value
+
+
 # YANGI: Valyuta ayirboshlash uchun Serializer
 class CurrencyExchangeSerializer(serializers.Serializer):
     kassa_id = serializers.PrimaryKeyRelatedField(queryset=Kassa.objects.filter(is_active=True), label="Kassa")
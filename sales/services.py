@@ -0,0 +1,538 @@
+# sales/services.py
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction, IntegrityError
+from django.db.models import Sum, Count, Max, Q, Case, When, F, Value, DecimalField
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from inventory.models import InventoryOperation, ProductStock
+from inventory.services import reserve_stock
+from products.models import Product, Kassa, Category
+from .models import Sale, SaleItem, Customer, IdempotencyKey, KassaTransaction, KassaBalance, KassaShift
+
+SALES_SYNC_SCOPE = 'sales.sync'
+
+
+def get_cost_price_in_currency(product, currency):
+    """Mahsulotning joriy xarid (tan) narxi berilgan valyutada, bo'lmasa None"""
+    if currency == Sale.SaleCurrency.USD:
+        return product.purchase_price_usd
+    return product.purchase_price_uzs
+
+
+def apply_sale_items(sale, items_data, user=None):
+    """
+    Savatdagi barcha qatorlarni bitta to'plam sifatida qo'llaydi:
+    qoldiqlar reserve_stock orqali shartli UPDATE bilan kamaytiriladi
+    (yetmagan qatorlar birdaniga xato sifatida qaytariladi), SaleItem va
+    InventoryOperation yozuvlari esa bulk so'rovlar bilan yoziladi.
+    Chaqiruvchi transaction.atomic ichida bo'lishi shart.
+    """
+    kassa = sale.kassa
+    quantities = {}
+    sale_items_to_create = []
+    for item_data in items_data:
+        product = item_data['product_id']
+        quantity = item_data['quantity']
+        if product.id in quantities:
+            raise ValidationError(f"'{product.name}' savatda bir necha marta kiritilgan.")
+        quantities[product.id] = quantity
+
+        final_price = item_data['price']
+        sale_items_to_create.append(SaleItem(
+            sale=sale, product=product, quantity=quantity,
+            price_at_sale_usd=final_price if sale.currency == Sale.SaleCurrency.USD else None,
+            price_at_sale_uzs=final_price if sale.currency == Sale.SaleCurrency.UZS else None,
+            original_price_at_sale_usd_item=product.price_usd,
+            original_price_at_sale_uzs_item=product.price_uzs,
+            cost_price_at_sale=get_cost_price_in_currency(product, sale.currency)
+        ))
+
+    # Qoldiqlarni shartli UPDATE bilan kamaytirish (SELECT FOR UPDATE ga tayanmasdan)
+    failed = reserve_stock(kassa, quantities)
+    if failed:
+        products = {item.product_id: item.product for item in sale_items_to_create}
+        errors = []
+        for line in failed:
+            product = products[line['product_id']]
+            if line['available'] is None:
+                errors.append(f"{product.name} uchun {kassa.name} da ombor yozuvi topilmadi.")
+            else:
+                errors.append(f"{product.name} uchun qoldiq yetarli emas.")
+        raise ValidationError(errors)
+
+    SaleItem.objects.bulk_create(sale_items_to_create)
+
+    InventoryOperation.objects.bulk_create([
+        InventoryOperation(product=item.product, kassa=kassa, user=user, quantity=-item.quantity,
+                           operation_type=InventoryOperation.OperationType.SALE,
+                           comment=f"Sotuv #{sale.id}")
+        for item in sale_items_to_create
+    ])
+    return sale_items_to_create
+
+
+def _clean_ids(values):
+    ids = set()
+    for value in values:
+        if isinstance(value, bool):
+            continue
+        try:
+            ids.add(int(value))
+        except (TypeError, ValueError):
+            pass
+    return ids
+
+
+def prefetch_sale_references(payloads):
+    """
+    Paketdagi barcha sotuvlar murojaat qilgan mahsulot, mijoz va kassalarni
+    har bir model uchun bitta so'rov bilan yuklaydi.
+    Natija PrefetchedPrimaryKeyRelatedField uchun context['prefetched_objects'] formatida.
+    """
+    product_ids, customer_ids, kassa_ids = [], [], []
+    for payload in payloads:
+        if not isinstance(payload, dict):
+            continue
+        kassa_ids.append(payload.get('kassa_id'))
+        customer_ids.append(payload.get('customer_id'))
+        items = payload.get('items')
+        if isinstance(items, list):
+            product_ids.extend(item.get('product_id') for item in items if isinstance(item, dict))
+    return {
+        Product: Product.objects.filter(is_active=True).in_bulk(_clean_ids(product_ids)),
+        Customer: Customer.objects.in_bulk(_clean_ids(customer_ids)),
+        Kassa: Kassa.objects.filter(is_active=True).in_bulk(_clean_ids(kassa_ids)),
+    }
+
+
+def sync_sales(payloads, user, context=None):
+    """
+    Oflayn terminalda navbatda turgan sotuvlarni bitta tranzaksiyada qo'llaydi.
+    Har bir sotuv alohida savepointda: xato bergan sotuv faqat o'zini bekor qiladi.
+    idempotency_key berilgan sotuv qayta yuborilsa, qayta yaratilmaydi ('duplicate').
+    Natija: har bir sotuv uchun {'index', 'status': created|duplicate|error, 'sale_id'/'errors'}.
+    """
+    from .serializers import SaleSyncItemSerializer
+    from .idempotency import payload_fingerprint, get_idempotency_ttl
+
+    context = dict(context or {})
+    context['prefetched_objects'] = prefetch_sale_references(payloads)
+    keys = {payload.get('idempotency_key') for payload in payloads
+            if isinstance(payload, dict) and payload.get('idempotency_key')}
+
+    results = []
+    with transaction.atomic():
+        known = {}
+        if keys:
+            keys_qs = IdempotencyKey.objects.filter(user=user, scope=SALES_SYNC_SCOPE, key__in=keys)
+            keys_qs.filter(created_at__lt=timezone.now() - get_idempotency_ttl()).delete()
+            known = {record.key: record for record in keys_qs}
+
+        for index, payload in enumerate(payloads):
+            result = {'index': index}
+            key = payload.get('idempotency_key') if isinstance(payload, dict) else None
+            fingerprint = None
+            if key:
+                result['idempotency_key'] = key
+                fingerprint = payload_fingerprint(payload)
+                record = known.get(key)
+                if record is not None:
+                    if record.fingerprint != fingerprint:
+                        result.update(status='error', errors=["Bu kalit boshqa sotuv uchun ishlatilgan."])
+                    else:
+                        result.update(status='duplicate', sale_id=(record.response_body or {}).get('sale_id'))
+                    results.append(result)
+                    continue
+
+            serializer = SaleSyncItemSerializer(data=payload, context=dict(context))
+            if not serializer.is_valid():
+                result.update(status='error', errors=serializer.errors)
+                results.append(result)
+                continue
+            try:
+                with transaction.atomic():
+                    sale = serializer.save(user=user)
+                    if key:
+                        known[key] = IdempotencyKey.objects.create(
+                            key=key, user=user, scope=SALES_SYNC_SCOPE, fingerprint=fingerprint,
+                            response_status=201, response_body={'sale_id': sale.id}
+                        )
+                result.update(status='created', sale_id=sale.id)
+            except ValidationError as e:
+                result.update(status='error', errors=e.detail)
+            except IntegrityError as e:
+                print(f"Sales sync integrity error at index {index}: {e}")
+                result.update(status='error', errors=["Sotuv parallel so'rov bilan allaqachon yozilgan."])
+            except Exception as e:
+                print(f"Sales sync error at index {index}: {e}")
+                result.update(status='error', errors=["Sotuvni saqlashda ichki xatolik."])
+            results.append(result)
+    return results
+
+
+def compute_ledger_balances(kassa_id=None, full=False):
+    """
+    KassaTransaction jurnalidan (kassa, valyuta) bo'yicha balanslar.
+    Odatda har bir kassa uchun oxirgi nazorat nuqtasi (yopilgan smena) + undan keyingi amaliyotlar;
+    full=True - butun jurnal bitta GROUP BY so'rovi bilan (nazorat nuqtalarini ham tekshirish uchun).
+    Natija: {(kassa_id, valyuta): balans}
+    """
+    if not full:
+        kassa_ids = [kassa_id] if kassa_id else list(Kassa.objects.values_list('id', flat=True))
+        return {
+            (ledger_kassa_id, currency): balance.quantize(Decimal('0.01'))
+            for ledger_kassa_id in kassa_ids
+            for currency, balance in balances_from_totals(get_kassa_ledger_totals(ledger_kassa_id)).items()
+        }
+    queryset = KassaTransaction.objects.all()
+    if kassa_id:
+        queryset = queryset.filter(kassa_id=kassa_id)
+    rows = queryset.values('kassa_id', 'currency').annotate(
+        total=Sum(Case(
+            When(transaction_type__in=KassaTransaction.INCOME_TYPES, then=F('amount')),
+            When(transaction_type__in=KassaTransaction.EXPENSE_TYPES, then=-F('amount')),
+            default=Value(Decimal(0)), output_field=DecimalField(max_digits=17, decimal_places=2)
+        ))
+    ).order_by()
+    return {
+        (row['kassa_id'], row['currency']): Decimal(str(row['total'] or 0)).quantize(Decimal('0.01'))
+        for row in rows
+    }
+
+
+def find_kassa_balance_drift(kassa_id=None, full=False):
+    """KassaBalance jadvalini jurnal bilan solishtiradi: [(kassa_id, valyuta, jadvalda, jurnalda), ...]"""
+    ledger = compute_ledger_balances(kassa_id, full=full)
+    stored_qs = KassaBalance.objects.all()
+    if kassa_id:
+        stored_qs = stored_qs.filter(kassa_id=kassa_id)
+    stored = {(row.kassa_id, row.currency): row.balance for row in stored_qs}
+    drift = []
+    for key in sorted(set(ledger) | set(stored)):
+        expected = ledger.get(key, Decimal(0))
+        actual = stored.get(key)
+        if actual is None and not expected:
+            continue
+        if actual is None or actual != expected:
+            drift.append((key[0], key[1], actual, expected))
+    return drift
+
+
+def rebuild_kassa_balances(drift):
+    """find_kassa_balance_drift natijasidagi qatorlarni jurnaldagi qiymatga tenglashtiradi"""
+    with transaction.atomic():
+        for kassa_id, currency, actual, expected in drift:
+            KassaBalance.objects.update_or_create(kassa_id=kassa_id, currency=currency,
+                                                  defaults={'balance': expected})
+
+
+def _decimal_totals(raw_totals):
+    """JSON dagi {tur: {valyuta: "summa"}} ni Decimal larga o'giradi"""
+    return {
+        transaction_type: {currency: Decimal(str(amount)) for currency, amount in by_currency.items()}
+        for transaction_type, by_currency in (raw_totals or {}).items()
+    }
+
+
+def _merge_totals(base, extra):
+    merged = {transaction_type: dict(by_currency) for transaction_type, by_currency in base.items()}
+    for transaction_type, by_currency in extra.items():
+        target = merged.setdefault(transaction_type, {})
+        for currency, amount in by_currency.items():
+            target[currency] = target.get(currency, Decimal(0)) + amount
+    return merged
+
+
+def compute_transaction_totals(kassa_id, after_id=0, upto_id=None):
+    """
+    Kassa amaliyotlari yig'indisi (tur va valyuta bo'yicha), after_id < id <= upto_id oralig'ida.
+    Natija: ({tur: {valyuta: summa}}, amaliyotlar soni)
+    """
+    queryset = KassaTransaction.objects.filter(kassa_id=kassa_id, id__gt=after_id or 0)
+    if upto_id is not None:
+        queryset = queryset.filter(id__lte=upto_id)
+    totals, count = {}, 0
+    rows = queryset.values('transaction_type', 'currency').annotate(total=Sum('amount'), count=Count('id')).order_by()
+    for row in rows:
+        amount = Decimal(str(row['total'] or 0)).quantize(Decimal('0.01'))
+        totals.setdefault(row['transaction_type'], {})[row['currency']] = amount
+        count += row['count']
+    return totals, count
+
+
+def balances_from_totals(totals):
+    """{tur: {valyuta: summa}} dan {valyuta: balans} (kirim - chiqim)"""
+    balances = {currency: Decimal(0) for currency in Sale.SaleCurrency.values}
+    for transaction_type, by_currency in totals.items():
+        if transaction_type in KassaTransaction.INCOME_TYPES:
+            sign = 1
+        elif transaction_type in KassaTransaction.EXPENSE_TYPES:
+            sign = -1
+        else:
+            continue
+        for currency, amount in by_currency.items():
+            balances[currency] = balances.get(currency, Decimal(0)) + sign * amount
+    return balances
+
+
+def get_last_checkpoint(kassa_id):
+    """Kassaning oxirgi yopilgan smenasi (nazorat nuqtasi) yoki None"""
+    return KassaShift.objects.filter(kassa_id=kassa_id, status=KassaShift.ShiftStatus.CLOSED,
+                                     last_transaction_id__isnull=False).order_by('-last_transaction_id', '-id').first()
+
+
+def get_kassa_ledger_totals(kassa_id, upto_id=None):
+    """
+    Kassaning boshidan beri jami yig'indilari: oxirgi nazorat nuqtasidagi cumulative_totals
+    + undan keyingi amaliyotlar. Butun tarixni skanerlamaydi.
+    """
+    checkpoint = get_last_checkpoint(kassa_id)
+    if checkpoint is not None and upto_id is not None and checkpoint.last_transaction_id > upto_id:
+        checkpoint = KassaShift.objects.filter(
+            kassa_id=kassa_id, status=KassaShift.ShiftStatus.CLOSED, last_transaction_id__lte=upto_id
+        ).order_by('-last_transaction_id', '-id').first()
+    base = _decimal_totals(checkpoint.cumulative_totals) if checkpoint else {}
+    tail, _ = compute_transaction_totals(kassa_id, after_id=checkpoint.last_transaction_id if checkpoint else 0,
+                                         upto_id=upto_id)
+    return _merge_totals(base, tail)
+
+
+def _current_balances(kassa_id):
+    from reports.services import get_kassa_balance_currency
+    return {currency: get_kassa_balance_currency(kassa_id, currency) for currency in Sale.SaleCurrency.values}
+
+
+def _last_transaction_id(kassa_id):
+    return KassaTransaction.objects.filter(kassa_id=kassa_id).aggregate(last_id=Max('id'))['last_id'] or 0
+
+
+def open_kassa_shift(kassa, user=None, comment=None):
+    """Kassa uchun yangi smena ochadi (kassada bir vaqtda bitta ochiq smena bo'ladi)"""
+    try:
+        with transaction.atomic():
+            if KassaShift.objects.filter(kassa=kassa, status=KassaShift.ShiftStatus.OPEN).exists():
+                raise ValidationError(f"{kassa.name} kassasida ochiq smena allaqachon mavjud.")
+            return KassaShift.objects.create(
+                kassa=kassa, opened_by=user, comment=comment,
+                opening_transaction_id=_last_transaction_id(kassa.id),
+                opening_balances=_current_balances(kassa.id)
+            )
+    except IntegrityError:
+        raise ValidationError(f"{kassa.name} kassasida ochiq smena allaqachon mavjud.")
+
+
+def close_kassa_shift(shift, user=None, counted_cash=None, comment=None):
+    """
+    Smenani yopadi: smena yig'indilari, boshidan jami yig'indilar (nazorat nuqtasi)
+    va yopilishdagi balanslarni muzlatib qo'yadi.
+    """
+    with transaction.atomic():
+        shift = KassaShift.objects.select_for_update().get(pk=shift.pk)
+        if shift.status != KassaShift.ShiftStatus.OPEN:
+            raise ValidationError("Smena allaqachon yopilgan.")
+        last_id = max(_last_transaction_id(shift.kassa_id), shift.opening_transaction_id)
+        totals, count = compute_transaction_totals(shift.kassa_id, after_id=shift.opening_transaction_id,
+                                                   upto_id=last_id)
+        shift.totals = totals
+        shift.transactions_count = count
+        shift.cumulative_totals = get_kassa_ledger_totals(shift.kassa_id, upto_id=last_id)
+        shift.last_transaction_id = last_id
+        shift.closing_balances = _current_balances(shift.kassa_id)
+        shift.counted_cash = counted_cash or {}
+        shift.status = KassaShift.ShiftStatus.CLOSED
+        shift.closed_by = user
+        shift.closed_at = timezone.now()
+        if comment:
+            shift.comment = f"{shift.comment}\n{comment}" if shift.comment else comment
+        shift.save()
+    return shift
+
+
+def summarize_transaction_totals(totals):
+    """{tur: {valyuta: summa}} dan (turlar ro'yxati, {valyuta: {income, expense, net}})"""
+    type_labels = dict(KassaTransaction.TransactionType.choices)
+    by_type = []
+    summary = {currency: {'income': Decimal(0), 'expense': Decimal(0)} for currency in Sale.SaleCurrency.values}
+    for transaction_type, by_currency in sorted(totals.items()):
+        by_type.append({'transaction_type': transaction_type,
+                        'transaction_type_display': type_labels.get(transaction_type, transaction_type),
+                        'amounts': by_currency})
+        for currency, amount in by_currency.items():
+            if transaction_type in KassaTransaction.INCOME_TYPES:
+                summary.setdefault(currency, {'income': Decimal(0), 'expense': Decimal(0)})['income'] += amount
+            elif transaction_type in KassaTransaction.EXPENSE_TYPES:
+                summary.setdefault(currency, {'income': Decimal(0), 'expense': Decimal(0)})['expense'] += amount
+    for currency, row in summary.items():
+        row['net'] = row['income'] - row['expense']
+    return by_type, summary
+
+
+def get_kassa_cash_flow(kassa_id):
+    """
+    Kassa pul oqimi: oxirgi yopilgan smena (nazorat nuqtasi) dagi cumulative_totals + undan keyingi
+    amaliyotlar (bitta GROUP BY, faqat nuqtadan keyingi qatorlar). Butun jurnal skanerlanmaydi.
+    """
+    checkpoint = get_last_checkpoint(kassa_id)
+    after_id = checkpoint.last_transaction_id if checkpoint else 0
+    since_totals, since_count = compute_transaction_totals(kassa_id, after_id=after_id)
+    cumulative = _merge_totals(_decimal_totals(checkpoint.cumulative_totals) if checkpoint else {}, since_totals)
+    since_by_type, since_summary = summarize_transaction_totals(since_totals)
+    by_type, summary = summarize_transaction_totals(cumulative)
+    return {
+        'kassa_id': kassa_id,
+        'checkpoint': {
+            'shift_id': checkpoint.id, 'closed_at': checkpoint.closed_at,
+            'last_transaction_id': checkpoint.last_transaction_id,
+        } if checkpoint else None,
+        'since_checkpoint': {
+            'transactions_count': since_count, 'totals_by_type': since_by_type, 'summary_by_currency': since_summary,
+        },
+        'totals_by_type': by_type,
+        'summary_by_currency': summary,
+        'balances': balances_from_totals(cumulative),
+    }
+
+
+def build_z_report(shift):
+    """
+    Smena hisobotining ma'lumotlari. Yopilgan smena uchun saqlangan yig'indilar,
+    ochiq smena uchun (X-hisobot) ochilgandan beri bo'lgan amaliyotlar ishlatiladi.
+    """
+    if shift.status == KassaShift.ShiftStatus.CLOSED:
+        totals, count = _decimal_totals(shift.totals), shift.transactions_count
+        closing_balances = {currency: Decimal(str(amount)) for currency, amount in shift.closing_balances.items()}
+    else:
+        totals, count = compute_transaction_totals(shift.kassa_id, after_id=shift.opening_transaction_id)
+        closing_balances = _current_balances(shift.kassa_id)
+
+    by_type, summary = summarize_transaction_totals(totals)
+
+    cash_difference = {}
+    for currency, counted in (shift.counted_cash or {}).items():
+        expected = closing_balances.get(currency)
+        if expected is not None:
+            cash_difference[currency] = Decimal(str(counted)) - expected
+
+    return {
+        'shift_id': shift.id,
+        'kassa_id': shift.kassa_id,
+        'kassa_name': shift.kassa.name,
+        'status': shift.status,
+        'opened_at': shift.opened_at,
+        'closed_at': shift.closed_at,
+        'opened_by': shift.opened_by.username if shift.opened_by else None,
+        'closed_by': shift.closed_by.username if shift.closed_by else None,
+        'transactions_count': count,
+        'opening_balances': shift.opening_balances,
+        'closing_balances': closing_balances,
+        'totals_by_type': by_type,
+        'summary_by_currency': summary,
+        'counted_cash': shift.counted_cash,
+        'cash_difference': cash_difference,
+    }
+
+
+# --- POS katalogi (kassa bo'yicha ixcham snapshot) ---
+
+POS_CATALOG_COLUMNS = ['id', 'name', 'barcode', 'category_id', 'price_uzs', 'price_usd', 'quantity_in_stock']
+_POS_CATALOG_FIELDS = ('product_id', 'product__name', 'product__barcode', 'product__category_id',
+                       'product__price_uzs', 'product__price_usd', 'quantity')
+
+
+def _to_version(value):
+    """datetime -> butun son (epoch mikrosekund), terminal ?since= da qaytaradi"""
+    if value is None:
+        return 0
+    delta = value - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * 10 ** 6 + delta.microseconds
+
+
+def _from_version(version):
+    return datetime(1970, 1, 1, tzinfo=dt_timezone.utc) + timedelta(microseconds=version)
+
+
+def get_pos_catalog_state(kassa_id):
+    """
+    Katalog holatini 3 ta kichik so'rov bilan aniqlaydi (indekslar bo'yicha MAX/COUNT):
+    mahsulotlar, kassa qoldiqlari va kategoriyalar. Natija: (version, etag, categories).
+    Mahsulot/qoldiq o'zgarsa yoki yozuv o'chirilsa etag ham o'zgaradi.
+    """
+    products = Product.objects.aggregate(changed=Max('updated_at'), total=Count('id'))
+    stocks = ProductStock.objects.filter(kassa_id=kassa_id).aggregate(changed=Max('updated_at'), total=Count('id'))
+    categories = dict(Category.objects.values_list('id', 'name'))
+    version = max(_to_version(products['changed']), _to_version(stocks['changed']))
+    raw = json.dumps([kassa_id, version, products['total'], stocks['total'], sorted(categories.items())],
+                     cls=DjangoJSONEncoder)
+    return version, hashlib.sha1(raw.encode('utf-8')).hexdigest(), categories
+
+
+def _catalog_row(values):
+    product_id, name, barcode, category_id, price_uzs, price_usd, quantity = values
+    return [product_id, name, barcode, category_id,
+            str(price_uzs) if price_uzs is not None else None,
+            str(price_usd) if price_usd is not None else None,
+            quantity]
+
+
+def _pos_catalog_queryset(kassa_id):
+    return ProductStock.objects.filter(kassa_id=kassa_id, quantity__gt=0, product__is_active=True)
+
+
+def build_pos_catalog(kassa_id, since=None, state=None):
+    """
+    Kassa katalogi: {'version', 'etag', 'full', 'columns', 'rows', 'removed', 'total', 'categories'}.
+    since berilsa (oldingi javobdagi version) faqat shundan keyin o'zgargan mahsulot/qoldiqlar
+    qaytariladi; sotuvdan chiqqanlar (aktiv emas yoki qoldiq 0) 'removed' ro'yxatida.
+    Terminal 'total' ni o'zidagi qatorlar soni bilan solishtirib, farq bo'lsa to'liq yuklaydi
+    (bazadan butunlay o'chirilgan yozuvlar deltada ko'rinmaydi).
+    To'liq snapshot JSON holida keshlanadi (kalit: kassa + etag), keyingi so'rovlar bazaga tegmaydi.
+    state - oldindan olingan get_pos_catalog_state natijasi (view 304 ni tekshirish uchun avval oladi).
+    Natija: (version, etag, json_bytes)
+    """
+    version, etag, categories = state or get_pos_catalog_state(kassa_id)
+
+    if since is None:
+        cache_key = f"pos_catalog:{kassa_id}:{etag}"
+        body = cache.get(cache_key)
+        if body is None:
+            rows = [_catalog_row(values) for values in _pos_catalog_queryset(kassa_id)
+                    .order_by('product__category__name', 'product__name').values_list(*_POS_CATALOG_FIELDS)]
+            body = _encode_catalog({
+                'kassa_id': kassa_id, 'version': version, 'etag': etag, 'full': True,
+                'columns': POS_CATALOG_COLUMNS, 'rows': rows, 'removed': [], 'total': len(rows),
+                'categories': categories,
+            })
+            cache.set(cache_key, body, getattr(settings, 'POS_CATALOG_CACHE_SECONDS', 300))
+        return version, etag, body
+
+    # Uzun tranzaksiyalar kechroq commit qilinishi mumkin: oynani biroz orqaga suramiz,
+    # takroriy qatorlar terminal uchun zararsiz (id bo'yicha almashtiriladi)
+    overlap = timedelta(seconds=getattr(settings, 'POS_CATALOG_DELTA_OVERLAP_SECONDS', 5))
+    changed_after = _from_version(since) - overlap
+    rows, removed = [], []
+    changed = ProductStock.objects.filter(kassa_id=kassa_id).filter(
+        Q(updated_at__gt=changed_after) | Q(product__updated_at__gt=changed_after)
+    ).values_list(*_POS_CATALOG_FIELDS, 'product__is_active')
+    for values in changed:
+        if values[-1] and values[-2] > 0:
+            rows.append(_catalog_row(values[:-1]))
+        else:
+            removed.append(values[0])
+    body = _encode_catalog({
+        'kassa_id': kassa_id, 'version': version, 'etag': etag, 'full': False, 'since': since,
+        'columns': POS_CATALOG_COLUMNS, 'rows': rows, 'removed': removed,
+        'total': _pos_catalog_queryset(kassa_id).count(), 'categories': categories,
+    })
+    return version, etag, body
+
+
+def _encode_catalog(payload):
+    return json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
@@ -1,3 +1,96 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection, transaction, OperationalError
+from django.db.models import Sum
+from django.test import TransactionTestCase
+from rest_framework.exceptions import ValidationError
+
+from inventory.models import ProductStock, InventoryOperation
+from products.models import Kassa, Product
+from .models import Sale, SaleItem
+from .services import apply_sale_items
+
+STRESS_THREADS = 6
+STRESS_CHECKOUTS = 15
+STRESS_STOCK = 20
+STRESS_MAX_QUANTITY = 3
+STRESS_RETRIES = 50
+
+
+class ConcurrentCheckoutStressTests(TransactionTestCase):
+    """
+    Bir nechta oqimda bir vaqtning o'zida sotuv: qoldiq hech qachon manfiy bo'lmasligi,
+    sotilgan + rad etilgan = urinishlar va qoldiq kamayishi sotilgan miqdorga tengligi.
+    """
+
+    def setUp(self):
+        self.kassa = Kassa.objects.create(name="Stress kassa")
+        self.products = Product.objects.bulk_create([
+            Product(name=f"Stress mahsulot {i}", price_uzs=Decimal('1000.00'), price_usd=Decimal('1.00'))
+            for i in range(3)
+        ])
+        ProductStock.objects.bulk_create([
+            ProductStock(product=product, kassa=self.kassa, quantity=STRESS_STOCK) for product in self.products
+        ])
+        self.stats = {'sold': 0, 'rejected': 0, 'errors': []}
+        self.lock = threading.Lock()
+
+    def _worker(self, seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(STRESS_CHECKOUTS):
+                lines = rng.sample(self.products, rng.randint(1, len(self.products)))
+                items_data = [
+                    {'product_id': product, 'quantity': rng.randint(1, STRESS_MAX_QUANTITY),
+                     'price': Decimal('1000.00')}
+                    for product in lines
+                ]
+                for attempt in range(STRESS_RETRIES):
+                    try:
+                        with transaction.atomic():
+                            sale = Sale.objects.create(kassa=self.kassa, currency=Sale.SaleCurrency.UZS,
+                                                       payment_type=Sale.PaymentType.CASH)
+                            apply_sale_items(sale, items_data)
+                        with self.lock:
+                            self.stats['sold'] += 1
+                        break
+                    except ValidationError:
+                        with self.lock:
+                            self.stats['rejected'] += 1
+                        break
+                    except OperationalError as e:
+                        # SQLite yozuvchilarni ketma-ket qiladi, band bo'lsa qayta urinamiz
+                        if 'locked' not in str(e) or attempt == STRESS_RETRIES - 1:
+                            raise
+                        time.sleep(rng.uniform(0.001, 0.01) * (attempt + 1))
+        except Exception as e:
+            with self.lock:
+                self.stats['errors'].append(repr(e))
+        finally:
+            connection.close()
+
+    def test_concurrent_checkouts_never_oversell(self):
+        workers = [threading.Thread(target=self._worker, args=(seed,)) for seed in range(STRESS_THREADS)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(self.stats['errors'], [])
+        self.assertEqual(self.stats['sold'] + self.stats['rejected'], STRESS_THREADS * STRESS_CHECKOUTS)
+        self.assertEqual(Sale.objects.filter(kassa=self.kassa).count(), self.stats['sold'])
+        self.assertGreater(self.stats['rejected'], 0)  # qoldiq tugagan - rad etish yo'li ham sinalgan
+
+        stocks = dict(ProductStock.objects.filter(kassa=self.kassa).values_list('product_id', 'quantity'))
+        sold = dict(SaleItem.objects.filter(sale__kassa=self.kassa).values('product_id')
+                    .annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+        operations = dict(InventoryOperation.objects.filter(kassa=self.kassa).values('product_id')
+                          .annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+        for product in self.products:
+            sold_quantity = sold.get(product.id) or 0
+            self.assertGreaterEqual(stocks[product.id], 0)
+            self.assertEqual(STRESS_STOCK - sold_quantity, stocks[product.id])
+            self.assertEqual(-(operations.get(product.id) or 0), sold_quantity)
@@ -2,18 +2,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    CustomerViewSet, SaleViewSet, PosProductListView,
+    CustomerViewSet, SaleViewSet, PosProductListView, PosCatalogView, PosScanView,
     CashInView, CashOutView,
-    CurrencyExchangeView  # YANGI IMPORT
+    CurrencyExchangeView,  # YANGI IMPORT
+    KassaShiftViewSet
 )
 
 router = DefaultRouter()
 router.register(r'customers', CustomerViewSet, basename='customer')
 router.register(r'sales', SaleViewSet, basename='sale')
+router.register(r'kassa-shifts', KassaShiftViewSet, basename='kassa-shift')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('pos/products/', PosProductListView.as_view(), name='pos-products'),
+    path('pos/catalog/', PosCatalogView.as_view(), name='pos-catalog'),
+    path('pos/scan/', PosScanView.as_view(), name='pos-scan'),
     path('kassa/cash-in/', CashInView.as_view(), name='kassa-cash-in'),
     path('kassa/cash-out/', CashOutView.as_view(), name='kassa-cash-out'),
 
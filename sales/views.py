@@ -1,5 +1,6 @@
 # sales/views.py
 from django.db.models.functions import Coalesce
+from django.http import HttpResponse
 from rest_framework import viewsets, generics, status, filters, permissions, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -7,12 +8,19 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import OuterRef, Subquery, IntegerField, Value, Count  # Value qo'shildi
 
 # Modellarni import qilish
-from .models import Customer, Sale, SaleItem, Kassa # Store kerak emas
+from .models import Customer, Sale, SaleItem, Kassa, KassaShift # Store kerak emas
 from products.models import Product # Category kerak emas
 from inventory.models import ProductStock
+from inventory.barcode_index import barcode_index
+from products.search import ProductFullTextSearchFilter
 
 # Serializerlarni import qilish
 from .serializers import *
+from .idempotency import idempotent
+from .services import sync_sales, open_kassa_shift, close_kassa_shift, build_z_report, build_pos_catalog, get_pos_catalog_state
+
+# Bitta sinxronizatsiya so'rovidagi maksimal sotuvlar soni
+SALES_SYNC_MAX_BATCH = 500
 # Permissionlar
 # from users.permissions import IsSeller, IsAdminRole
 
@@ -99,6 +107,7 @@ class SaleViewSet(viewsets.ModelViewSet):
 
         # Standart create ni override qilib, javobni to'g'ri formatlaymiz
 
+    @idempotent('sales.create')
     def create(self, request, *args, **kwargs):
         # Yaratish uchun INPUT serializerini ishlatamiz
         serializer = self.get_serializer(data=request.data)
@@ -122,8 +131,38 @@ class SaleViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
          return Response({"detail": "Metod 'DELETE' ruxsat etilmagan."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
+    @action(detail=False, methods=['post'], url_path='sync',
+            permission_classes=[permissions.IsAuthenticated])
+    @idempotent('sales.sync.batch')
+    def sync(self, request):
+        """
+        Oflayn rejimda to'plangan sotuvlarni bitta so'rovda yuborish.
+        Body: {"sales": [SaleCreateSerializer formatidagi sotuvlar + client_created_at, idempotency_key]}
+        Har bir sotuv uchun alohida natija qaytariladi.
+        """
+        payloads = request.data.get('sales') if isinstance(request.data, dict) else request.data
+        if not isinstance(payloads, list) or not payloads:
+            return Response({"error": "'sales' bo'sh bo'lmagan ro'yxat bo'lishi kerak."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(payloads) > SALES_SYNC_MAX_BATCH:
+            return Response({"error": f"Bitta so'rovda ko'pi bilan {SALES_SYNC_MAX_BATCH} ta sotuv yuborish mumkin."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = sync_sales(payloads, request.user, context=self.get_serializer_context())
+        except Exception as e:
+            print(f"Sales sync error: {e}")
+            import traceback
+            traceback.print_exc()
+            return Response({"error": "Sotuvlarni sinxronlashda ichki xatolik."},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        summary = {'created': 0, 'duplicate': 0, 'error': 0}
+        for result in results:
+            summary[result['status']] += 1
+        return Response({'summary': summary, 'results': results}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], url_path='return',
             permission_classes=[permissions.IsAuthenticated])  # Ruxsatni moslang
+    @idempotent('sales.return')
     def return_sale(self, request, pk=None):
         """Ushbu sotuvdan mahsulotlarni qaytarish"""
         sale = self.get_object()  # Sotuvni olish
@@ -153,7 +192,7 @@ class SaleViewSet(viewsets.ModelViewSet):
 class PosProductListView(generics.ListAPIView):
     serializer_class = PosProductSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, ProductFullTextSearchFilter]
     filterset_fields = ['category']
     search_fields = ['name', 'barcode']
 
@@ -240,6 +279,67 @@ class PosProductListView(generics.ListAPIView):
         return Response(results)
 
 
+class PosCatalogView(generics.GenericAPIView):
+    """
+    POS terminal uchun kassa katalogi (ustunli ixcham format).
+    GET /api/pos/catalog/?kassa_id=1            - to'liq snapshot
+    GET /api/pos/catalog/?kassa_id=1&since=...  - faqat o'zgarganlar (since = oldingi javobdagi version)
+    If-None-Match oldingi ETag ga teng bo'lsa 304 qaytadi (katalog o'zgarmagan).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        kassa_id = request.query_params.get('kassa_id')
+        since = request.query_params.get('since')
+        try:
+            kassa_id = int(kassa_id)
+            since = int(since) if since not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({"error": "kassa_id (majburiy) va since butun son bo'lishi kerak."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not Kassa.objects.filter(pk=kassa_id, is_active=True).exists():
+            return Response({"error": f"Aktiv kassa topilmadi (ID: {kassa_id})."}, status=status.HTTP_404_NOT_FOUND)
+
+        # 304 uchun faqat holat (3 ta kichik so'rov) kerak - katalog tanasi qurilmaydi
+        state = get_pos_catalog_state(kassa_id)
+        version, etag, _ = state
+        quoted_etag = f'"{etag}"'
+        client_etags = [tag.strip().removeprefix('W/') for tag in request.headers.get('If-None-Match', '').split(',')]
+        if quoted_etag in client_etags:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            version, etag, body = build_pos_catalog(kassa_id, since=since, state=state)
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = quoted_etag
+        response['X-Catalog-Version'] = str(version)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class PosScanView(generics.GenericAPIView):
+    """
+    Skaner uchun aniq shtrix-kod/IMEI qidiruvi (xotiradagi indeks orqali).
+    GET /api/pos/scan/?barcode=...&kassa_id=1
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        barcode = request.query_params.get('barcode', '').strip()
+        if not barcode:
+            return Response({"error": "barcode parametri majburiy."}, status=status.HTTP_400_BAD_REQUEST)
+        kassa_id = request.query_params.get('kassa_id')
+        try:
+            kassa_id = int(kassa_id) if kassa_id else None
+        except ValueError:
+            return Response({"error": "kassa_id butun son bo'lishi kerak."}, status=status.HTTP_400_BAD_REQUEST)
+
+        product = barcode_index.lookup(barcode, kassa_id=kassa_id)
+        if product is None:
+            return Response({"detail": f"'{barcode}' shtrix-kodli aktiv mahsulot topilmadi."},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(product)
+
+
 class CashInView(generics.CreateAPIView):
     """Kassaga naqd pul kirim qilish"""
     serializer_class = CashInSerializer
@@ -250,8 +350,10 @@ class CashInView(generics.CreateAPIView):
         instance = serializer.save(user=self.request.user)
         # Javobni KassaTransactionSerializer orqali formatlash (ixtiyoriy)
         # self.response_serializer = KassaTransactionSerializer(instance) # Javobni formatlash uchun
+        return instance
 
     # Agar javobni formatlamoqchi bo'lsangiz, create metodini override qiling:
+    @idempotent('kassa.cash_in')
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -269,11 +371,62 @@ class CashOutView(generics.CreateAPIView):
     def perform_create(self, serializer):
         instance = serializer.save(user=self.request.user)
         # self.response_serializer = KassaTransactionSerializer(instance)
+        return instance
 
+    @idempotent('kassa.cash_out')
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         instance = self.perform_create(serializer)
         response_serializer = KassaTransactionSerializer(instance)
         headers = self.get_success_headers(response_serializer.data)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
\ No newline at end of file
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+
+class KassaShiftViewSet(viewsets.ReadOnlyModelViewSet):
+    """Kassa smenalari: ochish, yopish va Z-hisobot"""
+    queryset = KassaShift.objects.select_related('kassa', 'opened_by', 'closed_by').all()
+    serializer_class = KassaShiftSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['kassa', 'status']
+    ordering_fields = ['opened_at', 'closed_at']
+
+    @action(detail=False, methods=['post'], url_path='open')
+    def open_shift(self, request):
+        serializer = KassaShiftOpenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            shift = open_kassa_shift(serializer.validated_data['kassa_id'], user=request.user,
+                                     comment=serializer.validated_data.get('comment'))
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        return Response(KassaShiftSerializer(shift).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], url_path='close')
+    def close_shift(self, request, pk=None):
+        shift = self.get_object()
+        serializer = KassaShiftCloseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            shift = close_kassa_shift(shift, user=request.user,
+                                      counted_cash=serializer.validated_data.get('counted_cash'),
+                                      comment=serializer.validated_data.get('comment'))
+        except serializers.ValidationError as e:
+            return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        return Response(build_z_report(shift), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='z-report')
+    def z_report(self, request, pk=None):
+        return Response(build_z_report(self.get_object()))
+
+    @action(detail=False, methods=['get'], url_path='current')
+    def current(self, request):
+        """?kassa_id=... bo'yicha ochiq smena va uning joriy (X) hisoboti"""
+        kassa_id = request.query_params.get('kassa_id')
+        if not kassa_id:
+            return Response({"error": "kassa_id parametri majburiy."}, status=status.HTTP_400_BAD_REQUEST)
+        shift = self.get_queryset().filter(kassa_id=kassa_id, status=KassaShift.ShiftStatus.OPEN).first()
+        if shift is None:
+            return Response({"detail": "Ochiq smena yo'q."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(build_z_report(shift))
@@ -48,8 +48,7 @@ class CurrencyRate(SingletonModel):
     def save(self, *args, **kwargs):
         self.last_updated = timezone.now()
         super().save(*args, **kwargs)
-        # Bu yerda kurs o'zgarganda qilinadigan qo'shimcha amallar bo'lishi mumkin
-        # Masalan, barcha mahsulotlarning UZS narxini yangilash (agar shunday talab bo'lsa)
+        # Narxlarni qayta hisoblash: products.repricing.reprice_products (CurrencyRateView da "reprice")
 
     class Meta:
         verbose_name = "Valyuta Kursi"
@@ -37,12 +37,38 @@ class CurrencyRateView(views.APIView):
         return Response(serializer.data)
 
     def put(self, request, *args, **kwargs):
-        """Valyuta kursini yangilash"""
+        """
+        Valyuta kursini yangilash.
+        "reprice": true (yoki parametrlar obyekti, products RepriceRequestSerializer) berilsa,
+        yangi kurs bo'yicha mahsulot narxlari ham shu so'rovda qayta hisoblanadi.
+        """
+        from products.serializers import RepriceRequestSerializer  # Sikl importning oldini olish uchun
+        from products.repricing import reprice_products
+
         rate_instance = CurrencyRate.load()
         # Bu yerda ham partial=True ishlatamiz, faqat 'usd_to_uzs_rate' kelishi kutiladi
         serializer = CurrencyRateSerializer(rate_instance, data=request.data, partial=True)
+        reprice_options = request.data.get('reprice')
+        if isinstance(reprice_options, str):
+            reprice_options = {} if reprice_options.lower() in ('1', 'true') else None
+        elif reprice_options is True:
+            reprice_options = {}
+        reprice_serializer = None
+        if isinstance(reprice_options, dict):
+            reprice_options = {key: value for key, value in reprice_options.items() if key != 'rate'}  # Har doim yangi kurs
+            reprice_serializer = RepriceRequestSerializer(data=reprice_options)
+            if not reprice_serializer.is_valid():
+                return Response({'reprice': reprice_serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         if serializer.is_valid():
-            serializer.save()
+            rate_instance = serializer.save()
+            data = dict(serializer.data)
+            if reprice_serializer is not None:
+                try:
+                    data['repricing'] = reprice_products(rate=rate_instance.usd_to_uzs_rate, user=request.user,
+                                                         **reprice_serializer.validated_data)
+                except Exception as e:
+                    print(f"Kurs yangilandi, lekin qayta narxlashda xatolik: {e}")
+                    data['repricing'] = {'error': "Qayta narxlashda xatolik yuz berdi."}
             # Muvaffaqiyatli yangilangan kursni qaytarish
-            return Response(serializer.data)
+            return Response(data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file